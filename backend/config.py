@@ -8,6 +8,73 @@ load_dotenv()
 class Settings(BaseSettings):
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY")
     DATABASE_PATH: str = "ecommerce.db"
+    DEFAULT_DATABASE: str = "default"  # name DATABASE_PATH is served under
+    DATABASES: dict = {}  # further named databases, e.g. '{"acme": "/data/acme.db"}'
+    DATABASE_DIR: str = ""  # every <name>.db in here is served as <name> too
+    DATABASE_IDLE_TIMEOUT: float = 900.0
+    DATABASE_MAX_OPEN: int = 16
+    SHARD_EXECUTOR: str = "process"  # process | thread, for databases split across several files
+    SHARD_WORKERS: int = 0  # 0 = one per CPU
+    DB_POOL_SIZE: int = 4
+    DB_POOL_TIMEOUT: float = 20.0
+    DB_POOL_HEALTHCHECK_INTERVAL: float = 30.0
+    SQL_PARAMETERIZE: bool = True  # bind literals as parameters so queries share one shape (plan check, stats)
+    QUERY_SHAPES_MAX: int = 1000
+    DECODE_TYPES: bool = True
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 1024 * 1024
+    COST_GUARD_MODE: str = "warn"  # off | warn | reject
+    COST_GUARD_MAX_SCAN_ROWS: int = 5_000_000
+    COST_GUARD_MAX_NESTED_SCANS: int = 2
+    QUERY_TIMEOUT_MS: int = 10_000
+    QUERY_MAX_VM_STEPS: int = 0
+    INDEX_ADVISOR_MODE: str = "recommend"  # off | recommend | auto
+    INDEX_ADVISOR_MIN_EXECUTIONS: int = 3
+    INDEX_ADVISOR_INTERVAL: float = 300.0
+    ROLLUPS_ENABLED: bool = False  # summary tables in <name>.rollups.db; the database itself stays read-only
+    ROLLUPS_DIR: str = ""  # where rollup files go; empty puts them next to each database
+    ROLLUPS_APPEND_ONLY: bool = False  # fact tables only grow: refresh folds in new rows instead of recomputing
+    SCHEMA_PRUNING: bool = True
+    SCHEMA_MAX_TABLES: int = 8
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_RATE_LIMIT_PER_MIN: int = 1000  # provider quota; 0 disables client-side limiting
+    LLM_BURST: int = 20
+    LLM_TIMEOUT: float = 30.0
+    LLM_MAX_RETRIES: int = 3
+    LLM_BACKOFF_BASE: float = 0.25
+    LLM_BACKOFF_MAX: float = 8.0
+    LLM_HEDGE: str = "off"  # off | fixed | p95
+    LLM_HEDGE_DELAY: float = 2.0
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_BASE_URL: str = ""  # e.g. a local stand-in server
+    DB_MAX_CONCURRENCY: int = 4
+    ADMISSION_QUEUE_SIZE: int = 32
+    TRANSLATION_CACHE_SIZE: int = 1024
+    TRANSLATION_CACHE_TTL: float = 3600.0
+    TRANSLATION_CACHE_PATH: str = ""
+    WARMUP: bool = True  # pre-open connections, load schema and LLM clients at startup
+    WARMUP_RETRY_INTERVAL: float = 5.0
+    PROFILE_SAMPLE_RATE: float = 0.0  # fraction of requests run under cProfile
+    PROFILE_DIR: str = "profiles"
+    PROFILE_KEEP: int = 20
+    BATCH_MAX_QUERIES: int = 50
+    BATCH_TRANSLATION_CONCURRENCY: int = 4
+    STREAM_BATCH_SIZE: int = 500
+    EXPORT_BATCH_SIZE: int = 5000
+    EXPORT_SPOOL_DIR: str = ""  # finished exports kept for resumed downloads; default: <tmp>/hq-exports
+    EXPORT_SPOOL_TTL: float = 3600.0
+    EXPORT_SPOOL_MAX_BYTES: int = 1024 * 1024 * 1024
+    JOB_WORKERS: int = 2  # long-running jobs, on their own threads so they can't starve interactive queries
+    JOB_MAX_PER_USER: int = 2
+    JOB_MAX_ACTIVE: int = 16
+    JOB_TIMEOUT_MS: int = 600_000  # replaces QUERY_TIMEOUT_MS for jobs; 0 = no limit
+    JOB_TTL: float = 3600.0  # finished jobs and their results are kept this long
+    JOB_SPOOL_DIR: str = ""  # default: <tmp>/hq-jobs
+    JOB_PROGRESS_INTERVAL: float = 0.5
+    JOB_USER_HEADER: str = "X-User-Id"  # identifies the user for job limits; the client address otherwise
+    DEFAULT_PAGE_SIZE: int = 100
+    MAX_PAGE_SIZE: int = 10000
+    PAGE_TOKEN_SECRET: str = ""
     MAX_QUERY_LENGTH: int = 500
     CORS_ORIGINS: list = ["*"]
     ALLOWED_OPERATIONS: list = ["SELECT", "PRAGMA"]
@@ -1,114 +1,309 @@
 # backend/database/connector.py
 from ..config import settings
+from .pool import ConnectionPool
+from .result_cache import ResultCache, normalize_sql
+from .cost_guard import CostGuard, QueryCancelled, QueryMonitor
+from .parameterize import Parameterized, ShapeStats, parameterize
+from ..services.metrics import stage
+import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Set, Tuple, Iterator, Union, Callable
 import logging
-from datetime import datetime
+from datetime import date, datetime
 
 logger = logging.getLogger(__name__)
 
+# Fallback formats for values fromisoformat() rejects, most common first
+TIMESTAMP_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+)
+
+# Fallback formats that parsed, by value length, most recent first. This is not
+# a per-column memo: sqlite3 converters never learn which column, query or
+# database they decode, so every TIMESTAMP column shares it. Keeping every
+# layout seen for a length means two columns with same-length layouts don't
+# evict each other. Lengths are bounded, and so is the memo.
+_formats_by_length: Dict[int, List[str]] = {}
+_FORMAT_MEMO_MAX = 64
+
 def convert_date(val):
-    return datetime.strptime(val.decode(), "%Y-%m-%d").date()
+    return date.fromisoformat(val.decode())
 
 def convert_timestamp(val):
     """Handle multiple timestamp formats including ISO 8601 with microseconds"""
     decoded = val.decode()
-    
-    # Try ISO format with T separator and microseconds
-    try:
-        return datetime.strptime(decoded, "%Y-%m-%dT%H:%M:%S.%f")
-    except ValueError:
-        pass
-    
-    # Try ISO format without microseconds
-    try:
-        return datetime.strptime(decoded, "%Y-%m-%dT%H:%M:%S")
-    except ValueError:
-        pass
-    
-    # Try space-separated format with microseconds
-    try:
-        return datetime.strptime(decoded, "%Y-%m-%d %H:%M:%S.%f")
-    except ValueError:
-        pass
-    
-    # Try space-separated format without microseconds
+
+    # Fast path: covers every format we write, without exception-driven probing
     try:
-        return datetime.strptime(decoded, "%Y-%m-%d %H:%M:%S")
+        return datetime.fromisoformat(decoded)
     except ValueError:
         pass
-    
-    # Fallback to date-only
-    try:
-        return datetime.strptime(decoded, "%Y-%m-%d")
-    except ValueError:
-        logger.warning(f"Failed to parse timestamp: {decoded}")
-        return decoded  # Return raw value if all parsing fails
 
-# Update the adapter to use ISO format
-sqlite3.register_adapter(datetime, lambda dt: dt.isoformat())
+    known = _formats_by_length.get(len(decoded), ())
+    for fmt in known:
+        try:
+            return datetime.strptime(decoded, fmt)
+        except ValueError:
+            continue
+
+    for fmt in TIMESTAMP_FORMATS:
+        if fmt in known:
+            continue
+        try:
+            parsed = datetime.strptime(decoded, fmt)
+        except ValueError:
+            continue
+        if len(_formats_by_length) >= _FORMAT_MEMO_MAX:
+            _formats_by_length.clear()
+        # Copy-on-write: pool threads may be iterating the current list
+        _formats_by_length[len(decoded)] = [fmt, *known]
+        return parsed
+
+    logger.warning(f"Failed to parse timestamp: {decoded}")
+    return decoded  # Return raw value if all parsing fails
+
+# Type handlers are process-global, so register them once at import
+sqlite3.register_converter('date', convert_date)
+sqlite3.register_converter('timestamp', convert_timestamp)
+sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(' '))
+
+_pools: Dict[Tuple[str, bool], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database_path: str = None, decode_types: bool = None) -> ConnectionPool:
+    """Return the shared connection pool for a database file.
+
+    With `decode_types` off, DATE/TIMESTAMP columns come back as raw strings,
+    which is all that's needed when the output is only rendered.
+    """
+    path = database_path or settings.DATABASE_PATH
+    decode_types = settings.DECODE_TYPES if decode_types is None else decode_types
+    with _pools_lock:
+        pool = _pools.get((path, decode_types))
+        if pool is None:
+            pool = ConnectionPool(
+                path,
+                size=settings.DB_POOL_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+                healthcheck_interval=settings.DB_POOL_HEALTHCHECK_INTERVAL,
+                detect_types=sqlite3.PARSE_DECLTYPES if decode_types else 0,
+            )
+            _pools[(path, decode_types)] = pool
+        return pool
+
+_result_caches: Dict[Tuple[str, bool], ResultCache] = {}
+
+def get_result_cache(database_path: str = None, decode_types: bool = None) -> ResultCache:
+    """Return the shared result cache for a database file and decoding mode"""
+    path = database_path or settings.DATABASE_PATH
+    decode_types = settings.DECODE_TYPES if decode_types is None else decode_types
+    with _pools_lock:
+        cache = _result_caches.get((path, decode_types))
+        if cache is None:
+            cache = ResultCache(
+                path,
+                max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+                max_entry_bytes=settings.RESULT_CACHE_MAX_ENTRY_BYTES,
+            )
+            _result_caches[(path, decode_types)] = cache
+        return cache
+
+_cost_guards: Dict[str, CostGuard] = {}
+
+def get_cost_guard(database_path: str = None) -> CostGuard:
+    """Return the shared cost guard for a database file; its row estimates are per file"""
+    path = database_path or settings.DATABASE_PATH
+    with _pools_lock:
+        guard = _cost_guards.get(path)
+        if guard is None:
+            guard = CostGuard(
+                mode=settings.COST_GUARD_MODE,
+                max_scan_rows=settings.COST_GUARD_MAX_SCAN_ROWS,
+                max_nested_scans=settings.COST_GUARD_MAX_NESTED_SCANS,
+                timeout_ms=settings.QUERY_TIMEOUT_MS,
+                max_vm_steps=settings.QUERY_MAX_VM_STEPS,
+            )
+            _cost_guards[path] = guard
+        return guard
+
+def close_database(database_path: str):
+    """Close and forget the shared pools, result caches and cost guard of a database file"""
+    with _pools_lock:
+        pools = [_pools.pop(key) for key in list(_pools) if key[0] == database_path]
+        caches = [_result_caches.pop(key) for key in list(_result_caches) if key[0] == database_path]
+        _cost_guards.pop(database_path, None)
+    for pool in pools:
+        pool.close()
+    for cache in caches:
+        cache.close()
+
+def file_version(database_path: str) -> Tuple[int, ...]:
+    """Size and mtime of a database file and its WAL.
+
+    Unlike PRAGMA data_version this compares across connections, restarts and
+    worker processes: every commit writes one of the two files.
+    """
+    version = []
+    for path in (database_path, f"{database_path}-wal"):
+        try:
+            stat = os.stat(path)
+            version += [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            version += [0, 0]
+    return tuple(version)
+
+def _raise_if_cancelled(monitor: QueryMonitor):
+    if monitor is not None and monitor.cancelled:
+        raise QueryCancelled("Query cancelled")
 
 class DatabaseConnector:
+    def __init__(self, database_path: str = None, decode_types: bool = None, cost_guard: CostGuard = None):
+        self.database_path = database_path or settings.DATABASE_PATH
+        self.pool = get_pool(self.database_path, decode_types)
+        self.result_cache = get_result_cache(self.database_path, decode_types)
+        self.cost_guard = cost_guard or get_cost_guard(self.database_path)
+        # Callbacks run with (sql, elapsed_seconds) after each executed query;
+        # they see the query shape, so literal-only variants count together
+        self.query_listeners: List[Callable[[str, float], None]] = []
+        # (connection, SQL) -> SQL actually run on that connection, e.g. against a rollup
+        self.query_rewriters: List[Callable[[sqlite3.Connection, str], str]] = []
+        self.shapes = ShapeStats(settings.QUERY_SHAPES_MAX)
+        self._prepared: Set[str] = set()  # shapes known to compile
+
     @contextmanager
     def get_connection(self):
-        """Create connection with custom type handlers"""
-        logger.debug("Creating new SQLite connection")
+        """Check out a warm read-only connection from the pool"""
         try:
-            conn = sqlite3.connect(
-                settings.DATABASE_PATH,
-                timeout=20,
-                detect_types=sqlite3.PARSE_DECLTYPES,
-                check_same_thread=False
-            )
-            # Register type handlers
-            conn.execute("PRAGMA journal_mode=WAL")
-            sqlite3.register_converter('date', convert_date)
-            sqlite3.register_converter('timestamp', convert_timestamp)
-            sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(' '))
-            
-            conn.row_factory = sqlite3.Row
-            logger.debug(f"Connection opened: {id(conn)}")
-            yield conn
+            with stage("pool_wait"):
+                conn = self.pool.acquire()
+            try:
+                logger.debug(f"Connection checked out: {id(conn)}")
+                yield conn
+            finally:
+                self.pool.release(conn)
         except sqlite3.Error as e:
             logger.error(f"Connection error: {str(e)}")
             raise
-        finally:
-            logger.debug(f"Closing connection: {id(conn)}")
-            conn.close()
 
-    def execute_safe_query(self, query: str) -> Tuple[List[Dict[str, Any]], List[str]]:
-        """Execute query with error handling"""
-        logger.debug(f"Executing query: {query}")
-        
+    def _notify(self, query: str, elapsed: float):
+        for listener in self.query_listeners:
+            try:
+                listener(query, elapsed)
+            except Exception as e:
+                logger.error(f"Query listener failed: {str(e)}")
+
+    def _rewrite(self, conn: sqlite3.Connection, query: str) -> str:
+        if not self.query_rewriters:
+            return query
+        with stage("rewrite"):
+            for rewriter in self.query_rewriters:
+                query = rewriter(conn, query)
+        return query
+
+    def busy(self) -> bool:
+        """Whether a query currently has a connection checked out"""
+        return self.pool.stats()["in_use"] > 0
+
+    def data_version(self):
+        """Changes whenever another connection commits to the database"""
+        return self.result_cache.data_version()
+
+    def file_version(self) -> tuple:
+        """A data version that stays meaningful across processes, e.g. for ETags"""
+        return file_version(self.database_path)
+
+    @staticmethod
+    def _parameterize(query: str) -> Parameterized:
+        if not settings.SQL_PARAMETERIZE:
+            return Parameterized(query, ())
+        with stage("parameterize"):
+            return parameterize(query)
+
+    def _bind(self, conn: sqlite3.Connection, query: str) -> Parameterized:
+        """The query's shape and literals, or the query as written if the shape doesn't compile"""
+        bound = self._parameterize(query)
+        if not bound.params or bound.shape in self._prepared:
+            return bound
+        try:
+            conn.execute(f"EXPLAIN {bound.shape}", bound.params).fetchone()
+        except sqlite3.Error as e:
+            # Errors in the query itself surface again when it runs as written
+            logger.warning(f"Running SQL as written, its parameterized shape doesn't compile ({str(e)}): {bound.shape}")
+            return Parameterized(query, ())
+        if len(self._prepared) >= settings.QUERY_SHAPES_MAX:
+            self._prepared.clear()
+        self._prepared.add(bound.shape)
+        return bound
+
+    @staticmethod
+    def _check_allowed(query: str):
         clean_query = query.strip().upper()
         if not any(clean_query.startswith(op) for op in settings.ALLOWED_OPERATIONS):
             logger.error(f"Invalid query type: {query}")
             raise ValueError(f"Only {settings.ALLOWED_OPERATIONS} queries allowed")
 
+    def execute_safe_query(
+        self, query: str, use_cache: bool = True, as_tuples: bool = False
+    ) -> Tuple[List[Union[Dict[str, Any], tuple]], List[str]]:
+        """Execute query with error handling, serving repeats from the result cache.
+
+        With `as_tuples` rows come back positionally, skipping per-row dict keys.
+        """
+        logger.debug(f"Executing query: {query}")
+        self._check_allowed(query)
+
+        use_cache = use_cache and self.result_cache.enabled
+        if use_cache:
+            # Read the version before executing so a concurrent write invalidates this entry
+            cache_key = ("tuples:" if as_tuples else "") + normalize_sql(query)
+            version = self.result_cache.data_version()
+            cached = self.result_cache.get(cache_key, version)
+            if cached is not None:
+                logger.debug("Result cache hit")
+                return cached
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
             try:
                 logger.debug(f"Cursor created: {id(cursor)}")
-                cursor.execute(query)
-                logger.debug("Query executed successfully")
+                shape, params = self._bind(conn, self._rewrite(conn, query))
+                with stage("plan"):
+                    self.cost_guard.check(conn, shape, params)
+                started = time.perf_counter()
+                with self.cost_guard.budget(conn):
+                    with stage("execute"):
+                        cursor.execute(shape, params)
+                    logger.debug("Query executed successfully")
 
-                # Handle empty results
-                if cursor.description is None:
-                    return [], []
+                    # Handle empty results
+                    if cursor.description is None:
+                        return [], []
 
-                columns = [col[0] for col in cursor.description]
-                results = []
-                
-                # Process rows with error handling
-                for row in cursor:
-                    try:
-                        results.append(dict(row))
-                    except sqlite3.ProgrammingError as e:
-                        logger.error(f"Row processing error: {str(e)}")
-                        continue
+                    columns = [col[0] for col in cursor.description]
+                    results = []
+                    
+                    # Process rows with error handling
+                    with stage("fetch"):
+                        for row in cursor:
+                            try:
+                                results.append(tuple(row) if as_tuples else dict(row))
+                            except sqlite3.ProgrammingError as e:
+                                logger.error(f"Row processing error: {str(e)}")
+                                continue
 
                 logger.info(f"Returning {len(results)} rows, {len(columns)} columns")
+                elapsed = time.perf_counter() - started
+                self.shapes.record(shape, elapsed, len(results))
+                self._notify(shape, elapsed)
+                if use_cache:
+                    self.result_cache.put(cache_key, version, results, columns)
                 return results, columns
 
             except sqlite3.Error as e:
@@ -116,4 +311,60 @@ class DatabaseConnector:
                 raise RuntimeError(f"Database Error: {str(e)}")
             finally:
                 logger.debug(f"Closing cursor: {id(cursor)}")
-                cursor.close()
\ No newline at end of file
+                cursor.close()
+
+    def stream_query(
+        self, query: str, batch_size: int = None, monitor: QueryMonitor = None
+    ) -> Iterator[Union[List[str], List[tuple]]]:
+        """Yield the column names, then row batches read with fetchmany.
+
+        The pooled connection is held until the generator is exhausted or
+        closed, so memory stays flat regardless of result size. A `monitor`
+        sees the VM steps executed and can cancel the query from another thread.
+        """
+        logger.debug(f"Streaming query: {query}")
+        self._check_allowed(query)
+        batch_size = batch_size or settings.STREAM_BATCH_SIZE
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if monitor is not None:
+                monitor.attach(conn)
+            try:
+                shape, params = self._bind(conn, self._rewrite(conn, query))
+                try:
+                    with stage("plan"):
+                        self.cost_guard.check(conn, shape, params)
+                    started = time.perf_counter()
+                    with self.cost_guard.budget(conn, monitor), stage("execute"):
+                        cursor.execute(shape, params)
+                    elapsed = time.perf_counter() - started
+                    self.shapes.record(shape, elapsed)
+                    self._notify(shape, elapsed)
+                except sqlite3.Error as e:
+                    _raise_if_cancelled(monitor)
+                    logger.error(f"SQL Error: {str(e)}")
+                    raise RuntimeError(f"Database Error: {str(e)}")
+
+                if cursor.description is None:
+                    yield []
+                    return
+                yield [col[0] for col in cursor.description]
+
+                while True:
+                    _raise_if_cancelled(monitor)
+                    # The time budget applies per batch, so a slow client doesn't count against it
+                    try:
+                        with self.cost_guard.budget(conn, monitor), stage("fetch"):
+                            rows = cursor.fetchmany(batch_size)
+                    except sqlite3.Error as e:
+                        _raise_if_cancelled(monitor)
+                        logger.error(f"SQL Error while streaming: {str(e)}")
+                        raise RuntimeError(f"Database Error: {str(e)}")
+                    if not rows:
+                        break
+                    yield [tuple(row) for row in rows]
+            finally:
+                if monitor is not None:
+                    monitor.detach()
+                cursor.close()
@@ -0,0 +1,280 @@
+# backend/database/cost_guard.py
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tokens for resolve_aliases; literals and quoted names match whole so nothing inside them reads as SQL
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|[A-Za-z_][\w$]*|\d+(?:\.\d*)?|\S")
+# Keywords that end a FROM clause; ON/USING only end the table reference before them
+_FROM_END = {
+    "WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "WINDOW", "UNION", "EXCEPT", "INTERSECT", "SELECT", "VALUES",
+}
+_NOT_ALIASES = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER", "ON", "USING",
+    "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "WINDOW", "AS", "FROM",
+    "SELECT", "INDEXED", "NOT",
+}
+_SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+
+
+class QueryCostError(RuntimeError):
+    """Raised when a query is rejected up front or aborted for exceeding its budget"""
+
+
+class QueryCancelled(RuntimeError):
+    """Raised when a monitored query is cancelled from another thread"""
+
+
+class QueryMonitor:
+    """Progress and cancellation of one long-running statement, shared with other threads.
+
+    The connector attaches the connection while it executes, so `cancel()`
+    can stop the statement mid-step with `Connection.interrupt()`.
+    `timeout_ms` replaces the guard's interactive time budget (0 = none).
+    """
+
+    def __init__(self, timeout_ms: int = 0):
+        self.timeout_ms = timeout_ms
+        self.vm_steps = 0
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._conn = conn
+            if self.cancelled:
+                conn.interrupt()
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+
+@dataclass
+class PlanReport:
+    full_scans: List[Tuple[str, int]] = field(default_factory=list)
+    nested_scans: int = 0
+    temp_btrees: List[str] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+
+
+def _identifier(token: str):
+    if token[0] in "\"`[":
+        return token[1:-1].replace('""', '"')
+    if token[0].isalpha() or token[0] == "_":
+        return token
+    return None
+
+
+def resolve_aliases(sql: str) -> Dict[str, str]:
+    """Map aliases (and bare names) of the tables in FROM/JOIN clauses to table names.
+
+    Only the table list after FROM is read, up to WHERE, GROUP BY, ORDER BY
+    and the like, at every subquery depth, so select-list and ORDER BY
+    items never count. The first resolution of a name wins.
+    """
+    tokens = _TOKEN.findall(sql)
+    aliases: Dict[str, str] = {}
+    in_from = [False]  # per parenthesis depth
+    expect_table = False
+    i = 0
+    while i < len(tokens):
+        token, upper = tokens[i], tokens[i].upper()
+        if token == "(":
+            in_from.append(False)
+            expect_table = False
+        elif token == ")":
+            if len(in_from) > 1:
+                in_from.pop()
+            expect_table = False
+        elif upper == "FROM":
+            in_from[-1] = expect_table = True
+        elif not in_from[-1]:
+            pass
+        elif upper in _FROM_END:
+            in_from[-1] = expect_table = False
+        elif upper == "JOIN" or token == ",":
+            expect_table = True
+        elif expect_table:
+            expect_table = False
+            table = _identifier(token)
+            if table is None or upper in _NOT_ALIASES:
+                i += 1
+                continue
+            if i + 2 < len(tokens) and tokens[i + 1] == "." and _identifier(tokens[i + 2]):
+                i += 2  # schema-qualified, e.g. main.orders
+                table = _identifier(tokens[i])
+            aliases.setdefault(table, table)
+            j = i + 2 if i + 1 < len(tokens) and tokens[i + 1].upper() == "AS" else i + 1
+            alias = _identifier(tokens[j]) if j < len(tokens) else None
+            if alias is not None and tokens[j].upper() not in _NOT_ALIASES:
+                aliases.setdefault(alias, table)
+                i = j
+        i += 1
+    return aliases
+
+
+class CostGuard:
+    """EXPLAIN QUERY PLAN pre-check plus a progress-handler execution budget"""
+
+    def __init__(
+        self,
+        mode: str = "warn",
+        max_scan_rows: int = 5_000_000,
+        max_nested_scans: int = 2,
+        timeout_ms: int = 10_000,
+        max_vm_steps: int = 0,
+        check_interval: int = 10_000,
+    ):
+        self.mode = mode
+        self.max_scan_rows = max_scan_rows
+        self.max_nested_scans = max_nested_scans
+        self.timeout_ms = timeout_ms
+        self.max_vm_steps = max_vm_steps
+        self.check_interval = check_interval
+        self._row_estimates: Dict[str, Tuple[int, float]] = {}
+        # Plans don't depend on bound values, so one analysis serves a query shape
+        self._reports: "OrderedDict[str, Tuple[PlanReport, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.warned = 0
+        self.aborted = 0
+        self.plan_cache_hits = 0
+
+    def estimate_rows(self, conn: sqlite3.Connection, table: str) -> int:
+        """MAX(rowid) is an O(log n) upper bound on row count; cached for a minute"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._row_estimates.get(table)
+        if cached is not None and now - cached[1] < 60:
+            return cached[0]
+        try:
+            quoted = '"' + table.replace('"', '""') + '"'
+            estimate = conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0
+        except sqlite3.Error:
+            estimate = 0  # WITHOUT ROWID tables, views
+        with self._lock:
+            self._row_estimates[table] = (estimate, now)
+        return estimate
+
+    def analyze(self, conn: sqlite3.Connection, query: str, params: tuple = ()) -> PlanReport:
+        report = PlanReport()
+        aliases = resolve_aliases(query)
+        scans_per_loop = defaultdict(int)
+
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params):
+            parent, detail = row[1], row[3]
+            if detail.startswith("USE TEMP B-TREE"):
+                report.temp_btrees.append(detail)
+                continue
+            match = _SCAN.match(detail)
+            if not match or match.group(1) == "CONSTANT":
+                continue
+            table = aliases.get(match.group(1), match.group(1))
+            rows = self.estimate_rows(conn, table)
+            report.full_scans.append((table, rows))
+            scans_per_loop[parent] += 1
+            if rows > self.max_scan_rows:
+                report.problems.append(f"full scan of {table} (~{rows:,} rows)")
+
+        # Several full scans at one loop level means they run nested (a cartesian-style join)
+        report.nested_scans = max(scans_per_loop.values(), default=0)
+        if report.nested_scans > self.max_nested_scans:
+            report.problems.append(f"{report.nested_scans} nested full scans")
+        return report
+
+    def _analyze_cached(self, conn: sqlite3.Connection, query: str, params: tuple) -> PlanReport:
+        """analyze(), reused for a minute per query shape like the row estimates it is built on"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._reports.get(query)
+            if cached is not None and now - cached[1] < 60:
+                self._reports.move_to_end(query)
+                self.plan_cache_hits += 1
+                return cached[0]
+        report = self.analyze(conn, query, params)
+        with self._lock:
+            self._reports[query] = (report, now)
+            self._reports.move_to_end(query)
+            while len(self._reports) > 512:
+                self._reports.popitem(last=False)
+        return report
+
+    def check(self, conn: sqlite3.Connection, query: str, params: tuple = ()) -> PlanReport:
+        """Inspect the plan and warn or reject according to `mode`"""
+        if self.mode == "off" or not query.lstrip().upper().startswith("SELECT"):
+            return PlanReport()
+        report = self._analyze_cached(conn, query, params)
+        if report.problems:
+            summary = "; ".join(report.problems)
+            if self.mode == "reject":
+                self.rejected += 1
+                logger.warning(f"Rejected expensive query ({summary}): {query}")
+                raise QueryCostError(f"Query rejected as too expensive: {summary}")
+            self.warned += 1
+            logger.warning(f"Expensive query plan ({summary}): {query}")
+        return report
+
+    @contextmanager
+    def budget(self, conn: sqlite3.Connection, monitor: QueryMonitor = None):
+        """Abort statements on `conn` after `timeout_ms` or `max_vm_steps` VM instructions.
+
+        With a `monitor`, its timeout applies instead and it counts the steps.
+        """
+        timeout_ms = self.timeout_ms if monitor is None else monitor.timeout_ms
+        if not timeout_ms and not self.max_vm_steps and monitor is None:
+            yield
+            return
+
+        deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+        steps = 0
+        exceeded = []
+
+        def handler():
+            nonlocal steps
+            steps += self.check_interval
+            if monitor is not None:
+                monitor.vm_steps += self.check_interval
+            if deadline is not None and time.monotonic() > deadline:
+                exceeded.append(f"{timeout_ms} ms")
+                return 1
+            if self.max_vm_steps and steps > self.max_vm_steps:
+                exceeded.append(f"{self.max_vm_steps:,} VM steps")
+                return 1
+            return 0
+
+        conn.set_progress_handler(handler, self.check_interval)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if monitor is not None and monitor.cancelled:
+                raise QueryCancelled("Query cancelled") from e
+            if exceeded:
+                self.aborted += 1
+                raise QueryCostError(f"Query aborted after exceeding its budget of {exceeded[0]}") from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rejected": self.rejected,
+            "warned": self.warned,
+            "aborted": self.aborted,
+            "plan_cache_hits": self.plan_cache_hits,
+        }
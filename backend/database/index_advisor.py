@@ -0,0 +1,248 @@
+# backend/database/index_advisor.py
+import math
+import re
+import sqlite3
+import threading
+import time
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .connector import DatabaseConnector
+from .cost_guard import resolve_aliases
+from .parameterize import placeholders
+from .result_cache import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+_SCAN = re.compile(r"^SCAN (\w+)")
+_CLAUSE_END = r"(?=\b(?:LIMIT|HAVING|WINDOW|UNION|EXCEPT|INTERSECT|ORDER\s+BY|GROUP\s+BY)\b|\)|$)"
+_MAX_INDEX_COLUMNS = 6
+
+
+@dataclass
+class IndexCandidate:
+    table: str
+    columns: List[str]
+    reason: str
+    executions: int
+    est_rows: int
+    rows_avoided: int
+    est_time_saved_ms: float
+    statement: str
+    created: bool = False
+
+
+def _index_name(table: str, columns: List[str]) -> str:
+    return ("hq_idx_" + table + "_" + "_".join(columns))[:120]
+
+
+class IndexAdvisor:
+    """Learns from executed SQL which indexes would remove repeated scans and sorts.
+
+    In "recommend" mode it only reports candidates. In "auto" mode it also
+    creates the best ones and runs ANALYZE / PRAGMA optimize, which needs a
+    separate writable connection because the query pool is read-only.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseConnector,
+        mode: str = "recommend",
+        min_executions: int = 3,
+        interval: float = 300.0,
+        max_queries: int = 1000,
+        max_auto_indexes: int = 3,
+    ):
+        self.db = db
+        self.mode = mode
+        self.min_executions = min_executions
+        self.interval = interval
+        self.max_queries = max_queries
+        self.max_auto_indexes = max_auto_indexes
+        self._workload: Dict[str, List[float]] = {}  # sql -> [executions, total seconds]
+        self._lock = threading.Lock()
+        self._last_maintenance = time.monotonic()
+        self._maintenance_running = False
+        self._created: Dict[str, str] = {}  # statement -> table
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def record(self, query: str, elapsed: float):
+        """Query hook: remember what ran and how long it took"""
+        if self.mode == "off" or not query.lstrip().upper().startswith("SELECT"):
+            return
+        key = normalize_sql(query)
+        with self._lock:
+            entry = self._workload.get(key)
+            if entry is None:
+                if len(self._workload) >= self.max_queries:
+                    # Forget the least frequent statement
+                    coldest = min(self._workload, key=lambda k: self._workload[k][0])
+                    del self._workload[coldest]
+                entry = self._workload[key] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed
+        self._maybe_schedule_maintenance()
+
+    def _maybe_schedule_maintenance(self):
+        if time.monotonic() - self._last_maintenance < self.interval:
+            return
+        with self._lock:
+            if self._maintenance_running:
+                return
+            self._maintenance_running = True
+            self._last_maintenance = time.monotonic()
+        threading.Thread(target=self._maintenance, name="hq-index-advisor", daemon=True).start()
+
+    def _maintenance(self):
+        try:
+            report = self.report()
+            if self.mode == "auto":
+                self.apply(report["candidates"][:self.max_auto_indexes])
+                self.optimize()
+        except Exception as e:
+            logger.error(f"Index advisor maintenance failed: {str(e)}", exc_info=True)
+        finally:
+            with self._lock:
+                self._maintenance_running = False
+
+    @staticmethod
+    def _existing_indexes(conn: sqlite3.Connection, table: str) -> List[List[str]]:
+        quoted = '"' + table.replace('"', '""') + '"'
+        indexes = []
+        for idx in conn.execute(f"PRAGMA index_list({quoted})").fetchall():
+            name = '"' + idx[1].replace('"', '""') + '"'
+            indexes.append([info[2] for info in conn.execute(f"PRAGMA index_info({name})")])
+        return indexes
+
+    @staticmethod
+    def _column_roles(sql: str, alias: str, table_columns: List[str], single_table: bool) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Split the columns `sql` uses from one table into equality, range, ordering and other references"""
+        prefix = rf"\b{re.escape(alias)}\."
+        col = rf"(?:{prefix}|(?<![\w.]))(\w+)" if single_table else rf"{prefix}(\w+)"
+        known = {c.lower(): c for c in table_columns}
+
+        def found(pattern, text=sql):
+            return [known[m.lower()] for m in re.findall(pattern, text, re.IGNORECASE) if m.lower() in known]
+
+        equality = found(rf"{col}\s*(?:==?|\bIN\b|\bIS\b)") + found(rf"(?:[^<>!]=)\s*{col}")
+        ranges = found(rf"{col}\s*(?:<|>|\bBETWEEN\b|\bLIKE\b)") + found(rf"[<>]=?\s*{col}")
+        ordering = []
+        for clause in re.findall(rf"\b(?:GROUP|ORDER)\s+BY\s+(.*?){_CLAUSE_END}", sql, re.IGNORECASE | re.DOTALL):
+            ordering += found(col, clause)
+        referenced = found(col)
+
+        def unique(values, exclude=()):
+            seen = list(exclude)
+            return [v for v in values if not (v in seen or seen.append(v))]
+
+        equality = unique(equality)
+        ranges = unique(ranges, equality)
+        ordering = unique(ordering, equality + ranges)
+        others = unique(referenced, equality + ranges + ordering)
+        return equality, ranges, ordering, others
+
+    def report(self) -> Dict[str, Any]:
+        """Analyse the recorded workload and rank index candidates by expected benefit"""
+        with self._lock:
+            workload = {sql: list(stats) for sql, stats in self._workload.items()
+                        if stats[0] >= self.min_executions}
+
+        candidates: Dict[Tuple[str, Tuple[str, ...]], IndexCandidate] = {}
+        findings = []
+        with self.db.get_connection() as conn:
+            tables = {name: [c[1] for c in conn.execute(f'PRAGMA table_info("{name}")')]
+                      for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            for sql, (executions, total_time) in workload.items():
+                try:
+                    # Workload entries are shapes; the plan doesn't depend on the bound values
+                    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * placeholders(sql))]
+                except sqlite3.Error:
+                    continue
+                aliases = resolve_aliases(sql)
+                single_table = len({t for t in aliases.values() if t in tables}) == 1
+                avg_ms = total_time / executions * 1000
+                temp_btree = [d for d in plan if d.startswith("USE TEMP B-TREE")]
+                if temp_btree or any(_SCAN.match(d) for d in plan):
+                    findings.append({"sql": sql, "executions": executions, "avg_ms": avg_ms, "plan": plan})
+
+                for detail in plan:
+                    match = _SCAN.match(detail)
+                    if not match:
+                        continue
+                    alias = match.group(1)
+                    table = aliases.get(alias, alias)
+                    if table not in tables:
+                        continue
+                    equality, ranges, ordering, others = self._column_roles(sql, alias, tables[table], single_table)
+                    if not (equality or ranges or ordering):
+                        continue
+
+                    key_columns = equality + ranges[:1] + (ordering if not ranges else [])
+                    covering = (key_columns + [c for c in ranges[1:] + others if c not in key_columns])
+                    columns = covering[:_MAX_INDEX_COLUMNS]
+                    reason = "full scan" + (" + " + ", ".join(d[len("USE "):].lower() for d in temp_btree) if temp_btree else "")
+
+                    if any(existing[:len(key_columns)] == key_columns for existing in self._existing_indexes(conn, table)):
+                        continue
+
+                    est_rows = self.db.cost_guard.estimate_rows(conn, table)
+                    # An index probe touches ~log2(n) entries instead of n; sorts cost ~n log n
+                    per_run = max(0, est_rows - int(math.log2(est_rows + 1)))
+                    if temp_btree:
+                        per_run += int(est_rows * math.log2(est_rows + 1))
+                    saved_fraction = per_run / (per_run + math.log2(est_rows + 2)) if per_run else 0.0
+
+                    candidate = candidates.get((table, tuple(columns)))
+                    if candidate is None:
+                        statement = (f'CREATE INDEX IF NOT EXISTS "{_index_name(table, columns)}" '
+                                     f'ON "{table}" ({", ".join(columns)})')
+                        candidate = candidates[(table, tuple(columns))] = IndexCandidate(
+                            table=table,
+                            columns=columns,
+                            reason=reason,
+                            executions=0,
+                            est_rows=est_rows,
+                            rows_avoided=0,
+                            est_time_saved_ms=0.0,
+                            statement=statement,
+                            created=statement in self._created,
+                        )
+                    candidate.executions += executions
+                    candidate.rows_avoided += per_run * executions
+                    candidate.est_time_saved_ms += total_time * 1000 * saved_fraction
+
+        ranked = sorted(candidates.values(), key=lambda c: c.rows_avoided, reverse=True)
+        self.last_report = {
+            "mode": self.mode,
+            "queries_recorded": len(self._workload),
+            "queries_analyzed": len(workload),
+            "candidates": [asdict(c) for c in ranked],
+            "findings": findings,
+        }
+        return self.last_report
+
+    def apply(self, candidates: List[Dict[str, Any]]):
+        """Create candidate indexes on a short-lived writable connection"""
+        if not candidates:
+            return
+        conn = sqlite3.connect(self.db.database_path, timeout=30)
+        try:
+            for candidate in candidates:
+                logger.info(f"Creating index: {candidate['statement']}")
+                conn.execute(candidate["statement"])
+                conn.execute(f'ANALYZE "{candidate["table"]}"')
+                candidate["created"] = True
+                self._created[candidate["statement"]] = candidate["table"]
+            conn.commit()
+        finally:
+            conn.close()
+
+    def optimize(self):
+        """Refresh planner statistics where SQLite thinks they are stale"""
+        conn = sqlite3.connect(self.db.database_path, timeout=30)
+        try:
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,146 @@
+# backend/database/parameterize.py
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+# One token per match; comments and whitespace collapse to a single space in the shape
+_TOKEN = re.compile(
+    r"(?P<space>\s+|--[^\n]*|/\*.*?\*/)"
+    r"|(?P<blob>[xX]'[0-9a-fA-F]*')"
+    r"|(?P<string>'(?:[^']|'')*')"
+    r"|(?P<quoted>\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])"
+    r"|(?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<param>\?\d*|[:@$][A-Za-z_]\w*)"
+    r"|(?P<word>[A-Za-z_][\w$]*)"
+    r"|(?P<other>.)",
+    re.DOTALL,
+)
+# Literals are lifted only where they are values: predicates, join conditions and
+# LIMIT/OFFSET. Select lists keep theirs because they name result columns, and
+# GROUP BY / ORDER BY because "ORDER BY 2" means a column position.
+_LIFT = {"WHERE", "ON", "HAVING", "LIMIT", "OFFSET"}
+_KEEP = {"SELECT", "FROM", "GROUP", "ORDER", "WINDOW", "UNION", "INTERSECT", "EXCEPT", "VALUES", "JOIN", "USING"}
+_MAX_INT = 2 ** 63 - 1
+
+
+class Parameterized(NamedTuple):
+    shape: str
+    params: Tuple[Any, ...]
+
+
+def _value(kind: str, text: str):
+    if kind == "string":
+        return text[1:-1].replace("''", "'")
+    if text[:2] in ("0x", "0X"):
+        return int(text, 16)
+    if any(ch in text for ch in ".eE"):
+        return float(text)
+    return int(text)
+
+
+@lru_cache(maxsize=2048)
+def parameterize(sql: str) -> Parameterized:
+    """Split `sql` into a canonical shape with `?` placeholders and the literal values.
+
+    Queries that differ only in constants share one shape, and so one plan
+    check and statistics entry, and sqlite3's per-connection statement
+    cache can reuse the compiled statement. SQL that already
+    has placeholders, or that doesn't tokenize cleanly, comes back as is.
+    """
+    pieces: List[str] = []
+    params: List[Any] = []
+    lift = [False]  # per parenthesis depth
+    casts = [False]  # per parenthesis depth: opened by CAST
+    type_name = False  # after AS inside CAST(...): "DECIMAL(10, 2)" takes syntax, not values
+    previous = ""
+    for match in _TOKEN.finditer(sql.strip().rstrip(";")):
+        kind, text = match.lastgroup, match.group()
+        if kind == "space":
+            if pieces and pieces[-1] != " ":
+                pieces.append(" ")
+            continue
+        if kind == "param" or (kind == "other" and text in "'\"`["):
+            return Parameterized(sql, ())
+        if kind == "word":
+            keyword = text.upper()
+            if keyword in _LIFT:
+                lift[-1] = True
+            elif keyword in _KEEP:
+                lift[-1] = False
+            type_name = type_name or (keyword == "AS" and casts[-1])
+        elif text == "(":
+            lift.append(False if type_name else lift[-1])
+            casts.append(previous == "CAST")
+            type_name = False
+        elif text == ")" and len(lift) > 1:
+            lift.pop()
+            casts.pop()
+            type_name = False
+        elif kind in ("string", "number") and lift[-1]:
+            value = _value(kind, text)
+            if not (isinstance(value, int) and abs(value) > _MAX_INT):
+                params.append(value)
+                text = "?"
+        previous = text.upper() if kind == "word" else text
+        pieces.append(text)
+    return Parameterized("".join(pieces).strip(), tuple(params))
+
+
+def placeholders(sql: str) -> int:
+    """Number of `?` placeholders in a shape, e.g. to EXPLAIN it with NULLs bound"""
+    return sum(1 for match in _TOKEN.finditer(sql) if match.lastgroup == "param")
+
+
+class ShapeStats:
+    """Executions, latency and rows per query shape; the least used shape is dropped when full"""
+
+    def __init__(self, max_shapes: int = 1000):
+        self.max_shapes = max_shapes
+        self._shapes: Dict[str, List[float]] = {}  # shape -> [executions, total seconds, max seconds, rows]
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.reused = 0
+
+    def record(self, shape: str, elapsed: float, rows: int = 0):
+        with self._lock:
+            self.executions += 1
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    coldest = min(self._shapes, key=lambda k: self._shapes[k][0])
+                    del self._shapes[coldest]
+                entry = self._shapes[shape] = [0, 0.0, 0.0, 0]
+            else:
+                # Same shape seen before; whether sqlite3's per-connection statement
+                # cache still held its compiled form isn't observable from here
+                self.reused += 1
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+            entry[3] += rows
+
+    def top(self, limit: int = 20, by: str = "total_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            shapes = [
+                {
+                    "shape": shape,
+                    "executions": int(executions),
+                    "total_ms": total * 1000,
+                    "avg_ms": total / executions * 1000,
+                    "max_ms": worst * 1000,
+                    "avg_rows": rows / executions,
+                }
+                for shape, (executions, total, worst, rows) in self._shapes.items()
+            ]
+        return sorted(shapes, key=lambda s: s[by], reverse=True)[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            shapes = len(self._shapes)
+        return {
+            "shapes": shapes,
+            "executions": self.executions,
+            "reused": self.reused,
+            "reuse_ratio": self.reused / self.executions if self.executions else 0.0,
+        }
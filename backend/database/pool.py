@@ -0,0 +1,189 @@
+# backend/database/pool.py
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of warm, read-only SQLite connections"""
+
+    def __init__(
+        self,
+        database_path: str,
+        size: int = 4,
+        timeout: float = 20.0,
+        healthcheck_interval: float = 30.0,
+        cached_statements: int = 256,
+        detect_types: int = sqlite3.PARSE_DECLTYPES,
+    ):
+        self.database_path = database_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.cached_statements = cached_statements
+        self.detect_types = detect_types
+
+        self._idle: Deque[sqlite3.Connection] = deque()
+        self._last_used: Dict[int, float] = {}
+        self._opened = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+    def _open(self) -> sqlite3.Connection:
+        """Open a read-only connection and apply per-connection PRAGMAs once"""
+        conn = sqlite3.connect(
+            f"file:{self.database_path}?mode=ro",
+            uri=True,
+            timeout=self.timeout,
+            detect_types=self.detect_types,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.row_factory = sqlite3.Row
+        logger.debug(f"Pool opened connection: {id(conn)}")
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Cheap liveness probe, only run on connections idle for a while"""
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.healthcheck_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding unhealthy connection {id(conn)}: {str(e)}")
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._opened -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, waiting up to `timeout` seconds"""
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                elif self._opened < self.size:
+                    self._opened += 1
+                    conn = None
+                else:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.timeout}s waiting for a database connection"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except sqlite3.Error:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            break
+
+        wait = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time += wait
+            self._max_wait = max(self._max_wait, wait)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, discarding it if it is in a bad state"""
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._last_used[id(conn)] = time.monotonic()
+        with self._cond:
+            if self._closed:
+                conn.close()
+                self._opened -= 1
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm(self, count: int = None):
+        """Pre-open up to `count` connections so first requests skip setup"""
+        count = self.size if count is None else min(count, self.size)
+        conns = [self.acquire() for _ in range(count)]
+        for conn in conns:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()
+                conn.close()
+                self._opened -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": self._opened - len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "avg_wait_ms": (self._wait_time / self._checkouts * 1000) if self._checkouts else 0.0,
+                "max_wait_ms": self._max_wait * 1000,
+            }
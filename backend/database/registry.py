@@ -0,0 +1,298 @@
+# backend/database/registry.py
+import contextvars
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+
+from ..config import settings
+from .connector import DatabaseConnector, close_database
+from .index_advisor import IndexAdvisor
+from .rollups import RollupManager, rollup_path
+from .schema_manager import SchemaManager
+from .shard_worker import close_shard_connections
+from .sharding import ShardedConnector
+
+logger = logging.getLogger(__name__)
+
+_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Databases the current HTTP request has resolved, released when its response is done
+_request_leases: contextvars.ContextVar = contextvars.ContextVar("hq_database_leases", default=None)
+
+
+class UnknownDatabaseError(LookupError):
+    """No database is registered or discoverable under the requested name"""
+
+
+@dataclass
+class Database:
+    """Everything that is per database file: pool and caches (via the connector), schema, rollups, index advice"""
+    name: str
+    path: str
+    db: DatabaseConnector
+    schema: SchemaManager
+    rollups: RollupManager
+    index_advisor: IndexAdvisor
+    loaded_at: float
+    last_used: float
+    requests: int = 0
+    refs: int = 0  # requests and jobs holding it; never evicted while above zero
+    shards: List[str] = field(default_factory=list)
+
+    @property
+    def paths(self) -> List[str]:
+        return self.shards or [self.path]
+
+    def busy(self) -> bool:
+        return self.refs > 0 or self.db.busy()
+
+
+class DatabaseRegistry:
+    """Named databases, opened on first use and closed again when idle.
+
+    Names resolve to explicitly registered paths first, then to
+    `<directory>/<name>.db`. A list of paths, or a `<directory>/<name>/`
+    folder of `.db` files, is served as one database sharded across those
+    files. Loading a database only builds cheap objects;
+    connections, schema and prompt are created by the first query against
+    it. A database is closed once unused for `idle_timeout` seconds, or
+    least recently used first when more than `max_open` are loaded, unless
+    it is held or has a query running. The default database is never evicted.
+    Non-default databases get `cache_bytes` of result cache each, so the
+    total stays bounded however many tenants there are.
+    """
+
+    def __init__(
+        self,
+        databases: Dict[str, Union[str, List[str]]] = None,
+        default: str = "default",
+        directory: str = "",
+        idle_timeout: float = 900.0,
+        max_open: int = 16,
+        cache_bytes: int = None,
+    ):
+        self.default_name = default
+        self.directory = directory
+        self.idle_timeout = idle_timeout
+        self.max_open = max(1, max_open)
+        self.cache_bytes = cache_bytes
+        self._paths: Dict[str, Union[str, List[str]]] = {}
+        self._loaded: "OrderedDict[str, Database]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.loads = 0
+        self.evictions = 0
+        for name, path in (databases or {}).items():
+            self.register(name, path)
+
+    def register(self, name: str, path: Union[str, List[str]]):
+        """Add or repoint a named database (a list of paths for shards); a copy loaded from the old path is closed"""
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid database name: {name!r}")
+        if not isinstance(path, str):
+            path = list(path)
+            if not path:
+                raise ValueError(f"Database {name!r} has no shards")
+        with self._lock:
+            self._paths[name] = path
+            stale = self._loaded.get(name)
+            if stale is not None and stale.paths != ([path] if isinstance(path, str) else path):
+                del self._loaded[name]
+            else:
+                stale = None
+        if stale is not None:
+            self._close(stale)
+
+    def resolve(self, name: str) -> Union[str, List[str]]:
+        path = self._paths.get(name)
+        if path is not None:
+            return path
+        if self.directory and _NAME.match(name):
+            path = os.path.join(self.directory, f"{name}.db")
+            if os.path.isfile(path):
+                return path
+            shards = self._shard_files(os.path.join(self.directory, name))
+            if shards:
+                return shards
+        raise UnknownDatabaseError(f"Unknown database: {name}")
+
+    @staticmethod
+    def _shard_files(folder: str) -> List[str]:
+        if not os.path.isdir(folder):
+            return []
+        return sorted(os.path.join(folder, entry) for entry in os.listdir(folder) if entry.endswith(".db"))
+
+    def names(self) -> List[str]:
+        names = set(self._paths)
+        if self.directory and os.path.isdir(self.directory):
+            for entry in os.listdir(self.directory):
+                if entry.endswith(".db") and _NAME.match(entry[:-3]):
+                    names.add(entry[:-3])
+                elif _NAME.match(entry) and self._shard_files(os.path.join(self.directory, entry)):
+                    names.add(entry)
+        return sorted(names)
+
+    def get(self, name: str = None) -> Database:
+        """The named (or default) database, loading it if needed.
+
+        The caller holds it until `release()`; inside a request served
+        through `DatabaseLeaseMiddleware` that happens when the response is done.
+        """
+        name = name or self.default_name
+        now = time.monotonic()
+        with self._lock:
+            database = self._loaded.get(name)
+            if database is None:
+                database = self._load(name, self.resolve(name), now)
+                self._loaded[name] = database
+            else:
+                self._loaded.move_to_end(name)
+            database.last_used = now
+            database.requests += 1
+            database.refs += 1
+        leases = _request_leases.get()
+        if leases is not None:
+            leases.append(database)
+        self._sweep(now)
+        return database
+
+    def acquire(self, database: Database):
+        """Hold an already resolved database, e.g. for a job that outlives its request"""
+        with self._lock:
+            database.refs += 1
+
+    def release(self, database: Database):
+        with self._lock:
+            database.refs -= 1
+            database.last_used = time.monotonic()
+
+    @property
+    def default(self) -> Database:
+        """The default database, without counting the lookup as a use"""
+        database = self._loaded.get(self.default_name)
+        if database is None:
+            database = self.get()
+            self.release(database)
+        return database
+
+    def _load(self, name: str, path: Union[str, List[str]], now: float) -> Database:
+        shards = [] if isinstance(path, str) else path
+        db = ShardedConnector(shards) if shards else DatabaseConnector(path)
+        if name != self.default_name and self.cache_bytes is not None:
+            db.result_cache.max_bytes = self.cache_bytes
+            db.result_cache.max_entry_bytes = min(db.result_cache.max_entry_bytes, self.cache_bytes)
+        # Indexes would have to be built on every shard; only recommend them there
+        mode = settings.INDEX_ADVISOR_MODE
+        if shards and mode == "auto":
+            mode = "recommend"
+        index_advisor = IndexAdvisor(
+            db,
+            mode=mode,
+            min_executions=settings.INDEX_ADVISOR_MIN_EXECUTIONS,
+            interval=settings.INDEX_ADVISOR_INTERVAL,
+        )
+        db.query_listeners.append(index_advisor.record)
+        # Rollups live in one file and would only summarise the first shard
+        rollups = RollupManager(
+            db,
+            enabled=settings.ROLLUPS_ENABLED and not shards,
+            append_only=settings.ROLLUPS_APPEND_ONLY,
+            path=rollup_path(path if isinstance(path, str) else shards[0], settings.ROLLUPS_DIR),
+        )
+        db.query_rewriters.append(rollups.rewrite)
+        self.loads += 1
+        logger.info(f"Loaded database {name} ({len(shards)} shards)" if shards else f"Loaded database {name} ({path})")
+        return Database(
+            name=name,
+            path=shards[0] if shards else path,
+            db=db,
+            schema=SchemaManager(db),
+            rollups=rollups,
+            index_advisor=index_advisor,
+            loaded_at=now,
+            last_used=now,
+            shards=shards,
+        )
+
+    def _sweep(self, now: float):
+        """Close databases idle past the timeout, then the least recently used beyond `max_open`"""
+        over_capacity = len(self._loaded) > self.max_open
+        if not over_capacity and now - self._last_sweep < min(60.0, self.idle_timeout / 2):
+            return
+        evicted = []
+        with self._lock:
+            self._last_sweep = now
+            for name, database in list(self._loaded.items()):
+                # A request can hold a database long before it touches the pool, e.g. while the LLM answers
+                if name == self.default_name or database.busy():
+                    continue
+                if now - database.last_used > self.idle_timeout or len(self._loaded) > self.max_open:
+                    del self._loaded[name]
+                    evicted.append(database)
+        for database in evicted:
+            self.evictions += 1
+            self._close(database)
+
+    def _close(self, database: Database):
+        database.rollups.close()
+        with self._lock:
+            in_use = {path for other in self._loaded.values() for path in other.paths}
+        for path in database.paths:
+            if path not in in_use:
+                close_database(path)
+                if database.shards:
+                    close_shard_connections(path)
+        logger.info(f"Closed database {database.name} after {database.requests} requests")
+
+    def describe(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            loaded = dict(self._loaded)
+        result = []
+        for name in self.names():
+            database = loaded.get(name)
+            result.append({
+                "name": name,
+                "default": name == self.default_name,
+                "loaded": database is not None,
+                "idle_seconds": now - database.last_used if database else None,
+                "requests": database.requests if database else 0,
+                "shards": len(database.paths) if database else None,
+            })
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = len(self._loaded)
+        return {
+            "registered": len(self._paths),
+            "loaded": loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "max_open": self.max_open,
+        }
+
+
+class DatabaseLeaseMiddleware:
+    """ASGI middleware: databases resolved during a request stay loaded until its response, streamed body included, is sent"""
+
+    def __init__(self, app, registry: DatabaseRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        leases: List[Database] = []
+        token = _request_leases.set(leases)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_leases.reset(token)
+            for database in leases:
+                self.registry.release(database)
@@ -0,0 +1,132 @@
+# backend/database/result_cache.py
+import re
+import sqlite3
+import sys
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Quoted strings and identifiers match first, so whitespace inside them is kept
+_WHITESPACE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace outside quotes and drop trailing semicolons; case is kept because literals are case-sensitive"""
+    collapsed = _WHITESPACE.sub(lambda m: m.group(1) or " ", query)
+    return collapsed.strip().rstrip(";").strip()
+
+
+def estimate_size(results: List[Union[Dict[str, Any], tuple]], limit: int) -> Optional[int]:
+    """Approximate in-memory size of a result set, or None once it exceeds `limit`"""
+    total = sys.getsizeof(results)
+    for row in results:
+        total += sys.getsizeof(row)
+        for value in (row.values() if isinstance(row, dict) else row):
+            total += sys.getsizeof(value)
+        if total > limit:
+            return None
+    return total
+
+
+class ResultCache:
+    """Byte-bounded LRU cache of query results, invalidated by PRAGMA data_version"""
+
+    def __init__(self, database_path: str, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 1024 * 1024):
+        self.database_path = database_path
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._probe = None
+        self._probe_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def data_version(self) -> int:
+        """Current data version as seen by a dedicated probe connection.
+
+        data_version values are only comparable on the same connection, so every
+        check goes through one long-lived autocommit connection.
+        """
+        with self._probe_lock:
+            if self._probe is None:
+                self._probe = sqlite3.connect(
+                    f"file:{self.database_path}?mode=ro",
+                    uri=True,
+                    isolation_level=None,
+                    check_same_thread=False,
+                )
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self, key: str, version: int) -> Optional[Tuple[List[Union[Dict[str, Any], tuple]], List[str]]]:
+        """Return cached (results, columns); callers must treat them as read-only"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            results, columns, entry_version, size = entry
+            if entry_version != version:
+                del self._entries[key]
+                self._bytes -= size
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results, columns
+
+    def put(self, key: str, version: int, results: List[Union[Dict[str, Any], tuple]], columns: List[str]):
+        size = estimate_size(results, self.max_entry_bytes)
+        if size is None:
+            with self._lock:
+                self.rejected += 1
+            logger.debug(f"Result too large to cache ({len(results)} rows)")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[3]
+            self._entries[key] = (results, columns, version, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[3]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def close(self):
+        """Drop every entry and the probe connection"""
+        self.clear()
+        with self._probe_lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
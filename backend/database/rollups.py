@@ -0,0 +1,531 @@
+# backend/database/rollups.py
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .connector import DatabaseConnector
+from .result_cache import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_ALIAS = "hq_r"
+ROLLUP_SCHEMA = "hq_rollups"  # the rollup file, attached read-only to connections that run a rewrite
+_STATE_TABLE = "hq_rollup_state"
+_MAX_PLANS = 1024
+_MISSING = object()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_UNSUPPORTED = re.compile(
+    r"\(\s*SELECT\b|\b(?:UNION|INTERSECT|EXCEPT|OVER|WITH|LEFT|RIGHT|FULL|CROSS|NATURAL|OUTER|USING|BETWEEN)\b",
+    re.IGNORECASE,
+)
+_FROM = re.compile(r"\bFROM\b(.*?)(?=\b(?:WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|WINDOW)\b|$)", re.IGNORECASE | re.DOTALL)
+_JOIN = re.compile(r"\b(?:INNER\s+)?JOIN\b", re.IGNORECASE)
+_TABLE_REF = re.compile(r'^\s*"?(\w+)"?(?:\s+(?:AS\s+)?(?!ON\b)(\w+))?(?:\s+ON\s+(.*?))?\s*$', re.IGNORECASE | re.DOTALL)
+_AND = re.compile(r"\bAND\b", re.IGNORECASE)
+_EDGE = re.compile(r"^(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)$")
+_ALIAS = re.compile(r"\bAS\s+\"?(\w+)\"?", re.IGNORECASE)
+_AS_BEFORE = re.compile(r"\bAS\s*$", re.IGNORECASE)
+_IDENTIFIER = re.compile(r"(?<![\w.])([A-Za-z_]\w*)\b(?!\s*\()")
+_AGGREGATION = re.compile(r"\b(?:SUM|TOTAL|COUNT|AVG|MIN|MAX|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b", re.IGNORECASE)
+_DUPLICATE_SENSITIVE = re.compile(r"\b(?:SUM|TOTAL|COUNT|AVG|GROUP_CONCAT)\s*\(", re.IGNORECASE)
+
+
+@dataclass
+class Rollup:
+    """A summary table over one fact table.
+
+    `keys` maps rollup columns to grouping expressions and `measures` maps
+    measure names to value expressions (the first is canonical, the rest are
+    equivalent spellings). `{column}` placeholders refer to fact-table columns.
+    """
+    name: str
+    fact: str
+    keys: Dict[str, str]
+    measures: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    @property
+    def table(self) -> str:
+        return f"hq_rollup_{self.name}"
+
+
+DEFAULT_ROLLUPS = [
+    Rollup(
+        name="orders_by_month_status",
+        fact="orders",
+        keys={"month": "strftime('%Y-%m', {order_date})", "status": "{status}"},
+        measures={"total_amount": ("{total_amount}",)},
+    ),
+    Rollup(
+        name="orders_by_customer",
+        fact="orders",
+        keys={"customer_id": "{customer_id}"},
+        measures={"total_amount": ("{total_amount}",)},
+    ),
+    Rollup(
+        name="sales_by_variant",
+        fact="order_details",
+        keys={"product_variant_id": "{product_variant_id}"},
+        measures={
+            "quantity": ("{quantity}",),
+            "revenue": ("{quantity} * {unit_price}", "{unit_price} * {quantity}"),
+        },
+    ),
+]
+
+
+def _template_regex(template: str, column_ref) -> str:
+    """Compile an expression template into a whitespace-tolerant pattern"""
+    out = []
+    in_string = False
+    for part in re.split(r"(\{\w+\})", template):
+        if part.startswith("{") and part.endswith("}") and not in_string:
+            out.append(column_ref(part[1:-1]))
+            continue
+        for ch in part:
+            if ch == "'":
+                in_string = not in_string
+                out.append(ch)
+            elif in_string:
+                out.append(re.escape(ch))
+            elif ch.isspace():
+                out.append(r"\s*")
+            elif ch in "(),*+-/":
+                out.append(r"\s*" + re.escape(ch) + r"\s*")
+            else:
+                out.append(re.escape(ch))
+    # Surrounding whitespace belongs to the query, not to the expression
+    while out and out[0] == r"\s*":
+        out.pop(0)
+    pattern = "".join(out)
+    if pattern.startswith(r"\s*"):
+        pattern = pattern[len(r"\s*"):]
+    if pattern.endswith(r"\s*"):
+        pattern = pattern[:-len(r"\s*")]
+    return pattern
+
+
+def _aggregates_key(code: str) -> bool:
+    """True if a duplicate-sensitive aggregate reads a rollup key, which is stored once per group"""
+    for match in _DUPLICATE_SENSITIVE.finditer(code):
+        depth, end = 1, match.end()
+        while end < len(code) and depth:
+            depth += {"(": 1, ")": -1}.get(code[end], 0)
+            end += 1
+        argument = code[match.end():end - 1]
+        if f"{ROLLUP_ALIAS}." in argument and not argument.lstrip().upper().startswith("DISTINCT"):
+            return True
+    return False
+
+
+def _sub_code(pattern: str, replacement: str, text: str) -> str:
+    """re.sub that leaves string literals and `AS alias` names alone"""
+    literals = [m.span() for m in _STRING.finditer(text)]
+
+    def replace(match):
+        start = match.start()
+        if any(a <= start < b for a, b in literals) or _AS_BEFORE.search(text, 0, start):
+            return match.group(0)
+        return replacement
+
+    return re.sub(pattern, replace, text, flags=re.IGNORECASE)
+
+
+def rollup_path(database_path: str, directory: str = "") -> str:
+    """`<name>.rollups.db` next to the database, or in `directory`"""
+    stem = os.path.splitext(database_path)[0]
+    if directory:
+        stem = os.path.join(directory, os.path.basename(stem))
+    return f"{stem}.rollups.db"
+
+
+class RollupManager:
+    """Summary tables in a file of their own, plus transparent query rewrite.
+
+    The database itself is only ever read: summaries live in `path`, which
+    the executing connection attaches read-only. The rewrite happens at
+    execution time, so responses and page tokens keep the SQL as generated.
+    Each rollup stores partial aggregates per key. Matching queries are
+    rewritten to re-aggregate the partials, which keeps their cost
+    proportional to the number of groups instead of the number of orders.
+    Rewrites are only handed out while the summaries match the current data
+    version; otherwise the original SQL runs and a refresh is started in the
+    background. A refresh recomputes the summaries, since an UPDATE or
+    DELETE can touch any summarised row. With `append_only` the fact tables
+    are promised to only ever grow, and a refresh folds in just the rows
+    above a rowid watermark.
+    """
+
+    def __init__(self, db: DatabaseConnector, rollups: List[Rollup] = None, enabled: bool = False,
+                 append_only: bool = False, path: str = None):
+        self.db = db
+        self.path = path or rollup_path(db.database_path)
+        self.rollups = list(DEFAULT_ROLLUPS if rollups is None else rollups)
+        self.enabled = enabled
+        self.append_only = append_only
+        self._plans: Dict[str, Any] = {}
+        self._verified: Dict[str, bool] = {}
+        self._fresh_version: Optional[int] = None
+        self._refreshing = False
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._columns: Dict[str, Tuple[List[str], List[str]]] = {}
+        # Metrics
+        self.rewrites = 0
+        self.misses = 0
+        self.stale = 0
+        self.refreshes = 0
+        self.rows_applied = 0
+        self.last_refresh_ms = 0.0
+
+    def _read(self, sql: str, params: tuple = (), attach: bool = False) -> List[tuple]:
+        """Run a small statement on a private read-only connection, away from the query pool"""
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(
+                    f"file:{self.db.database_path}?mode=ro",
+                    uri=True,
+                    isolation_level=None,
+                    check_same_thread=False,
+                )
+            if attach:
+                self.attach(self._reader)
+            return self._reader.execute(sql, params).fetchall()
+
+    def attach(self, conn: sqlite3.Connection):
+        """Make the rollup tables readable on `conn` (opened with uri=True) as `hq_rollups.*`"""
+        if not any(row[1] == ROLLUP_SCHEMA for row in conn.execute("PRAGMA database_list")):
+            conn.execute(f"ATTACH DATABASE ? AS {ROLLUP_SCHEMA}", (f"file:{self.path}?mode=ro",))
+
+    def _table_columns(self, table: str) -> Tuple[List[str], List[str]]:
+        """(columns, primary key columns) of a base table"""
+        info = self._columns.get(table)
+        if info is None:
+            quoted = '"' + table.replace('"', '""') + '"'
+            rows = self._read(f"PRAGMA table_info({quoted})")
+            info = ([r[1] for r in rows], [r[1] for r in sorted(rows, key=lambda r: r[5]) if r[5]])
+            self._columns[table] = info
+        return info
+
+    # Query rewrite
+
+    def rewrite(self, conn: sqlite3.Connection, sql: str) -> str:
+        """SQL to run on `conn` that reads a summary table instead of the fact table, or `sql` unchanged.
+
+        Registered as a query rewriter on the connector; `conn` gets the
+        rollup file attached when a rewrite is handed out.
+        """
+        if not self.enabled:
+            return sql
+        key = normalize_sql(sql)
+        with self._lock:
+            plan = self._plans.get(key, _MISSING)
+        if plan is _MISSING:
+            try:
+                plan = self._plan(sql)
+            except sqlite3.Error as e:
+                logger.warning(f"Rollup matching failed: {str(e)}")
+                plan = None
+            with self._lock:
+                if len(self._plans) >= _MAX_PLANS:
+                    self._plans.clear()
+                    self._verified.clear()
+                self._plans[key] = plan
+        if plan is None:
+            self.misses += 1
+            return sql
+
+        if not self.is_fresh():
+            self.stale += 1
+            self.refresh_async()
+            return sql
+        if not self._verify(key, plan):
+            self.misses += 1
+            return sql
+        try:
+            self.attach(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Rollup file unavailable ({str(e)}), running the original SQL")
+            return sql
+        self.rewrites += 1
+        logger.info(f"Rewrote query to use a rollup: {plan}")
+        return plan
+
+    def _verify(self, key: str, plan: str) -> bool:
+        """Compile a rewritten statement once so a bad rewrite can never reach the user"""
+        verified = self._verified.get(key)
+        if verified is None:
+            try:
+                self._read(f"EXPLAIN {plan}", attach=True)
+                verified = True
+            except sqlite3.Error as e:
+                logger.warning(f"Discarding rollup rewrite ({str(e)}): {plan}")
+                verified = False
+            self._verified[key] = verified
+        return verified
+
+    def _plan(self, sql: str) -> Optional[str]:
+        if _UNSUPPORTED.search(_STRING.sub("''", sql)) or not _AGGREGATION.search(sql):
+            return None
+        for rollup in self.rollups:
+            rewritten = self._rewrite_with(sql, rollup)
+            if rewritten is not None:
+                return rewritten
+        return None
+
+    def _rewrite_with(self, sql: str, rollup: Rollup) -> Optional[str]:
+        from_match = _FROM.search(sql)
+        if not from_match:
+            return None
+        head, tail = sql[:from_match.start()], sql[from_match.end():]
+
+        refs = []
+        for part in _JOIN.split(from_match.group(1)):
+            match = _TABLE_REF.match(part)
+            if not match:
+                return None
+            table, alias, on = match.groups()
+            refs.append((table, alias or table, on))
+        facts = [ref for ref in refs if ref[0] == rollup.fact]
+        if len(facts) != 1:
+            return None
+        fact_alias = facts[0][1]
+        dims = [ref for ref in refs if ref[0] != rollup.fact]
+        conditions = [c.strip() for ref in refs if ref[2] for c in _AND.split(ref[2])]
+
+        # Every other table must hang off the fact table through primary keys,
+        # otherwise the join could duplicate fact rows and change the totals
+        reached = {fact_alias}
+        pending = {alias: table for table, alias, _ in dims}
+        progress = True
+        while pending and progress:
+            progress = False
+            for condition in conditions:
+                edge = _EDGE.match(condition)
+                if not edge:
+                    continue
+                a, a_col, b, b_col = edge.groups()
+                for alias, column, other in ((a, a_col, b), (b, b_col, a)):
+                    if alias in pending and other in reached and self._table_columns(pending[alias])[1] == [column]:
+                        reached.add(alias)
+                        del pending[alias]
+                        progress = True
+        if pending:
+            return None
+
+        fact_columns, fact_pk = self._table_columns(rollup.fact)
+        prefix = rf"(?<![\w.]){re.escape(fact_alias)}\."
+        if dims:
+            def column_ref(col):
+                return rf"{prefix}{re.escape(col)}\b"
+        else:
+            def column_ref(col):
+                return rf"(?<![\w.])(?:{re.escape(fact_alias)}\.)?{re.escape(col)}\b"
+
+        # Aggregates over measures become aggregates over the stored partials
+        substitutions = []
+        for name, templates in rollup.measures.items():
+            for template in templates:
+                expr = _template_regex(template, column_ref)
+                substitutions += [
+                    (rf"\bSUM\s*\(\s*{expr}\s*\)", f"SUM({ROLLUP_ALIAS}.{name}_sum)"),
+                    (rf"\bTOTAL\s*\(\s*{expr}\s*\)", f"TOTAL({ROLLUP_ALIAS}.{name}_sum)"),
+                    (rf"\bCOUNT\s*\(\s*{expr}\s*\)", f"IFNULL(SUM({ROLLUP_ALIAS}.{name}_count), 0)"),
+                    (rf"\bAVG\s*\(\s*{expr}\s*\)",
+                     f"(TOTAL({ROLLUP_ALIAS}.{name}_sum) / SUM({ROLLUP_ALIAS}.{name}_count))"),
+                    (rf"\bMIN\s*\(\s*{expr}\s*\)", f"MIN({ROLLUP_ALIAS}.{name}_min)"),
+                    (rf"\bMAX\s*\(\s*{expr}\s*\)", f"MAX({ROLLUP_ALIAS}.{name}_max)"),
+                ]
+        row_count = f"IFNULL(SUM({ROLLUP_ALIAS}.row_count), 0)"
+        substitutions.append((r"\bCOUNT\s*\(\s*\*\s*\)", row_count))
+        for pk in fact_pk:
+            substitutions.append((rf"\bCOUNT\s*\(\s*{column_ref(pk)}\s*\)", row_count))
+
+        # Measures are parked behind placeholders so the key checks below only see key references
+        placeholders = []
+
+        def substitute(text: str) -> str:
+            for pattern, replacement in substitutions:
+                token = f"__hq_measure_{len(placeholders)}__"
+                replaced = _sub_code(pattern, token, text)
+                if replaced != text:
+                    placeholders.append((token, replacement))
+                    text = replaced
+            for column, template in rollup.keys.items():
+                text = _sub_code(_template_regex(template, column_ref), f"{ROLLUP_ALIAS}.{column}", text)
+            return text
+
+        head, tail = substitute(head), substitute(tail)
+        conditions = [substitute(c) for c in conditions]
+
+        select_aliases = {a.lower() for a in _ALIAS.findall(head)}
+        leftover_columns = {c.lower() for c in fact_columns} - select_aliases
+        for text in [head, tail] + conditions:
+            code = _ALIAS.sub("", _STRING.sub("''", text))
+            if re.search(prefix, code) or _aggregates_key(code):
+                return None
+            if any(ident.lower() in leftover_columns for ident in _IDENTIFIER.findall(code)):
+                return None
+
+        def restore(text: str) -> str:
+            for token, replacement in placeholders:
+                text = text.replace(token, replacement)
+            return text
+
+        # Attach each join condition to the last table it mentions
+        positions = {alias: i for i, (_, alias, _) in enumerate(dims)}
+        attached = defaultdict(list)
+        for condition in conditions:
+            owners = [alias for alias in positions if re.search(rf"(?<![\w.]){re.escape(alias)}\.", condition)]
+            owner = max(owners, key=positions.get) if owners else dims[0][1]
+            attached[owner].append(restore(condition))
+
+        from_clause = f"FROM {ROLLUP_SCHEMA}.{rollup.table} AS {ROLLUP_ALIAS}"
+        for table, alias, _ in dims:
+            from_clause += f" JOIN {table} AS {alias}"
+            if attached[alias]:
+                from_clause += " ON " + " AND ".join(attached[alias])
+        return f"{restore(head).rstrip()} {from_clause} {restore(tail).lstrip()}".strip()
+
+    # Maintenance
+
+    def is_fresh(self) -> bool:
+        return self._fresh_version is not None and self.db.result_cache.data_version() == self._fresh_version
+
+    def refresh_async(self):
+        """Start a background refresh unless one is running or the last one failed recently"""
+        with self._lock:
+            if self._refreshing or time.monotonic() < self._retry_after:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, name="hq-rollups", daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Rollup refresh failed: {str(e)}", exc_info=True)
+            self._retry_after = time.monotonic() + 60
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _create(self, conn: sqlite3.Connection, rollup: Rollup):
+        columns = list(rollup.keys)
+        for name in rollup.measures:
+            columns += [f"{name}_sum", f"{name}_count INTEGER NOT NULL", f"{name}_min", f"{name}_max"]
+        columns.append("row_count INTEGER NOT NULL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {rollup.table} "
+            f"({', '.join(columns)}, PRIMARY KEY ({', '.join(rollup.keys)}))"
+        )
+
+    @staticmethod
+    def _upsert_sql(rollup: Rollup) -> str:
+        def expand(template):
+            return re.sub(r"\{(\w+)\}", lambda m: f'"{m.group(1)}"', template)
+
+        columns, values, updates = list(rollup.keys), [expand(t) for t in rollup.keys.values()], []
+        for name, templates in rollup.measures.items():
+            value = expand(templates[0])
+            columns += [f"{name}_sum", f"{name}_count", f"{name}_min", f"{name}_max"]
+            values += [f"SUM({value})", f"COUNT({value})", f"MIN({value})", f"MAX({value})"]
+            updates += [
+                f"{name}_sum = coalesce({name}_sum + excluded.{name}_sum, {name}_sum, excluded.{name}_sum)",
+                f"{name}_count = {name}_count + excluded.{name}_count",
+                f"{name}_min = coalesce(min({name}_min, excluded.{name}_min), {name}_min, excluded.{name}_min)",
+                f"{name}_max = coalesce(max({name}_max, excluded.{name}_max), {name}_max, excluded.{name}_max)",
+            ]
+        columns.append("row_count")
+        values.append("COUNT(*)")
+        updates.append("row_count = row_count + excluded.row_count")
+        group_by = ", ".join(str(i + 1) for i in range(len(rollup.keys)))
+        return (
+            f"INSERT INTO {rollup.table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(values)} FROM src.\"{rollup.fact}\" WHERE rowid > ? AND rowid <= ? GROUP BY {group_by} "
+            f"ON CONFLICT ({', '.join(rollup.keys)}) DO UPDATE SET {', '.join(updates)}"
+        )
+
+    def refresh(self, rebuild: bool = False) -> int:
+        """Bring every rollup up to date with the data; returns fact rows read"""
+        rebuild = rebuild or not self.append_only
+        with self._refresh_lock:
+            started = time.perf_counter()
+            applied = 0
+            # Read before the snapshot: a commit in between leaves the rollups marked stale
+            version = self.db.result_cache.data_version()
+            self._fresh_version = None
+            conn = sqlite3.connect(f"file:{self.path}", uri=True, timeout=30, isolation_level=None)
+            try:
+                conn.execute("ATTACH DATABASE ? AS src", (f"file:{self.db.database_path}?mode=ro",))
+                conn.execute("BEGIN")
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {_STATE_TABLE} (name TEXT PRIMARY KEY, watermark INTEGER NOT NULL)")
+                for rollup in self.rollups:
+                    self._create(conn, rollup)
+                    row = conn.execute(f"SELECT watermark FROM {_STATE_TABLE} WHERE name = ?", (rollup.name,)).fetchone()
+                    watermark = row[0] if row and not rebuild else 0
+                    high = conn.execute(f'SELECT IFNULL(MAX(rowid), 0) FROM src."{rollup.fact}"').fetchone()[0]
+                    if high < watermark or (rebuild and row):
+                        # A full recompute, or rows were deleted below the watermark
+                        logger.debug(f"Rebuilding rollup {rollup.name}")
+                        conn.execute(f"DELETE FROM {rollup.table}")
+                        watermark = 0
+                    if high > watermark:
+                        conn.execute(self._upsert_sql(rollup), (watermark, high))
+                        applied += conn.execute(
+                            f'SELECT COUNT(*) FROM src."{rollup.fact}" WHERE rowid > ? AND rowid <= ?', (watermark, high)
+                        ).fetchone()[0]
+                    if row is None or high != row[0]:
+                        conn.execute(
+                            f"INSERT INTO {_STATE_TABLE} (name, watermark) VALUES (?, ?) "
+                            f"ON CONFLICT (name) DO UPDATE SET watermark = excluded.watermark",
+                            (rollup.name, high),
+                        )
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+            # Only the rollup file was written, so an unchanged version means nothing else committed
+            if self.db.result_cache.data_version() == version:
+                self._fresh_version = version
+            self.refreshes += 1
+            self.rows_applied += applied
+            self.last_refresh_ms = (time.perf_counter() - started) * 1000
+            logger.info(f"Refreshed rollups: {applied} new fact rows in {self.last_refresh_ms:.1f} ms")
+            return applied
+
+    def rebuild(self) -> int:
+        """Recompute every rollup from scratch, e.g. after editing rows of an append-only fact table"""
+        return self.refresh(rebuild=True)
+
+    def close(self):
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "append_only": self.append_only,
+            "fresh": self._fresh_version is not None,
+            "rewrites": self.rewrites,
+            "misses": self.misses,
+            "stale": self.stale,
+            "refreshes": self.refreshes,
+            "rows_applied": self.rows_applied,
+            "last_refresh_ms": self.last_refresh_ms,
+        }
@@ -1,25 +1,127 @@
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
 from .connector import DatabaseConnector
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Column:
+    name: str
+    type: str
+    not_null: bool
+    primary_key: bool
+
+
+@dataclass
+class ForeignKey:
+    column: str
+    ref_table: str
+    ref_column: Optional[str]
+
+
+@dataclass
+class Index:
+    name: str
+    columns: List[str]
+    unique: bool
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: List[Column] = field(default_factory=list)
+    foreign_keys: List[ForeignKey] = field(default_factory=list)
+    indexes: List[Index] = field(default_factory=list)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [col.name for col in self.columns]
+
+    @property
+    def primary_key(self) -> List[str]:
+        return [col.name for col in self.columns if col.primary_key]
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
 class SchemaManager:
-    def __init__(self):
-        self.db = DatabaseConnector()
+    def __init__(self, db: DatabaseConnector = None):
+        self.db = db or DatabaseConnector()
+        self._tables: Dict[str, TableInfo] = {}
+        self._version: Optional[int] = None
+        self._prompt: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def get_tables(self) -> Dict[str, TableInfo]:
+        """Introspected schema, reloaded only when PRAGMA schema_version changes"""
+        with self.db.get_connection() as conn:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            if version == self._version:
+                return self._tables
+            with self._lock:
+                if version != self._version:
+                    logger.info(f"Loading schema (schema_version={version})")
+                    self._tables = self._load(conn)
+                    self._prompt = None
+                    self._version = version
+            return self._tables
+
+    @property
+    def schema_version(self) -> Optional[int]:
+        """PRAGMA schema_version the loaded tables were read at; get_tables() refreshes it"""
+        return self._version
+
+    def _load(self, conn) -> Dict[str, TableInfo]:
+        """Read every table's columns, keys and indexes over a single connection"""
+        tables = {}
+        names = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+            "AND name != 'hq_shards'"  # the shard layout of a sharded database, not data
+        ).fetchall()
+        for (table_name,) in names:
+            table = TableInfo(name=table_name)
+            quoted = _quote(table_name)
+            for col in conn.execute(f"PRAGMA table_info({quoted})"):
+                table.columns.append(Column(
+                    name=col['name'],
+                    type=col['type'],
+                    not_null=bool(col['notnull']),
+                    primary_key=bool(col['pk']),
+                ))
+            for fk in conn.execute(f"PRAGMA foreign_key_list({quoted})"):
+                table.foreign_keys.append(ForeignKey(
+                    column=fk['from'], ref_table=fk['table'], ref_column=fk['to'],
+                ))
+            for idx in conn.execute(f"PRAGMA index_list({quoted})").fetchall():
+                columns = [
+                    info['name']
+                    for info in conn.execute(f"PRAGMA index_info({_quote(idx['name'])})")
+                ]
+                table.indexes.append(Index(name=idx['name'], columns=columns, unique=bool(idx['unique'])))
+            tables[table_name] = table
+        return tables
 
     def get_full_schema(self) -> dict:
-        schema = {}
-        tables, _ = self.db.execute_safe_query(
-            "SELECT name FROM sqlite_master WHERE type='table'"
-        )
+        return {name: table.column_names for name, table in self.get_tables().items()}
+
+    @staticmethod
+    def format_tables(tables: List[TableInfo]) -> str:
+        """Schema listing in the format the LLM prompt uses"""
+        prompt = "Database Schema:\n"
         for table in tables:
-            table_name = table['name']
-            columns, _ = self.db.execute_safe_query(
-                f"PRAGMA table_info({table_name})"
-            )
-            schema[table_name] = [col['name'] for col in columns]
-        return schema
+            prompt += f"- {table.name} ({', '.join(table.column_names)})\n"
+        return prompt
 
     def get_schema_prompt(self) -> str:
-        schema = self.get_full_schema()
-        prompt = "Database Schema:\n"
-        for table, columns in schema.items():
-            prompt += f"- {table} ({', '.join(columns)})\n"
-        return prompt
\ No newline at end of file
+        tables = self.get_tables()
+        prompt = self._prompt
+        if prompt is None:
+            prompt = self.format_tables(list(tables.values()))
+            self._prompt = prompt
+        return prompt
@@ -0,0 +1,71 @@
+# backend/database/shard_worker.py
+"""Shard query execution, importable on its own so pool workers start fast.
+
+Runs in worker processes (or threads): each keeps one read-only connection
+per shard file, whose statement cache serves repeated query shapes, and
+returns plain tuples, which pickle cheaply. Each worker keeps at most
+`_MAX_PER_WORKER` connections, least recently used closed first, so shards
+of evicted databases don't hold file descriptors forever in worker
+processes; in this process `close_shard_connections()` drops them at once.
+"""
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+from . import connector  # noqa: F401  registers the DATE/TIMESTAMP converters in this process
+from .cost_guard import CostGuard
+
+_MAX_PER_WORKER = 32
+# (thread, path, decode_types) -> connection, least recently used first
+_connections: Dict[Tuple[int, str, bool], sqlite3.Connection] = {}
+_lock = threading.Lock()
+
+
+def _connection(path: str, decode_types: bool) -> sqlite3.Connection:
+    worker = threading.get_ident()
+    key = (worker, path, decode_types)
+    with _lock:
+        conn = _connections.pop(key, None)
+        if conn is not None:
+            _connections[key] = conn
+            return conn
+    conn = sqlite3.connect(
+        f"file:{path}?mode=ro",
+        uri=True,
+        detect_types=sqlite3.PARSE_DECLTYPES if decode_types else 0,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    with _lock:
+        _connections[key] = conn
+        own = [k for k in _connections if k[0] == worker]
+        stale = [_connections.pop(k) for k in own[:-_MAX_PER_WORKER]]
+    for old in stale:
+        old.close()
+    return conn
+
+
+def close_shard_connections(path: str):
+    """Close this process's cached connections to a shard file, once no database uses it"""
+    with _lock:
+        stale = [_connections.pop(key) for key in list(_connections) if key[1] == path]
+    for conn in stale:
+        conn.close()
+
+
+def run_shard(
+    path: str, sql: str, params: tuple, decode_types: bool, timeout_ms: int, max_vm_steps: int
+) -> Tuple[List[str], List[tuple]]:
+    """Execute `sql` with `params` bound on one shard and return (columns, rows)"""
+    conn = _connection(path, decode_types)
+    guard = CostGuard(mode="off", timeout_ms=timeout_ms, max_vm_steps=max_vm_steps)
+    try:
+        with guard.budget(conn):
+            cursor = conn.execute(sql, params)
+            columns = [col[0] for col in cursor.description] if cursor.description else []
+            rows = cursor.fetchall()
+    except sqlite3.Error as e:
+        # sqlite3 errors don't always survive pickling back to the parent
+        raise RuntimeError(f"Database Error: {str(e)}")
+    return columns, rows
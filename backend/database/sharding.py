@@ -0,0 +1,679 @@
+# backend/database/sharding.py
+import heapq
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from ..config import settings
+from ..services.metrics import stage
+from .connector import DatabaseConnector, file_version, get_result_cache
+from .cost_guard import QueryCancelled, QueryCostError, QueryMonitor, resolve_aliases
+from .result_cache import normalize_sql
+from .shard_worker import run_shard
+
+logger = logging.getLogger(__name__)
+
+_CLAUSE = re.compile(
+    r"\b(SELECT|FROM|WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET|"
+    r"UNION|INTERSECT|EXCEPT|WINDOW|WITH|VALUES)\b",
+    re.IGNORECASE,
+)
+_CLAUSE_ORDER = ["SELECT", "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT", "OFFSET"]
+_AGGREGATE = re.compile(r"\b(SUM|TOTAL|COUNT|MIN|MAX|AVG|GROUP_CONCAT|STRING_AGG)\s*\(", re.IGNORECASE)
+_ROW_CAP = re.compile(r"^SELECT \* FROM \((.*)\) LIMIT (\d+) OFFSET (\d+)$", re.DOTALL)
+_AS = re.compile(r"\s+AS\s+", re.IGNORECASE)
+_TRAILING_WORD = re.compile(r"^(.*[\w)\"'\]`])\s+([A-Za-z_]\w*)\s*$", re.DOTALL)
+_ORDER_ITEM = re.compile(
+    r"^(.*?)(?:\s+COLLATE\s+(\w+))?(?:\s+(ASC|DESC))?(?:\s+NULLS\s+(FIRST|LAST))?\s*$", re.IGNORECASE | re.DOTALL
+)
+_COLUMN_REF = re.compile(r'^(?:(?:"[^"]+"|\w+)\.)?"?(\w+)"?$')
+_KEYWORDS = {
+    "END", "NULL", "ELSE", "THEN", "AND", "OR", "NOT", "IS", "IN", "LIKE", "GLOB", "BETWEEN",
+    "ASC", "DESC", "DISTINCT", "ALL", "TRUE", "FALSE", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP",
+}
+_QUOTES = {"'": "'", '"': '"', "`": "`", "[": "]"}
+
+
+class UnsupportedShardQuery(RuntimeError):
+    """The query can't be answered by merging per-shard results; surfaced as HTTP 400"""
+
+
+def _blank(sql: str, nested: bool = True) -> str:
+    """`sql` at the same length with quoted text (and, if `nested`, anything inside parentheses) blanked"""
+    out = []
+    depth = 0
+    quote = None
+    for ch in sql:
+        if quote:
+            out.append(" ")
+            if ch == quote:
+                quote = None
+        elif ch in _QUOTES:
+            quote = _QUOTES[ch]
+            out.append(" ")
+        elif ch == "(":
+            out.append(" " if nested and depth else ch)
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            out.append(" " if nested and depth else ch)
+        else:
+            out.append(" " if nested and depth else ch)
+    return "".join(out)
+
+
+def _split_top(text: str, separator: str = ",") -> List[str]:
+    flat = _blank(text)
+    parts, start = [], 0
+    for i, ch in enumerate(flat):
+        if ch == separator:
+            parts.append(text[start:i].strip())
+            start = i + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def _norm(expr: str) -> str:
+    return re.sub(r"\s+", " ", expr).strip()
+
+
+def _clauses(sql: str) -> Dict[str, str]:
+    """Top-level clauses of a single SELECT statement, keyed by keyword"""
+    flat = _blank(sql)
+    found = [(m.start(), m.end(), re.sub(r"\s+", " ", m.group(1).upper())) for m in _CLAUSE.finditer(flat)]
+    if not found or found[0][0] != len(flat) - len(flat.lstrip()) or found[0][2] != "SELECT":
+        raise UnsupportedShardQuery("Only single SELECT statements can run on sharded databases")
+    clauses: Dict[str, str] = {}
+    last = -1
+    for i, (start, end, keyword) in enumerate(found):
+        if keyword not in _CLAUSE_ORDER:
+            raise UnsupportedShardQuery(f"{keyword} is not supported on sharded databases")
+        position = _CLAUSE_ORDER.index(keyword)
+        if position <= last:
+            raise UnsupportedShardQuery(f"Unexpected {keyword} clause")
+        last = position
+        stop = found[i + 1][0] if i + 1 < len(found) else len(sql)
+        clauses[keyword] = sql[end:stop].strip()
+    return clauses
+
+
+@dataclass
+class _SelectItem:
+    expr: str
+    alias: Optional[str]
+
+    @property
+    def name(self) -> str:
+        """The result column name SQLite gives this item"""
+        if self.alias:
+            return self.alias
+        match = _COLUMN_REF.match(self.expr)
+        return match.group(1) if match else self.expr
+
+
+def _select_item(text: str) -> _SelectItem:
+    flat = _blank(text)
+    matches = list(_AS.finditer(flat))
+    if matches:
+        m = matches[-1]
+        return _SelectItem(text[:m.start()].strip(), text[m.end():].strip().strip('"`[]'))
+    match = _TRAILING_WORD.match(flat)
+    if match and match.group(2).upper() not in _KEYWORDS and not match.group(1).rstrip().endswith("."):
+        expr = text[:len(match.group(1))]
+        return _SelectItem(expr.strip(), match.group(2))
+    return _SelectItem(text.strip(), None)
+
+
+@dataclass
+class _AggregateCall:
+    start: int
+    end: int
+    function: str
+    args: str
+
+
+def _aggregate_calls(expr: str) -> List[_AggregateCall]:
+    """Outermost aggregate calls in `expr`; multi-argument MIN/MAX are scalar functions and are looked inside"""
+    flat = _blank(expr, nested=False)
+    calls = []
+    position = 0
+    while True:
+        match = _AGGREGATE.search(flat, position)
+        if not match:
+            return calls
+        depth, close = 0, None
+        for i in range(match.end() - 1, len(flat)):
+            if flat[i] == "(":
+                depth += 1
+            elif flat[i] == ")":
+                depth -= 1
+                if depth == 0:
+                    close = i
+                    break
+        if close is None:
+            raise UnsupportedShardQuery("Unbalanced parentheses")
+        function = match.group(1).upper()
+        args = expr[match.end():close].strip()
+        if function in ("MIN", "MAX") and len(_split_top(args)) > 1:
+            position = match.end()
+            continue
+        if function in ("GROUP_CONCAT", "STRING_AGG") or re.match(r"DISTINCT\b", args, re.IGNORECASE):
+            raise UnsupportedShardQuery(f"{function}({args}) can't be merged across shards")
+        calls.append(_AggregateCall(match.start(), close + 1, function, args))
+        position = close + 1
+
+
+def _parse_limit(clauses: Dict[str, str]) -> Tuple[Optional[int], int]:
+    limit_text = clauses.get("LIMIT")
+    offset = int(clauses["OFFSET"]) if "OFFSET" in clauses else 0
+    if limit_text is None:
+        return None, offset
+    parts = _split_top(limit_text)
+    try:
+        if len(parts) == 2:
+            # LIMIT <offset>, <count>
+            return int(parts[1]), int(parts[0])
+        return int(parts[0]), offset
+    except ValueError:
+        raise UnsupportedShardQuery("LIMIT and OFFSET must be integer literals on sharded databases")
+
+
+def _without_limit(clauses: Dict[str, str], drop: Tuple[str, ...] = ("LIMIT", "OFFSET")) -> str:
+    return " ".join(f"{keyword} {clauses[keyword]}" for keyword in _CLAUSE_ORDER if keyword in clauses and keyword not in drop)
+
+
+class _SortKey:
+    """Orders rows the way SQLite does: NULLs first, then numbers, text and blobs; per-column direction"""
+    __slots__ = ("values", "spec")
+
+    def __init__(self, values: tuple, spec: Tuple[Tuple[bool, bool], ...]):
+        self.values = values
+        self.spec = spec  # (descending, nulls_first) per column
+
+    @staticmethod
+    def _rank(value) -> int:
+        if isinstance(value, (int, float)):
+            return 1
+        if isinstance(value, bytes):
+            return 3
+        return 2
+
+    def __lt__(self, other: "_SortKey") -> bool:
+        for a, b, (descending, nulls_first) in zip(self.values, other.values, self.spec):
+            if a is None or b is None:
+                if a is None and b is None:
+                    continue
+                return (a is None) == nulls_first
+            rank_a, rank_b = self._rank(a), self._rank(b)
+            if rank_a != rank_b:
+                return (rank_a < rank_b) != descending
+            if a == b:
+                continue
+            try:
+                less = a < b
+            except TypeError:
+                less = str(a) < str(b)
+            return less != descending
+        return False
+
+
+@dataclass
+class ShardPlan:
+    """How to run a query on every shard and combine the partial results"""
+    shard_sql: str
+    merge: Callable[[List[Tuple[List[str], List[tuple]]]], Tuple[List[str], List[tuple]]]
+    kind: str
+    notes: List[str] = field(default_factory=list)
+
+
+def plan_query(sql: str) -> ShardPlan:
+    """Plan `sql` (optionally wrapped by the API's row cap) for fan-out.
+
+    Plain selects are concatenated, or k-way merged when ordered, with the
+    LIMIT pushed down to every shard. Aggregates are split into per-shard
+    partials (AVG as SUM and COUNT) and re-aggregated in memory, where
+    HAVING, ORDER BY and LIMIT are applied. Each shard must be
+    self-contained: rows that join must live on the same shard, and small
+    dimension tables are expected on every shard.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    cap = _ROW_CAP.match(sql)
+    inner = cap.group(1) if cap else sql
+    cap_limit, cap_offset = (int(cap.group(2)), int(cap.group(3))) if cap else (None, 0)
+
+    clauses = _clauses(inner)
+    select = clauses["SELECT"]
+    if re.search(r"\bOVER\b", _blank(select), re.IGNORECASE):
+        raise UnsupportedShardQuery("Window functions can't be merged across shards")
+    distinct = bool(re.match(r"DISTINCT\b", select, re.IGNORECASE))
+    if distinct:
+        select = select[len("DISTINCT"):].strip()
+    items = [_select_item(text) for text in _split_top(select)]
+    aggregated = "GROUP BY" in clauses or "HAVING" in clauses or any(_aggregate_calls(item.expr) for item in items)
+
+    if aggregated:
+        if distinct:
+            raise UnsupportedShardQuery("SELECT DISTINCT with aggregates can't be merged across shards")
+        return _aggregate_plan(clauses, items, cap_limit, cap_offset)
+    return _select_plan(clauses, items, distinct, cap_limit, cap_offset)
+
+
+def _select_plan(clauses: Dict[str, str], items: List[_SelectItem], distinct: bool,
+                 cap_limit: Optional[int], cap_offset: int) -> ShardPlan:
+    limit, offset = _parse_limit(clauses)
+    # Rows needed from the front of the merged stream
+    needed = None
+    if limit is not None:
+        needed = offset + limit if cap_limit is None else offset + min(limit, cap_offset + cap_limit)
+    elif cap_limit is not None:
+        needed = offset + cap_offset + cap_limit
+
+    star = any(item.expr == "*" or item.expr.endswith(".*") for item in items)
+    order_items = []  # (select position or hidden column name, nocase, descending, nulls_first)
+    hidden = []
+    for text in _split_top(clauses.get("ORDER BY", "")):
+        expr, collation, direction, nulls = _ORDER_ITEM.match(text).groups()
+        expr = _norm(expr)
+        descending = (direction or "").upper() == "DESC"
+        nulls_first = (nulls.upper() == "FIRST") if nulls else not descending
+        target: Union[int, str, None] = None
+        if expr.isdigit() and not star and 0 < int(expr) <= len(items):
+            target = int(expr) - 1
+        elif not star:
+            target = next(
+                (i for i, item in enumerate(items) if expr in (_norm(item.expr), item.alias, item.name)), None
+            )
+        if target is None:
+            match = _COLUMN_REF.match(expr)
+            if star and match:
+                target = match.group(1)  # looked up in the shard's columns
+            elif distinct:
+                raise UnsupportedShardQuery(f"ORDER BY {expr} must name a selected column with SELECT DISTINCT")
+            else:
+                # Sort on a column the caller didn't select: carry it as a hidden trailing column
+                target = f"hq_s{len(hidden)}"
+                hidden.append(f"{expr} AS {target}")
+        order_items.append((target, (collation or "").upper() == "NOCASE", descending, nulls_first))
+
+    shard_clauses = dict(clauses)
+    if hidden:
+        shard_clauses["SELECT"] = f"{clauses['SELECT']}, {', '.join(hidden)}"
+    shard_sql = _without_limit(shard_clauses)
+    if needed is not None and not distinct:
+        shard_sql += f" LIMIT {needed}"
+
+    def merge(partials):
+        columns = next((cols for cols, _ in partials if cols), [])
+        if order_items:
+            positions = []
+            for target, nocase, _, _ in order_items:
+                if isinstance(target, str):
+                    if target not in columns:
+                        raise UnsupportedShardQuery(f"ORDER BY {target} must name a selected column on sharded databases")
+                    target = columns.index(target)
+                positions.append((target, nocase))
+            spec = tuple((descending, nulls_first) for _, _, descending, nulls_first in order_items)
+
+            def key(row):
+                return _SortKey(
+                    tuple(row[i].lower() if nocase and isinstance(row[i], str) else row[i] for i, nocase in positions),
+                    spec,
+                )
+            rows = heapq.merge(*(rows for _, rows in partials), key=key)
+        else:
+            rows = (row for _, rows in partials for row in rows)
+        if distinct:
+            rows = iter(dict.fromkeys(rows))
+        merged = list(rows) if needed is None else [row for _, row in zip(range(needed), rows)]
+        merged = merged[offset:offset + limit] if limit is not None else merged[offset:]
+        if cap_limit is not None:
+            merged = merged[cap_offset:cap_offset + cap_limit]
+        if hidden:
+            columns = columns[:-len(hidden)]
+            merged = [row[:-len(hidden)] for row in merged]
+        return columns, merged
+
+    return ShardPlan(shard_sql, merge, "merge" if order_items else "concat")
+
+
+def _aggregate_plan(clauses: Dict[str, str], items: List[_SelectItem],
+                    cap_limit: Optional[int], cap_offset: int) -> ShardPlan:
+    if any(item.expr == "*" or item.expr.endswith(".*") for item in items):
+        raise UnsupportedShardQuery("SELECT * can't be combined with aggregates on sharded databases")
+    if any(re.search(r"\bSELECT\b", _blank(text, nested=False), re.IGNORECASE)
+           for text in [clauses["SELECT"], clauses.get("HAVING", ""), clauses.get("ORDER BY", "")]):
+        raise UnsupportedShardQuery("Subqueries next to aggregates can't be merged across shards")
+
+    # Group keys: positions and aliases resolve to the select expression
+    keys = []
+    for text in _split_top(clauses.get("GROUP BY", "")):
+        expr = text
+        if text.isdigit() and 0 < int(text) <= len(items):
+            expr = items[int(text) - 1].expr
+        else:
+            for item in items:
+                if item.alias and text.strip('"`[]') == item.alias and not _aggregate_calls(item.expr):
+                    expr = item.expr
+        keys.append(_norm(expr))
+    key_names = {expr: f"hq_g{i}" for i, expr in enumerate(keys)}
+
+    partial_columns: List[str] = []
+    finals: Dict[str, str] = {}
+
+    def partial(expr: str) -> str:
+        name = f"hq_p{len(partial_columns)}"
+        partial_columns.append(f"{expr} AS {name}")
+        return name
+
+    def final_for(call: _AggregateCall) -> str:
+        signature = f"{call.function}({_norm(call.args)})"
+        if signature not in finals:
+            if call.function == "AVG":
+                total, count = partial(f"SUM({call.args})"), partial(f"COUNT({call.args})")
+                finals[signature] = f"(CAST(SUM({total}) AS REAL) / NULLIF(SUM({count}), 0))"
+            elif call.function == "COUNT":
+                finals[signature] = f"SUM({partial(f'COUNT({call.args})')})"
+            else:
+                finals[signature] = f"{call.function}({partial(f'{call.function}({call.args})')})"
+        return finals[signature]
+
+    def rewrite(expr: str) -> str:
+        """Express `expr` over the partials table: aggregates become re-aggregations, keys their columns"""
+        calls = _aggregate_calls(expr)
+        pieces, position = [], 0
+        for call in calls:
+            pieces.append(_replace_keys(expr[position:call.start], key_names))
+            pieces.append(final_for(call))
+            position = call.end
+        pieces.append(_replace_keys(expr[position:], key_names))
+        return "".join(pieces)
+
+    bare_columns: List[str] = []
+    final_items = []
+    for item in items:
+        if _aggregate_calls(item.expr) or _norm(item.expr) in key_names:
+            expr = rewrite(item.expr)
+        else:
+            # A bare column next to aggregates (e.g. a name grouped by id): carry one value per group
+            name = f"hq_b{len(bare_columns)}"
+            bare_columns.append(f"{item.expr} AS {name}")
+            expr = f"MIN({name})"
+        final_items.append(f'{expr} AS "{item.name.replace(chr(34), chr(34) * 2)}"')
+    having = rewrite(clauses["HAVING"]) if "HAVING" in clauses else None
+    order_by = ", ".join(rewrite(text) for text in _split_top(clauses.get("ORDER BY", "")))
+
+    shard_select = [f"{expr} AS {name}" for expr, name in key_names.items()] + bare_columns + partial_columns
+    shard_sql = f"SELECT {', '.join(shard_select)} {_without_limit(clauses, drop=('SELECT', 'GROUP BY', 'HAVING', 'ORDER BY', 'LIMIT', 'OFFSET'))}"
+    if keys:
+        shard_sql += " GROUP BY " + ", ".join(key_names.values())
+
+    final_sql = f"SELECT {', '.join(final_items)} FROM hq_partials"
+    if keys:
+        final_sql += " GROUP BY " + ", ".join(key_names.values())
+    if having:
+        final_sql += f" HAVING {having}"
+    if order_by:
+        final_sql += f" ORDER BY {order_by}"
+    if "OFFSET" in clauses and "LIMIT" not in clauses:
+        raise UnsupportedShardQuery("OFFSET without LIMIT")
+    limit, offset = _parse_limit(clauses)
+    if cap_limit is not None:
+        # Merged into one LIMIT; a wrapping SELECT * would rename duplicate column names
+        limit = cap_limit if limit is None else max(0, min(cap_limit, limit - cap_offset))
+        offset += cap_offset
+    if limit is not None:
+        final_sql += f" LIMIT {limit} OFFSET {offset}"
+
+    def merge(partials):
+        width = len(shard_select)
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute(f"CREATE TABLE hq_partials ({', '.join(column.rsplit(' AS ', 1)[1] for column in shard_select)})")
+            placeholders = ", ".join("?" * width)
+            for _, rows in partials:
+                conn.executemany(f"INSERT INTO hq_partials VALUES ({placeholders})", rows)
+            try:
+                cursor = conn.execute(final_sql)
+            except sqlite3.Error as e:
+                raise UnsupportedShardQuery(f"Could not merge shard results ({str(e)})")
+            return [col[0] for col in cursor.description], cursor.fetchall()
+        finally:
+            conn.close()
+
+    return ShardPlan(shard_sql, merge, "aggregate", [final_sql])
+
+
+def _replace_keys(text: str, key_names: Dict[str, str]) -> str:
+    for expr in sorted(key_names, key=len, reverse=True):
+        match = _COLUMN_REF.match(expr)
+        if match:
+            # c.customer_id also matches a bare customer_id; a bare key matches any qualifier
+            qualifier = expr[:expr.rindex(".") + 1] if "." in expr else None
+            prefix = rf"(?:{re.escape(qualifier)})?" if qualifier else r'(?:(?:"[^"]+"|\w+)\.)?'
+            pattern = rf'(?<![\w."]){prefix}"?{re.escape(match.group(1))}"?(?![\w(])'
+        else:
+            pattern = rf"(?<![\w.]){re.escape(expr)}(?!\w)"
+        text = re.sub(pattern, key_names[expr], text)
+    return text
+
+
+_executors: Dict[str, Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_shard_executor(kind: str = None, workers: int = None) -> Executor:
+    """Shared pool for shard queries: processes so scans use every core, or threads"""
+    kind = kind or settings.SHARD_EXECUTOR
+    workers = workers or settings.SHARD_WORKERS or os.cpu_count() or 1
+    key = f"{kind}:{workers}"
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            if kind == "process":
+                # spawn: forking a process that runs thread pools is unsafe
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hq-shard")
+            _executors[key] = executor
+        return executor
+
+
+def shutdown_shard_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ShardedConnector(DatabaseConnector):
+    """Runs every query on all shard files in parallel and merges the results.
+
+    The first shard doubles as the primary: its pool serves schema
+    introspection and plan checks, and its result cache stores merged
+    results keyed by the data version of every shard. Tables listed in a
+    `hq_shards(table_name, shard_key)` table are partitioned; the rest are
+    reference tables copied to every shard, so queries touching only those
+    run on the primary alone. Without `hq_shards` every table counts as
+    partitioned.
+    """
+
+    def __init__(self, shard_paths: List[str], decode_types: bool = None, executor: Executor = None):
+        super().__init__(shard_paths[0], decode_types)
+        self.shard_paths = list(shard_paths)
+        self.decode_types = settings.DECODE_TYPES if decode_types is None else decode_types
+        self._versions = [get_result_cache(path, self.decode_types) for path in self.shard_paths]
+        self._executor = executor
+        self._plans: Dict[str, ShardPlan] = {}
+        self._plans_lock = threading.Lock()
+        self._partitioned: Optional[Set[str]] = None
+        self._partitioned_loaded = False
+        self._running = 0  # fan-outs in flight; shard workers use their own connections, not the pool
+        self._running_lock = threading.Lock()
+        # Metrics
+        self.fanouts = 0
+        self.single_shard = 0
+        self.shard_rows = 0
+        self.merged_rows = 0
+        self.unsupported = 0
+        self.fanout_time = 0.0
+        self.merge_time = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor or get_shard_executor()
+
+    def plan(self, query: str) -> ShardPlan:
+        key = normalize_sql(query)
+        with self._plans_lock:
+            plan = self._plans.get(key)
+        if plan is None:
+            try:
+                plan = plan_query(query)
+            except UnsupportedShardQuery:
+                self.unsupported += 1
+                raise
+            with self._plans_lock:
+                if len(self._plans) >= 1024:
+                    self._plans.clear()
+                self._plans[key] = plan
+        return plan
+
+    def partitioned_tables(self) -> Optional[Set[str]]:
+        """Lower-cased partitioned table names from `hq_shards`, or None if every table is"""
+        if not self._partitioned_loaded:
+            with self.get_connection() as conn:
+                try:
+                    rows = conn.execute("SELECT table_name FROM hq_shards").fetchall()
+                    self._partitioned = {row[0].lower() for row in rows}
+                except sqlite3.OperationalError:
+                    self._partitioned = None
+            self._partitioned_loaded = True
+        return self._partitioned
+
+    def fans_out(self, query: str) -> bool:
+        partitioned = self.partitioned_tables()
+        if partitioned is None:
+            return True
+        # Every table in every FROM clause, comma joins and subqueries included
+        return any(table.lower() in partitioned for table in set(resolve_aliases(query).values()))
+
+    def data_version(self) -> tuple:
+        return tuple(cache.data_version() for cache in self._versions)
+
+    def file_version(self) -> tuple:
+        return tuple(file_version(path) for path in self.shard_paths)
+
+    def busy(self) -> bool:
+        return self._running > 0 or super().busy()
+
+    def _fan_out(self, query: str) -> Tuple[List[str], List[tuple]]:
+        with self._running_lock:
+            self._running += 1
+        try:
+            return self._fan_out_merge(query)
+        finally:
+            with self._running_lock:
+                self._running -= 1
+
+    def _fan_out_merge(self, query: str) -> Tuple[List[str], List[tuple]]:
+        plan = self.plan(query)
+        with self.get_connection() as conn, stage("plan"):
+            shard_shape, params = self._bind(conn, plan.shard_sql)
+            self.cost_guard.check(conn, shard_shape, params)
+
+        started = time.perf_counter()
+        with stage("execute"):
+            futures = [
+                self.executor.submit(
+                    run_shard, path, shard_shape, params, self.decode_types,
+                    self.cost_guard.timeout_ms, self.cost_guard.max_vm_steps,
+                )
+                for path in self.shard_paths
+            ]
+            try:
+                partials = [future.result() for future in futures]
+            except QueryCostError:
+                self.cost_guard.aborted += 1
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+        fanned_out = time.perf_counter()
+        with stage("merge"):
+            columns, rows = plan.merge(partials)
+        self.fanouts += 1
+        self.shard_rows += sum(len(rows) for _, rows in partials)
+        self.merged_rows += len(rows)
+        self.fanout_time += fanned_out - started
+        self.merge_time += time.perf_counter() - fanned_out
+        logger.info(f"Fanned out to {len(self.shard_paths)} shards ({plan.kind}), merged {len(rows)} rows")
+        elapsed = time.perf_counter() - started
+        shape = self._parameterize(query).shape
+        self.shapes.record(shape, elapsed, len(rows))
+        self._notify(shape, elapsed)
+        return columns, rows
+
+    def execute_safe_query(
+        self, query: str, use_cache: bool = True, as_tuples: bool = False
+    ) -> Tuple[List[Union[Dict[str, Any], tuple]], List[str]]:
+        """Fan the query out to every shard and merge, serving repeats from the result cache"""
+        logger.debug(f"Executing sharded query: {query}")
+        self._check_allowed(query)
+        if not self.fans_out(query):
+            self.single_shard += 1
+            return super().execute_safe_query(query, use_cache, as_tuples)
+
+        use_cache = use_cache and self.result_cache.enabled
+        if use_cache:
+            cache_key = ("tuples:" if as_tuples else "") + normalize_sql(query)
+            version = self.data_version()
+            cached = self.result_cache.get(cache_key, version)
+            if cached is not None:
+                return cached
+
+        columns, rows = self._fan_out(query)
+        results = rows if as_tuples else [dict(zip(columns, row)) for row in rows]
+        if use_cache:
+            self.result_cache.put(cache_key, version, results, columns)
+        return results, columns
+
+    def stream_query(
+        self, query: str, batch_size: int = None, monitor: QueryMonitor = None
+    ) -> Iterator[Union[List[str], List[tuple]]]:
+        """Merged results in batches; the merge needs every shard's rows first, so memory isn't flat here.
+
+        Shard workers can't be interrupted from here, so a `monitor` only
+        cancels between the fan-out and the batches.
+        """
+        self._check_allowed(query)
+        if not self.fans_out(query):
+            self.single_shard += 1
+            yield from super().stream_query(query, batch_size, monitor)
+            return
+        batch_size = batch_size or settings.STREAM_BATCH_SIZE
+        columns, rows = self._fan_out(query)
+        yield columns
+        for start in range(0, len(rows), batch_size):
+            if monitor is not None and monitor.cancelled:
+                raise QueryCancelled("Query cancelled")
+            yield [tuple(row) for row in rows[start:start + batch_size]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shards": len(self.shard_paths),
+            "fanouts": self.fanouts,
+            "single_shard": self.single_shard,
+            "shard_rows": self.shard_rows,
+            "merged_rows": self.merged_rows,
+            "unsupported": self.unsupported,
+            "avg_fanout_ms": self.fanout_time / self.fanouts * 1000 if self.fanouts else 0.0,
+            "avg_merge_ms": self.merge_time / self.fanouts * 1000 if self.fanouts else 0.0,
+        }
@@ -1,19 +1,63 @@
-from fastapi import FastAPI, HTTPException, Depends
+import time
+# Import time is measured from here, before the framework imports
+_import_started = time.perf_counter()
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from typing import Dict
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from pathlib import Path
+import json
 import os
+import asyncio
+import contextvars
+import sqlite3
 import logging
 logger = logging.getLogger(__name__)
 # Local imports
 from .config import settings
-from .database.connector import DatabaseConnector
+from .database.registry import Database, DatabaseLeaseMiddleware, DatabaseRegistry, UnknownDatabaseError
+from .database.result_cache import normalize_sql
+from .database.sharding import shutdown_shard_executors
+from .database.cost_guard import QueryCancelled, QueryCostError
 from .services.query_service import QueryService
+from .services.translation_cache import normalize_question
 from .services.html_generator import HTMLGenerator
+from .services.result_formatter import FORMATS, ResultFormatter
+from .services.concurrency import AdmissionGate, BlockingRunner, Overloaded
+from .services.single_flight import SingleFlight
+from .services.metrics import MetricsMiddleware, MetricsRegistry, SamplingProfiler, record_rows, stage
+from .services.export import (
+    COMPRESSIONS, EXPORT_FORMATS, ExportSpool, ExportStats, export_chunks, export_etag, filename, make_compressor,
+    media_type, parse_range, read_file,
+)
+from .services.jobs import Job, JobLimitError, JobManager
+from .services.pagination import apply_row_cap, clamp_page_size, decode_page_token, encode_page_token
+from .services.startup import FirstRequestMiddleware, StartupTracker
+
+startup = StartupTracker(_import_started)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Serving frontend from {FRONTEND_DIR}")
+    warmup = None
+    if settings.WARMUP:
+        # In the background, so the server accepts connections and answers
+        # readiness probes while the pool, schema and clients come up
+        warmup = asyncio.create_task(_warm_up())
+    else:
+        startup.ready = True
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            warmup.cancel()
+        jobs.shutdown()
+        shutdown_shard_executors()
 
 # Initialize app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure paths
 BASE_DIR = Path(__file__).parent.parent
@@ -23,11 +67,70 @@ FRONTEND_DIR = BASE_DIR / "frontend"
 if not FRONTEND_DIR.exists():
     raise RuntimeError(f"Frontend directory not found at: {FRONTEND_DIR}")
 
-# Initialize services
-db = DatabaseConnector()
-query_service = QueryService()
+# Initialize services; constructors are cheap and touch neither the DB nor the
+# network, heavy setup happens lazily or in the warm-up task
+# Every named database gets its own pool, caches, schema prompt, rollups
+# and index advisor; tenants load on first use and close when idle
+registry = DatabaseRegistry(
+    {**settings.DATABASES, settings.DEFAULT_DATABASE: settings.DATABASE_PATH},
+    default=settings.DEFAULT_DATABASE,
+    directory=settings.DATABASE_DIR,
+    idle_timeout=settings.DATABASE_IDLE_TIMEOUT,
+    max_open=settings.DATABASE_MAX_OPEN,
+    cache_bytes=settings.RESULT_CACHE_MAX_BYTES // max(1, settings.DATABASE_MAX_OPEN),
+)
+query_service = QueryService(schema_manager=registry.default.schema)
 html_gen = HTMLGenerator()
 
+# Admission control: bounded LLM calls and DB work so one slow request
+# can't stall the event loop for everyone else
+llm_gate = AdmissionGate("llm", settings.LLM_MAX_CONCURRENCY, settings.ADMISSION_QUEUE_SIZE)
+db_runner = BlockingRunner("db", settings.DB_MAX_CONCURRENCY, settings.ADMISSION_QUEUE_SIZE)
+
+# Identical questions / SQL arriving together share one LLM call / one execution
+translations = SingleFlight("translate")
+executions = SingleFlight("execute")
+
+# Full-result downloads, kept on disk for a while so they can be resumed
+export_spool = ExportSpool(settings.EXPORT_SPOOL_DIR, settings.EXPORT_SPOOL_TTL, settings.EXPORT_SPOOL_MAX_BYTES)
+export_stats = ExportStats()
+
+# Long-running queries submitted as jobs run on their own threads, results spooled to disk
+job_runner = BlockingRunner("jobs", settings.JOB_WORKERS, settings.JOB_MAX_ACTIVE)
+jobs = JobManager(
+    settings.JOB_SPOOL_DIR,
+    ttl=settings.JOB_TTL,
+    max_per_user=settings.JOB_MAX_PER_USER,
+    max_active=settings.JOB_MAX_ACTIVE,
+    batch_size=settings.EXPORT_BATCH_SIZE,
+    timeout_ms=settings.JOB_TIMEOUT_MS,
+)
+
+# Instrumentation: per-stage timers, Server-Timing, /metrics and sampled profiles
+metrics = MetricsRegistry()
+metrics.register_stats("hq_databases", "Database registry", registry.stats)
+metrics.register_stats("hq_db_pool", "Connection pool (default database)", lambda: registry.default.db.pool.stats())
+metrics.register_stats("hq_result_cache", "Result cache (default database)", lambda: registry.default.db.result_cache.stats())
+metrics.register_stats("hq_translation_cache", "Translation cache", lambda: query_service.cache.stats())
+metrics.register_stats("hq_llm_prompt", "LLM prompt size", lambda: query_service.stats())
+metrics.register_stats("hq_llm_client", "LLM client", lambda: query_service.client_stats())
+metrics.register_stats("hq_cost_guard", "Cost guard (default database)", lambda: registry.default.db.cost_guard.stats())
+metrics.register_stats("hq_query_shapes", "Query shapes (default database)", lambda: registry.default.db.shapes.stats())
+metrics.register_stats("hq_rollups", "Rollup rewrite (default database)", lambda: registry.default.rollups.stats())
+metrics.register_stats("hq_llm_gate", "LLM admission gate", llm_gate.stats)
+metrics.register_stats("hq_db_gate", "DB admission gate", db_runner.gate.stats)
+metrics.register_stats("hq_translate_flights", "Coalesced translations", translations.stats)
+metrics.register_stats("hq_execute_flights", "Coalesced executions", executions.stats)
+metrics.register_stats("hq_export", "Exports", export_stats.stats)
+metrics.register_stats("hq_jobs", "Query jobs", jobs.stats)
+metrics.register_stats("hq_job_gate", "Job worker gate", job_runner.gate.stats)
+profiler = SamplingProfiler(settings.PROFILE_SAMPLE_RATE, settings.PROFILE_DIR, settings.PROFILE_KEEP)
+metrics.register_stats("hq_startup", "Startup", startup.stats)
+app.add_middleware(FirstRequestMiddleware, tracker=startup)
+app.add_middleware(MetricsMiddleware, registry=metrics, profiler=profiler)
+# A database a request resolved is not evicted before the response is done
+app.add_middleware(DatabaseLeaseMiddleware, registry=registry)
+
 # CORS Setup
 app.add_middleware(
     CORSMiddleware,
@@ -41,24 +144,52 @@ app.add_middleware(
 async def handle_query(payload: Dict):
     try:
         logger.info(f"New query: {payload}")
-        user_query = payload.get("query", "").strip()
-        
-        if not user_query:
-            logger.warning("Empty query received")
-            raise HTTPException(status_code=400, detail="Empty query")
+        page_token = payload.get("page_token")
+        result_format = payload.get("format", "html")
+        if result_format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of {list(FORMATS)}")
+
+        if page_token:
+            # Later pages re-run the stored SQL without another LLM round trip
+            try:
+                sql, offset, page_size, database_name = decode_page_token(page_token)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            database = _database(database_name)
+        else:
+            user_query = payload.get("query", "").strip()
+
+            if not user_query:
+                logger.warning("Empty query received")
+                raise HTTPException(status_code=400, detail="Empty query")
+
+            try:
+                page_size = clamp_page_size(payload.get("page_size"))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid page_size")
+            database = _database(payload.get("database"))
+
+            # SQL Generation
+            logger.debug("Generating SQL...")
+            sql_response = await _translate(user_query, database)
+            logger.info(f"Generated SQL: {sql_response.sql}")
+            sql, offset = sql_response.sql, 0
 
-        # SQL Generation
-        logger.debug("Generating SQL...")
-        sql_response = query_service.generate_sql(user_query)
-        logger.info(f"Generated SQL: {sql_response.sql}")
+        if payload.get("stream"):
+            return await _stream_query(sql, offset, page_size, result_format, database)
 
         # Query Execution
         try:
             logger.debug("Executing database query...")
-            print(f"Query received {sql_response}")
-            results, columns = db.execute_safe_query(sql_response.sql)
+            results, columns = await _execute(
+                apply_row_cap(sql, page_size, offset), as_tuples=result_format != "html", database=database
+            )
             logger.debug(f"Execution results: {type(results)}, {type(columns)}")
             logger.info(f"Received {len(results)} rows, {len(columns)} columns")
+            record_rows(len(results))
+        except QueryCostError as e:
+            logger.error(f"Query exceeded cost limits: {str(e)}")
+            raise HTTPException(status_code=422, detail=str(e))
         except RuntimeError as e:
             logger.error(f"Query execution failed: {str(e)}")
             raise HTTPException(status_code=400, detail=str(e))
@@ -72,20 +203,484 @@ async def handle_query(payload: Dict):
             logger.error("Columns missing with non-empty results")
             raise HTTPException(status_code=500, detail="Data format mismatch")
 
+        if result_format != "html":
+            # Compact format: columns once, positional data, rendered by the client
+            with stage("render"):
+                content = ResultFormatter.dumps(_page_payload(sql, offset, page_size, result_format, results, columns, database))
+            return Response(content=content, media_type="application/json")
+
         logger.debug("Generating HTML response...")
-        return {
-            "sql": sql_response.sql,
-            "html": html_gen.generate_table(results, columns),
-            "columns": columns,
-            "row_count": len(results)
-        }
+        return _page_payload(sql, offset, page_size, result_format, results, columns, database)
 
     except HTTPException as he:
         logger.error(f"HTTP Error {he.status_code}: {he.detail}")
         raise
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.critical(f"System failure: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
+
+def _database(name: Optional[str]) -> Database:
+    """The database a request selects (the default if none), 404 for unknown names"""
+    try:
+        return registry.get(name)
+    except UnknownDatabaseError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def _translate(question: str, database: Database):
+    """Question -> SQL through the LLM gate; concurrent identical questions share one call"""
+    async def translate():
+        async with llm_gate.slot():
+            return await query_service.agenerate_sql(question, database, prompt_schema)
+
+    # Loads (or re-checks) the database's schema prompt off the event loop;
+    # translation and validation then work from it without touching the pool
+    prompt_schema = await db_runner.run(query_service.load_schema, database.schema)
+    # The cache key: only questions that would share a cached translation share a
+    # flight, so "> 100" and "< 100" never ride on one another's LLM call
+    key = query_service.cache.make_key(question, prompt_schema.fingerprint)
+    return await translations.do((database.name, key), translate)
+
+async def _execute(sql: str, as_tuples: bool, database: Database):
+    """Run SQL on the database's pool; concurrent identical statements share one execution"""
+    return await executions.do(
+        (database.path, normalize_sql(sql), as_tuples),
+        lambda: db_runner.run(database.db.execute_safe_query, sql, as_tuples=as_tuples),
+    )
+
+def _page_payload(sql: str, offset: int, page_size: int, result_format: str, results: list, columns: list,
+                  database: Database) -> dict:
+    """Response body for one page of results in the requested format"""
+    # The row cap fetches one extra row to tell whether another page exists
+    has_more = len(results) > page_size
+    results = results[:page_size]
+    with stage("render"):
+        if result_format == "html":
+            data = html_gen.generate_table(results, columns)
+        elif result_format == "rows":
+            data = results
+        else:
+            data = ResultFormatter.to_columns(results, columns)
+    return {
+        "sql": sql,
+        "database": database.name,
+        "columns": columns,
+        result_format: data,
+        "row_count": len(results),
+        "offset": offset,
+        "has_more": has_more,
+        "next_page_token": encode_page_token(sql, offset + page_size, page_size, database.name) if has_more else None,
+        "export_token": encode_page_token(sql, 0, page_size, database.name),
+    }
+
+def _error_status(error: Exception) -> int:
+    """HTTP status for a failed query, matching /api/query's error mapping"""
+    if isinstance(error, HTTPException):
+        return error.status_code
+    if isinstance(error, QueryCostError):
+        return 422
+    if isinstance(error, Overloaded):
+        return 503
+    if isinstance(error, (RuntimeError, ValueError)):
+        return 400
+    return 500
+
+@app.post("/api/query/batch")
+async def handle_batch(payload: Dict):
+    """Translate and run many questions at once; duplicates are answered once.
+
+    Translation concurrency per batch is capped below the LLM gate so one
+    batch can't monopolise the provider's rate limit; execution runs in
+    parallel on pooled connections. Each item carries its own status.
+    """
+    started = time.perf_counter()
+    questions = payload.get("queries")
+    if not isinstance(questions, list) or not questions:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list")
+    if len(questions) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_QUERIES} queries per batch")
+    result_format = payload.get("format", "rows")
+    if result_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(FORMATS)}")
+    try:
+        page_size = clamp_page_size(payload.get("page_size"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid page_size")
+    database = _database(payload.get("database"))
+
+    # Duplicates share the translation cache key, which keeps comparison
+    # operators: "total > 100" and "total < 100" are two questions
+    questions = [str(question).strip() for question in questions]
+    keys = [normalize_question(question) for question in questions]
+    unique: Dict[str, str] = {}
+    for key, question in zip(keys, questions):
+        unique.setdefault(key, question)
+    translation_slots = asyncio.Semaphore(max(1, settings.BATCH_TRANSLATION_CONCURRENCY))
+
+    async def answer(question: str) -> dict:
+        try:
+            if not question:
+                raise HTTPException(status_code=400, detail="Empty query")
+            async with translation_slots:
+                sql = (await _translate(question, database)).sql
+            results, columns = await _execute(
+                apply_row_cap(sql, page_size, 0), as_tuples=result_format != "html", database=database
+            )
+            record_rows(min(len(results), page_size))
+            return {"status": 200, **_page_payload(sql, 0, page_size, result_format, results, columns, database)}
+        except Exception as e:
+            status = _error_status(e)
+            if status == 500:
+                logger.critical(f"Batch item failed: {str(e)}", exc_info=True)
+            detail = e.detail if isinstance(e, HTTPException) else str(e) if status != 500 else "Internal server error"
+            return {"status": status, "error": detail}
+
+    answers = dict(zip(unique, await asyncio.gather(*(answer(q) for q in unique.values()))))
+    items = []
+    for index, (key, question) in enumerate(zip(keys, questions)):
+        items.append({"index": index, "query": question, **answers[key]})
+    logger.info(f"Batch of {len(questions)} queries ({len(unique)} unique) in {time.perf_counter() - started:.3f}s")
+    return Response(
+        content=ResultFormatter.dumps({
+            "count": len(questions),
+            "unique": len(unique),
+            "failed": sum(1 for item in items if item["status"] != 200),
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "results": items,
+        }),
+        media_type="application/json"
+    )
+
+async def _warm_up():
+    """Open pool connections, load the schema prompt, create the LLM clients and
+    bring rollups up to date for the default database; retried until it is
+    reachable. Other databases load on first use."""
+    while True:
+        startup.warmup_attempts += 1
+        started = time.perf_counter()
+        try:
+            database = registry.default
+            with startup.phase("pool"):
+                await db_runner.run(database.db.pool.warm)
+            with startup.phase("schema"):
+                await db_runner.run(query_service.load_schema, database.schema)
+            with startup.phase("llm_client"):
+                await asyncio.to_thread(query_service.warm)
+            if database.rollups.enabled:
+                with startup.phase("rollups"):
+                    await db_runner.run(_prime_rollups, database)
+            startup.warmed(time.perf_counter() - started)
+            return
+        except Exception as e:
+            startup.warmup_error = str(e)
+            logger.warning(f"Warm-up failed ({str(e)}), retrying in {settings.WARMUP_RETRY_INTERVAL}s")
+            await asyncio.sleep(settings.WARMUP_RETRY_INTERVAL)
+
+def _prime_rollups(database: Database):
+    # An optimisation only: an unwritable rollup file or a busy database must not block readiness
+    try:
+        database.rollups.refresh()
+    except sqlite3.Error as e:
+        logger.warning(f"Rollup refresh skipped during warm-up: {str(e)}")
+
+def _ping():
+    with registry.default.db.get_connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+
+@app.get("/api/ready")
+async def readiness():
+    """Readiness probe: 200 once warm-up has finished and the database answers, 503 before"""
+    status = startup.stats()
+    if not startup.ready:
+        return JSONResponse({"status": "starting", "error": startup.warmup_error, **status}, status_code=503)
+    try:
+        await db_runner.run(_ping)
+    except (sqlite3.Error, RuntimeError, Overloaded) as e:
+        return JSONResponse({"status": "unavailable", "error": str(e), **status}, status_code=503)
+    return {"status": "ready", **status}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of latency histograms and component stats"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/profiles")
+async def recent_profiles():
+    """Summaries of the latest sampled request profiles; full dumps are in PROFILE_DIR"""
+    return profiler.recent()
+
+@app.get("/api/index-advice")
+async def index_advice(database: Optional[str] = None):
+    """Index candidates for a database's recorded workload, ranked by expected benefit"""
+    return await db_runner.run(_database(database).index_advisor.report)
+
+@app.get("/api/query-shapes")
+async def query_shapes(database: Optional[str] = None, limit: int = 20, sort: str = "total_ms"):
+    """Statistics per query shape (the SQL with its literals bound as `?`), most expensive first"""
+    if sort not in ("total_ms", "avg_ms", "max_ms", "executions", "avg_rows"):
+        raise HTTPException(status_code=400, detail="sort must be total_ms, avg_ms, max_ms, executions or avg_rows")
+    shapes = _database(database).db.shapes
+    return {**shapes.stats(), "top": shapes.top(max(1, min(limit, 200)), by=sort)}
+
+@app.get("/api/databases")
+async def list_databases():
+    """Databases that can be queried, and which of them are currently loaded"""
+    return registry.describe()
+
+async def _stream_query(sql: str, offset: int, page_size: int, result_format: str,
+                        database: Database) -> StreamingResponse:
+    """Execute up front so SQL errors still map to 400, then stream NDJSON row batches"""
+    try:
+        # The stream keeps its DB slot while the client reads, since it holds a pooled connection
+        columns, rows = await db_runner.stream(database.db.stream_query(apply_row_cap(sql, page_size, offset)))
+    except QueryCostError as e:
+        logger.error(f"Query exceeded cost limits: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        logger.error(f"Query execution failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        yield json.dumps({"type": "meta", "sql": sql, "database": database.name, "columns": columns,
+                          "offset": offset, "format": result_format,
+                          "export_token": encode_page_token(sql, 0, page_size, database.name)}) + "\n"
+        row_count = 0
+        has_more = False
+        try:
+            async for batch in db_runner.iterate(rows):
+                if row_count + len(batch) > page_size:
+                    batch = batch[:page_size - row_count]
+                    has_more = True
+                if batch:
+                    row_count += len(batch)
+                    with stage("render"):
+                        if result_format == "html":
+                            message = {"type": "rows", "html": html_gen.generate_rows(batch), "count": len(batch)}
+                        elif result_format == "rows":
+                            message = {"type": "rows", "rows": batch, "count": len(batch)}
+                        else:
+                            message = {"type": "rows", "columns": ResultFormatter.to_columns(batch, columns), "count": len(batch)}
+                        line = ResultFormatter.dumps(message) + "\n"
+                    yield line
+        except RuntimeError as e:
+            logger.error(f"Streaming failed after {row_count} rows: {str(e)}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        logger.info(f"Streamed {row_count} rows, {len(columns)} columns")
+        record_rows(row_count)
+        yield json.dumps({
+            "type": "end",
+            "row_count": row_count,
+            "has_more": has_more,
+            "next_page_token": encode_page_token(sql, offset + page_size, page_size, database.name) if has_more else None
+        }) + "\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.get("/api/export")
+async def export(request: Request, token: str, format: str = "csv", compression: str = "gzip"):
+    """Download the full result of a query as compressed CSV or JSON Lines.
+
+    `token` is the `export_token` (or any page token) of a query response;
+    the SQL runs again without the page row cap and is streamed straight
+    from the cursor, EXPORT_BATCH_SIZE rows at a time. The bytes are also
+    spooled to disk under an ETag covering the query, encoding and data
+    version, so `Range` requests can resume an interrupted download.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(EXPORT_FORMATS)}")
+    try:
+        make_compressor(compression)
+        sql, _, _, database_name = decode_page_token(token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    database = _database(database_name)
+    # Not PRAGMA data_version: a fresh connection reports 1 again, and spooled
+    # files outlive connections, tenant reloads and worker processes
+    version = await asyncio.to_thread(database.db.file_version)
+    etag = export_etag(sql, database.name, format, compression, version)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{filename(f"export-{database.name}", format, compression)}"',
+    }
+    content_type = media_type(format, compression)
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) != etag:
+        range_header = None  # the data changed since the first download: start over
+
+    path = export_spool.complete(etag)
+    if range_header and path is None:
+        # Resuming needs the exact bytes sent before, so build the whole file first
+        columns, rows = await _open_export(sql, database)
+        chunks = export_chunks(columns, rows, format, compression, export_stats, export_spool.writer(etag), f"{database.name}: ")
+        await db_runner.run_admitted(lambda: sum(len(chunk) for chunk in chunks))
+        path = export_spool.complete(etag)
+    if path is not None:
+        export_stats.record_replay()
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_range(range_header, size) if range_header else None
+        except ValueError as e:
+            raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range or (0, size - 1)
+        headers["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return StreamingResponse(read_file(path, start, end), status_code=206 if byte_range else 200,
+                                 media_type=content_type, headers=headers)
+
+    columns, rows = await _open_export(sql, database)
+    chunks = export_chunks(columns, rows, format, compression, export_stats, export_spool.writer(etag), f"{database.name}: ")
+    return StreamingResponse(db_runner.iterate(chunks), media_type=content_type, headers=headers)
+
+async def _open_export(sql: str, database: Database):
+    """Start the query and read its columns, so SQL errors still map to 400/422 before streaming"""
+    try:
+        columns, rows = await db_runner.stream(database.db.stream_query(sql, batch_size=settings.EXPORT_BATCH_SIZE))
+    except QueryCostError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return columns, rows
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: Request, payload: Dict):
+    """Queue a question for translation and execution in the background and return its job id at once.
+
+    For queries that outlast HTTP or proxy timeouts: poll GET /api/jobs/{id}
+    or follow /api/jobs/{id}/events, then read the spooled result.
+    """
+    question = str(payload.get("query", "")).strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty query")
+    database = _database(payload.get("database"))
+    try:
+        job = jobs.submit(_job_owner(request), question, database.name)
+    except JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    # A fresh context: the job outlives this request, its stage timer and its database lease
+    registry.acquire(database)
+    job.task = asyncio.create_task(_run_job(job, database), context=contextvars.Context())
+    job.task.add_done_callback(lambda _: registry.release(database))
+    return job.snapshot()
+
+@app.get("/api/jobs")
+async def list_jobs(request: Request):
+    """The caller's jobs, oldest first"""
+    return [job.snapshot() for job in jobs.list(_job_owner(request))]
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    return _job(request, job_id).snapshot()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-sent events: `progress` (rows, VM steps, elapsed time) every JOB_PROGRESS_INTERVAL,
+    then one `done`, `failed` or `cancelled` event"""
+    job = _job(request, job_id)
+
+    async def body():
+        while True:
+            snapshot = job.snapshot()
+            event = "progress" if job.active else job.status
+            yield f"event: {event}\ndata: {ResultFormatter.dumps(snapshot)}\n\n"
+            if event != "progress":
+                return
+            await asyncio.sleep(settings.JOB_PROGRESS_INTERVAL)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(request: Request, job_id: str, offset: int = 0, page_size: Optional[int] = None,
+                     format: str = "columns"):
+    """One page of a finished job's result, as `rows` or `columns`"""
+    if format not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail="format must be rows or columns")
+    try:
+        page_size = clamp_page_size(page_size)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid page_size")
+    job = _finished_job(request, job_id)
+    offset = max(0, offset)
+    rows = await asyncio.to_thread(jobs.read_page, job, offset, page_size + 1)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    return Response(
+        content=ResultFormatter.dumps({
+            "job_id": job.id,
+            "sql": job.sql,
+            "columns": job.columns,
+            format: rows if format == "rows" else ResultFormatter.to_columns(rows, job.columns),
+            "row_count": len(rows),
+            "total_rows": job.rows,
+            "offset": offset,
+            "has_more": has_more,
+        }),
+        media_type="application/json"
+    )
+
+@app.get("/api/jobs/{job_id}/download")
+async def job_download(request: Request, job_id: str):
+    """The spooled result file: gzipped JSON Lines, the column names first, then one array per row"""
+    job = _finished_job(request, job_id)
+    return FileResponse(job.path, media_type="application/gzip", filename=f"job-{job.id}.jsonl.gz")
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(request: Request, job_id: str):
+    """Cancel an active job (its statement is interrupted), or delete a finished one and its result"""
+    job = _job(request, job_id)
+    if not jobs.cancel(job):
+        jobs.remove(job)
+    return job.snapshot()
+
+def _job_owner(request: Request) -> str:
+    owner = request.headers.get(settings.JOB_USER_HEADER)
+    if owner:
+        return owner
+    return request.client.host if request.client else "anonymous"
+
+def _job(request: Request, job_id: str) -> Job:
+    job = jobs.get(job_id, _job_owner(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+def _finished_job(request: Request, job_id: str) -> Job:
+    job = _job(request, job_id)
+    if job.status != "done":
+        detail = f"Job is {job.status}" + (f": {job.error}" if job.error else "")
+        raise HTTPException(status_code=409, detail=detail)
+    return job
+
+async def _run_job(job: Job, database: Database):
+    """Translate, then execute on a job worker; the outcome is recorded on the job, never raised"""
+    try:
+        job.status = "translating"
+        while True:
+            try:
+                job.sql = (await _translate(job.question, database)).sql
+                break
+            except Overloaded:
+                # Nobody is waiting on a response, so wait for capacity instead of failing
+                await asyncio.sleep(1.0)
+        job.status = "queued"
+        await job_runner.run(jobs.execute, job, database.db)
+        jobs.finish(job, "done")
+    except (asyncio.CancelledError, QueryCancelled):
+        jobs.finish(job, "cancelled")
+    except Exception as e:
+        status = _error_status(e)
+        if status == 500:
+            logger.critical(f"Job {job.id} failed: {str(e)}", exc_info=True)
+        detail = e.detail if isinstance(e, HTTPException) else str(e) if status != 500 else "Internal server error"
+        jobs.finish(job, "failed", detail, status)
+
 # Serve frontend files
 app.mount(
     "/", 
@@ -93,11 +688,4 @@ app.mount(
     name="frontend"
 )
 
-# Debug output
-print(f"\n{'='*50}")
-print(f"Frontend path: {FRONTEND_DIR}")
-print(f"Directory exists: {FRONTEND_DIR.exists()}")
-print(f"Files found: {len(list(FRONTEND_DIR.glob('*')))} files")
-print(f"Index.html exists: {(FRONTEND_DIR/'index.html').exists()}")
-print(f"Current working directory: {os.getcwd()}")
-print(f"{'='*50}\n")
\ No newline at end of file
+startup.imported()
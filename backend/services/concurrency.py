@@ -0,0 +1,148 @@
+# backend/services/concurrency.py
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Tuple
+
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def _close_quietly(iterator: Iterator):
+    close = getattr(iterator, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except ValueError:
+        # Still running in another thread; it is closed when that step returns
+        pass
+
+
+def _holding(iterator: Iterator, release: Callable[[], None]) -> Iterator:
+    """`iterator`, calling `release` once it is exhausted, closed or garbage collected"""
+    try:
+        yield from iterator
+    finally:
+        release()
+
+
+class Overloaded(Exception):
+    """Raised when a gate's wait queue is full; surfaced as HTTP 503"""
+
+
+class AdmissionGate:
+    """Caps in-flight work and rejects new arrivals once the queue is full"""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int):
+        self.name = name
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self._sem = asyncio.Semaphore(self.max_in_flight)
+        self._waiting = 0
+        self._in_flight = 0
+        self._rejected = 0
+
+    async def acquire(self):
+        """Wait for a slot, or raise Overloaded when the queue is full; pair with release()"""
+        if self._sem.locked() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            logger.warning(f"{self.name} gate full: {self._in_flight} in flight, {self._waiting} queued")
+            raise Overloaded(f"Server busy ({self.name}), try again shortly")
+
+        self._waiting += 1
+        try:
+            with stage(f"{self.name}_queue"):
+                await self._sem.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def release(self):
+        self._in_flight -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "rejected": self._rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
+
+
+class BlockingRunner:
+    """Runs blocking callables on a bounded thread pool behind an admission gate"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.gate = AdmissionGate(name, max_workers, max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=f"hq-{name}")
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        async with self.gate.slot():
+            loop = asyncio.get_running_loop()
+            # Carry the request context (stage timer) into the worker thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.executor, partial(context.run, fn, *args, **kwargs))
+
+    async def stream(self, iterator: Iterator) -> Tuple[Any, Iterator]:
+        """Admit a blocking iterator that holds a resource between steps, e.g. a cursor on a pooled connection.
+
+        Returns its first item and the iterator, which keeps the gate slot
+        until it is exhausted, closed or dropped, so slow readers count as
+        in flight. Drive the rest with iterate() or run_admitted(), which
+        don't take another slot.
+        """
+        await self.gate.acquire()
+        loop = asyncio.get_running_loop()
+
+        def release():
+            try:
+                loop.call_soon_threadsafe(self.gate.release)
+            except RuntimeError:
+                pass  # the loop is gone, and the gate with it
+
+        held = _holding(iterator, release)
+        try:
+            first = await self.run_admitted(next, held)
+        except BaseException:
+            _close_quietly(held)
+            raise
+        return first, held
+
+    async def run_admitted(self, fn: Callable, *args, **kwargs):
+        """Run on the pool without a gate slot, for work on behalf of an admitted stream"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, partial(context.run, fn, *args, **kwargs))
+
+    async def iterate(self, iterator: Iterator) -> AsyncIterator:
+        """Drive an iterator admitted by stream() on the pool, step by step"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            while True:
+                item = await loop.run_in_executor(self.executor, context.run, next, iterator, _DONE)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            loop.run_in_executor(self.executor, _close_quietly, iterator)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
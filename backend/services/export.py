@@ -0,0 +1,308 @@
+# backend/services/export.py
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import zlib
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .result_formatter import ResultFormatter
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "jsonl")
+COMPRESSIONS = ("gzip", "zstd", "none")
+_MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "gzip": "application/gzip", "zstd": "application/zstd"}
+_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def make_compressor(compression: str, level: int = None):
+    """A compressobj-style `compress`/`flush` pair; output is deterministic so byte ranges stay stable"""
+    if compression == "gzip":
+        # wbits=31 writes a gzip header, with mtime 0 unlike the gzip module
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    if compression == "none":
+        return _Identity()
+    raise ValueError(f"compression must be one of {list(COMPRESSIONS)}")
+
+
+def media_type(result_format: str, compression: str) -> str:
+    return _MEDIA_TYPES[compression if compression != "none" else result_format]
+
+
+def filename(stem: str, result_format: str, compression: str) -> str:
+    return f"{stem}.{result_format}{_SUFFIXES[compression]}"
+
+
+def export_etag(sql: str, database: str, result_format: str, compression: str, version: Any) -> str:
+    """Identifies the exact bytes of an export: same query, encoding and data give the same file.
+
+    `version` must change with the data across connections and processes,
+    since spooled files are shared by every worker and survive restarts.
+    """
+    key = "\0".join([sql, database, result_format, compression, repr(version)])
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+
+def encode_batches(columns: List[str], batches: Iterator[List[tuple]], result_format: str) -> Iterator[bytes]:
+    """Encode row batches as CSV (with a header row) or JSON Lines, one chunk per batch"""
+    if result_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows([v.hex() if isinstance(v, bytes) else v for v in row] for row in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    else:
+        for batch in batches:
+            yield "".join(ResultFormatter.dumps(dict(zip(columns, row))) + "\n" for row in batch).encode()
+
+
+class ExportStats:
+    """Totals and throughput of finished exports"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.exports = 0
+        self.failed = 0
+        self.replayed = 0
+        self.rows = 0
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+        self.seconds = 0.0
+        self.last_rows_per_sec = 0.0
+        self.last_mb_per_sec = 0.0
+
+    def record(self, rows: int, bytes_raw: int, bytes_sent: int, seconds: float):
+        seconds = max(seconds, 1e-9)
+        with self._lock:
+            self.exports += 1
+            self.rows += rows
+            self.bytes_raw += bytes_raw
+            self.bytes_sent += bytes_sent
+            self.seconds += seconds
+            self.last_rows_per_sec = rows / seconds
+            self.last_mb_per_sec = bytes_raw / seconds / 1e6
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def record_replay(self):
+        with self._lock:
+            self.replayed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "exports": self.exports,
+                "failed": self.failed,
+                "replayed": self.replayed,
+                "rows": self.rows,
+                "bytes_raw": self.bytes_raw,
+                "bytes_sent": self.bytes_sent,
+                "compression_ratio": self.bytes_raw / self.bytes_sent if self.bytes_sent else 0.0,
+                "rows_per_sec": self.rows / self.seconds if self.seconds else 0.0,
+                "mb_per_sec": self.bytes_raw / self.seconds / 1e6 if self.seconds else 0.0,
+                "last_rows_per_sec": self.last_rows_per_sec,
+                "last_mb_per_sec": self.last_mb_per_sec,
+            }
+
+
+class _SpoolWriter:
+    def __init__(self, spool: "ExportSpool", etag: str):
+        self.spool = spool
+        self.final_path = spool.path(etag)
+        self.part_path = f"{self.final_path}.{os.getpid()}.{threading.get_ident()}.part"
+        self.file = open(self.part_path, "wb")
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        if self.file is None:
+            return
+        self.size += len(chunk)
+        if self.size > self.spool.max_bytes:
+            # Too big to keep: this download just won't be resumable
+            self.abort()
+            return
+        self.file.write(chunk)
+
+    def commit(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        os.replace(self.part_path, self.final_path)
+
+    def abort(self):
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+
+
+class ExportSpool:
+    """Finished export files on disk, by ETag, so interrupted downloads can resume with Range.
+
+    Exports are written here as they stream; files older than `ttl` are
+    removed, and exports over `max_bytes` aren't kept.
+    """
+
+    def __init__(self, directory: str = "", ttl: float = 3600.0, max_bytes: int = 1024 ** 3):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "hq-exports")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._last_sweep = 0.0
+
+    def path(self, etag: str) -> str:
+        return os.path.join(self.directory, etag.strip('"') + ".export")
+
+    def complete(self, etag: str) -> Optional[str]:
+        path = self.path(etag)
+        try:
+            if time.time() - os.path.getmtime(path) < self.ttl:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def writer(self, etag: str) -> _SpoolWriter:
+        os.makedirs(self.directory, exist_ok=True)
+        self.sweep()
+        return _SpoolWriter(self, etag)
+
+    def sweep(self):
+        now = time.time()
+        if now - self._last_sweep < min(60.0, self.ttl):
+            return
+        self._last_sweep = now
+        try:
+            entries = os.listdir(self.directory)
+        except OSError:
+            return
+        for entry in entries:
+            path = os.path.join(self.directory, entry)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def export_chunks(
+    columns: List[str],
+    batches: Iterator[List[tuple]],
+    result_format: str,
+    compression: str,
+    stats: ExportStats,
+    spool_writer: Optional[_SpoolWriter] = None,
+    label: str = "",
+) -> Iterator[bytes]:
+    """Encode and compress row batches as they come off the cursor; memory is bounded by one batch"""
+    compressor = make_compressor(compression)
+    started = time.perf_counter()
+    rows = bytes_raw = bytes_sent = 0
+    finished = False
+
+    def counted(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    try:
+        for data in encode_batches(columns, counted(batches), result_format):
+            bytes_raw += len(data)
+            chunk = compressor.compress(data)
+            if chunk:
+                bytes_sent += len(chunk)
+                if spool_writer is not None:
+                    spool_writer.write(chunk)
+                yield chunk
+        chunk = compressor.flush()
+        bytes_sent += len(chunk)
+        if spool_writer is not None:
+            spool_writer.write(chunk)
+            spool_writer.commit()
+        finished = True
+        yield chunk
+    finally:
+        # Hand the pooled connection back even when the client went away mid-download
+        close = getattr(batches, "close", None)
+        if close is not None:
+            close()
+        if spool_writer is not None and not finished:
+            spool_writer.abort()
+        if finished:
+            seconds = time.perf_counter() - started
+            stats.record(rows, bytes_raw, bytes_sent, seconds)
+            logger.info(
+                f"Exported {label}{rows} rows as {result_format}/{compression}: {bytes_raw / 1e6:.1f} MB raw, "
+                f"{bytes_sent / 1e6:.1f} MB sent in {seconds:.2f}s "
+                f"({rows / max(seconds, 1e-9):,.0f} rows/s, {bytes_raw / max(seconds, 1e-9) / 1e6:.1f} MB/s)"
+            )
+        else:
+            stats.record_failure()
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single `bytes=` range; None to send the whole file.
+
+    Raises ValueError when the range can't be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # other units and multipart ranges: fall back to a full response
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range not satisfiable for {size} bytes")
+    return start, end
+
+
+def read_file(path: str, start: int, end: int, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
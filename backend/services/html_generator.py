@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Sequence
 
 class HTMLGenerator:
     @staticmethod
@@ -22,6 +22,14 @@ class HTMLGenerator:
         </div>
         """
 
+    @staticmethod
+    def generate_rows(rows: List[Sequence]) -> str:
+        """Render a batch of positional rows as bare <tr> markup for streaming"""
+        return "".join(
+            f"<tr>{''.join(f'<td>{value}</td>' for value in row)}</tr>"
+            for row in rows
+        )
+
     @staticmethod
     def error_template(message: str) -> str:
         """Standard error display template"""
@@ -0,0 +1,232 @@
+# backend/services/jobs.py
+import gzip
+import itertools
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+import logging
+from typing import Any, Dict, List, Optional
+
+from ..database.cost_guard import QueryMonitor
+from .concurrency import Overloaded
+from .result_formatter import ResultFormatter
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ("queued", "translating", "running")
+
+
+class JobLimitError(Exception):
+    """Raised when a user already has the maximum number of active jobs; surfaced as HTTP 429"""
+
+
+class Job:
+    """One submitted question: its state, progress and, once done, the spooled result"""
+
+    def __init__(self, job_id: str, owner: str, question: str, database: str, timeout_ms: int):
+        self.id = job_id
+        self.owner = owner
+        self.question = question
+        self.database = database
+        self.sql: Optional[str] = None
+        self.status = "queued"
+        self.columns: Optional[List[str]] = None
+        self.rows = 0
+        self.error: Optional[str] = None
+        self.error_status: Optional[int] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.path: Optional[str] = None
+        self.monitor = QueryMonitor(timeout_ms)
+        self.task = None  # the asyncio task driving translation and execution
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.created
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "database": self.database,
+            "query": self.question,
+            "sql": self.sql,
+            "columns": self.columns,
+            "rows": self.rows,
+            "vm_steps": self.monitor.vm_steps,
+            "elapsed_ms": self.elapsed() * 1000,
+            "cancel_requested": self.monitor.cancelled and self.active,
+            "error": self.error,
+            "error_status": self.error_status,
+        }
+
+
+class JobManager:
+    """Bookkeeping for asynchronous query jobs and their spooled results.
+
+    Results are written as gzipped JSON Lines: the column names, then one
+    array per row. Finished jobs and their files are dropped `ttl` seconds
+    after they end; each owner may have `max_per_user` jobs queued or running.
+    """
+
+    def __init__(
+        self,
+        directory: str = "",
+        ttl: float = 3600.0,
+        max_per_user: int = 2,
+        max_active: int = 16,
+        batch_size: int = 5000,
+        timeout_ms: int = 0,
+    ):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "hq-jobs")
+        self.ttl = ttl
+        self.max_per_user = max(1, max_per_user)
+        self.max_active = max(1, max_active)
+        self.batch_size = batch_size
+        self.timeout_ms = timeout_ms
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rows = 0
+
+    def submit(self, owner: str, question: str, database: str) -> Job:
+        self.sweep()
+        with self._lock:
+            active = [job for job in self._jobs.values() if job.active]
+            if sum(1 for job in active if job.owner == owner) >= self.max_per_user:
+                self.rejected += 1
+                raise JobLimitError(f"At most {self.max_per_user} active jobs per user")
+            if len(active) >= self.max_active:
+                self.rejected += 1
+                raise Overloaded("Server busy (jobs), try again shortly")
+            job = Job(secrets.token_urlsafe(12), owner, question, database, self.timeout_ms)
+            self._jobs[job.id] = job
+            self.submitted += 1
+        logger.info(f"Job {job.id} submitted by {owner}: {question}")
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[Job]:
+        """The job if it exists and belongs to `owner`"""
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.owner == owner else None
+
+    def list(self, owner: str) -> List[Job]:
+        self.sweep()
+        with self._lock:
+            return sorted((job for job in self._jobs.values() if job.owner == owner), key=lambda job: job.created)
+
+    def execute(self, job: Job, db):
+        """Run the job's SQL and spool the rows; blocking, so it runs on a worker thread"""
+        job.status = "running"
+        job.started = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{job.id}.jsonl.gz")
+        part = f"{path}.part"
+        rows = db.stream_query(job.sql, batch_size=self.batch_size, monitor=job.monitor)
+        try:
+            job.columns = next(rows)
+            # Level 1: the spool is written while the query runs and is read back once or twice
+            with gzip.open(part, "wt", compresslevel=1) as f:
+                f.write(ResultFormatter.dumps(job.columns) + "\n")
+                for batch in rows:
+                    f.write("".join(ResultFormatter.dumps(row) + "\n" for row in batch))
+                    job.rows += len(batch)
+            os.replace(part, path)
+            job.path = path
+        finally:
+            rows.close()
+            if job.path is None and os.path.exists(part):
+                os.remove(part)
+
+    def finish(self, job: Job, status: str, error: str = None, error_status: int = None):
+        job.status = status
+        job.error = error
+        job.error_status = error_status
+        job.finished = time.time()
+        with self._lock:
+            if status == "done":
+                self.completed += 1
+                self.rows += job.rows
+            elif status == "cancelled":
+                self.cancelled += 1
+            else:
+                self.failed += 1
+        logger.info(f"Job {job.id} {status} after {job.elapsed():.2f}s, {job.rows} rows"
+                    + (f": {error}" if error else ""))
+
+    def cancel(self, job: Job) -> bool:
+        """Interrupt a running statement, or stop a job that hasn't reached the database yet"""
+        if not job.active:
+            return False
+        job.monitor.cancel()
+        if job.status != "running" and job.task is not None:
+            job.task.cancel()
+        return True
+
+    def remove(self, job: Job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        if job.path is not None:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def read_page(self, job: Job, offset: int, limit: int) -> List[list]:
+        """Rows `offset`..`offset + limit` of a finished job's result"""
+        with gzip.open(job.path, "rt") as f:
+            return [json.loads(line) for line in itertools.islice(f, 1 + offset, 1 + offset + limit)]
+
+    def sweep(self):
+        """Drop jobs finished more than `ttl` ago, and result files no job refers to any more"""
+        now = time.time()
+        if now - self._last_sweep < min(60.0, self.ttl):
+            return
+        self._last_sweep = now
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished and now - job.finished > self.ttl]
+        for job in expired:
+            self.remove(job)
+        try:
+            entries = os.listdir(self.directory)
+        except OSError:
+            return
+        for entry in entries:
+            path = os.path.join(self.directory, entry)
+            try:
+                # Left behind by an earlier process
+                if entry.split(".")[0] not in self._jobs and now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            self.cancel(job)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            return {
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "queued": sum(1 for job in jobs if job.status in ("queued", "translating")),
+                "running": sum(1 for job in jobs if job.status == "running"),
+                "kept": len(jobs),
+                "rows": self.rows,
+            }
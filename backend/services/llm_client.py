@@ -0,0 +1,308 @@
+# backend/services/llm_client.py
+import asyncio
+import random
+import sys
+import threading
+import time
+import logging
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMTimeoutError(TimeoutError):
+    """One attempt took longer than the client's per-attempt timeout"""
+
+
+def _transient_types() -> tuple:
+    # The HTTP stack is imported lazily; if it isn't loaded, none of its errors can be in flight
+    types = [TimeoutError, ConnectionError]
+    if "httpx" in sys.modules:
+        types.append(sys.modules["httpx"].TransportError)
+    if "groq" in sys.modules:
+        types.append(sys.modules["groq"].APIConnectionError)
+    return tuple(types)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection failures, 429s and 5xx are worth another attempt; anything else is final"""
+    transient = _transient_types()
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, transient):
+            return True
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int) and (status in _RETRYABLE_STATUS or status >= 500):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Client-side rate limiter: `rate` requests per second with bursts up to `burst`.
+
+    Callers reserve a token up front, so waiters are served in arrival order
+    even while the bucket is in debt. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds to wait before using it"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            wait = -self._tokens / self.rate
+            self.throttled += 1
+            self.throttled_seconds += wait
+            return wait
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now"""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+
+class _ClientBase:
+    """Shared configuration and accounting for the sync and async wrappers"""
+
+    def __init__(
+        self,
+        inner,
+        limiter: TokenBucket = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.25,
+        backoff_max: float = 8.0,
+    ):
+        self.inner = inner
+        self.limiter = limiter or TokenBucket(0)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Same call shape as the instructor client: client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=self)
+        self._latencies = deque(maxlen=500)
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential backoff, stretched to the server's Retry-After if it sent one"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _should_retry(self, attempt: int, error: BaseException) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.failures += 1
+            return False
+        self.retries += 1
+        return True
+
+    def latency_percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        samples = sorted(self._latencies)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.latency_percentile(95)
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "throttled": self.limiter.throttled,
+            "throttled_seconds": self.limiter.throttled_seconds,
+            "p95_ms": p95 * 1000 if p95 is not None else 0.0,
+        }
+
+
+class LLMClient(_ClientBase):
+    """Blocking wrapper: rate limit, per-attempt timeout (enforced by the HTTP client) and jittered retries"""
+
+    def create(self, **kwargs):
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.limiter.acquire_sync()
+            self.attempts += 1
+            started = time.monotonic()
+            try:
+                result = self.inner.chat.completions.create(**kwargs)
+                self._latencies.append(time.monotonic() - started)
+                return result
+            except Exception as e:
+                if isinstance(e, TimeoutError):
+                    self.timeouts += 1
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                logger.warning(f"LLM call failed ({type(e).__name__}: {str(e)}), retry {attempt} in {delay:.2f}s")
+                time.sleep(delay)
+
+
+class AsyncLLMClient(_ClientBase):
+    """Async wrapper adding optional hedging: if the first attempt is slower
+    than the recent p95 (or a fixed delay), a second one races it and the
+    first success wins. Hedges only fire when the rate limiter has a token
+    to spare, so they never push the client over quota.
+    """
+
+    def __init__(self, inner, limiter: TokenBucket = None, hedge: str = "off", hedge_delay: float = 2.0, **kwargs):
+        super().__init__(inner, limiter, **kwargs)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def _attempt(self, kwargs: dict, acquire: bool = True):
+        if acquire:
+            await self.limiter.acquire()
+        self.attempts += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.inner.chat.completions.create(**kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"LLM call timed out after {self.timeout}s")
+        self._latencies.append(time.monotonic() - started)
+        return result
+
+    def _hedge_after(self) -> Optional[float]:
+        if self.hedge == "fixed":
+            return self.hedge_delay
+        if self.hedge == "p95":
+            # Until there is enough history, fall back to the fixed delay
+            p95 = self.latency_percentile(95)
+            return p95 if p95 is not None else self.hedge_delay
+        return None
+
+    async def _hedged(self, kwargs: dict):
+        delay = self._hedge_after()
+        if delay is None:
+            return await self._attempt(kwargs)
+
+        first = asyncio.ensure_future(self._attempt(kwargs))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.limiter.try_acquire():
+                self.hedges += 1
+                tasks.add(asyncio.ensure_future(self._attempt(kwargs, acquire=False)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged(kwargs)
+            except Exception as e:
+                if not self._should_retry(attempt, e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                logger.warning(f"LLM call failed ({type(e).__name__}: {str(e)}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+def build_groq_clients(limiter: TokenBucket = None) -> Tuple[LLMClient, AsyncLLMClient]:
+    """Instructor-wrapped Groq clients on keep-alive HTTP pools, sharing one rate limiter"""
+    # instructor pulls in the openai SDK; together they dominate import time, so load on first use
+    import groq
+    import httpx
+    import instructor
+
+    limiter = limiter or TokenBucket(settings.LLM_RATE_LIMIT_PER_MIN / 60, settings.LLM_BURST)
+    limits = httpx.Limits(
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+        keepalive_expiry=60.0,
+    )
+    timeout = httpx.Timeout(settings.LLM_TIMEOUT, connect=min(5.0, settings.LLM_TIMEOUT))
+    # Retries are ours; the SDK's own would multiply against the quota
+    common = dict(api_key=settings.GROQ_API_KEY, base_url=settings.LLM_BASE_URL or None, max_retries=0, timeout=timeout)
+    sync_client = instructor.from_groq(groq.Groq(http_client=httpx.Client(limits=limits, timeout=timeout), **common))
+    async_client = instructor.from_groq(
+        groq.AsyncGroq(http_client=httpx.AsyncClient(limits=limits, timeout=timeout), **common)
+    )
+    retry = dict(
+        timeout=settings.LLM_TIMEOUT,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base=settings.LLM_BACKOFF_BASE,
+        backoff_max=settings.LLM_BACKOFF_MAX,
+    )
+    return (
+        LLMClient(sync_client, limiter, **retry),
+        AsyncLLMClient(async_client, limiter, hedge=settings.LLM_HEDGE, hedge_delay=settings.LLM_HEDGE_DELAY, **retry),
+    )
@@ -0,0 +1,293 @@
+# backend/services/metrics.py
+import cProfile
+import contextvars
+import io
+import math
+import os
+import pstats
+import random
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar("hq_stage_timer", default=None)
+
+
+class StageTimer:
+    """Wall-clock seconds spent in each pipeline stage of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.rows: Optional[int] = None
+        self.prompt_tokens: Optional[int] = None
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value; durations in milliseconds"""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(entries)
+
+
+def current_timer() -> Optional[StageTimer]:
+    return _current_timer.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Attribute the enclosed block to `name` on the current request's timer, if any"""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+def record_rows(count: int):
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.rows = (timer.rows or 0) + count
+
+
+def record_prompt_tokens(count: int):
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.prompt_tokens = (timer.prompt_tokens or 0) + count
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus data model"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            pairs = tuple(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(pairs + (('le', _number(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(pairs + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Histograms plus gauges read from existing `stats()` methods, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._stats: List[Tuple[str, str, Callable[[], Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(name, help, labels, buckets)
+            return histogram
+
+    def register_stats(self, prefix: str, help: str, stats: Callable[[], Dict[str, Any]]):
+        """Expose every numeric field of `stats()` as a gauge named `<prefix>_<field>`"""
+        self._stats.append((prefix, help, stats))
+
+    def render(self) -> str:
+        lines = []
+        for histogram in list(self._histograms.values()):
+            lines += histogram.render()
+        for prefix, help, stats in self._stats:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Metrics collector {prefix} failed: {str(e)}")
+                continue
+            for field, value in values.items():
+                if not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{field}"
+                lines += [f"# HELP {name} {help}: {field}", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Runs cProfile on a random sample of requests and keeps the latest dumps.
+
+    Only one request is profiled at a time. Since Python 3.12 cProfile
+    observes every thread, so work on the DB thread pool is included, along
+    with anything else running concurrently.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, directory: str = "profiles", keep: int = 20):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self._recent = deque(maxlen=max(1, keep))
+        self._active = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool owns the interpreter hook
+            self._active.release()
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile, endpoint: str, timer: StageTimer):
+        profile.disable()
+        self._active.release()
+        duration_ms = (time.perf_counter() - timer.started) * 1000
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        path = os.path.join(self.directory, f"{stamp}{endpoint.replace('/', '_')}.prof")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(path)
+        except OSError as e:
+            logger.warning(f"Could not write profile: {str(e)}")
+            path = None
+
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(15)
+        self._recent.appendleft({
+            "file": path,
+            "endpoint": endpoint,
+            "duration_ms": duration_ms,
+            "stages_ms": {name: seconds * 1000 for name, seconds in timer.stages.items()},
+            "top": out.getvalue(),
+        })
+        logger.info(f"Profiled {endpoint} ({duration_ms:.1f} ms) -> {path}")
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return list(self._recent)
+
+
+def _endpoint(scope) -> str:
+    """Bounded label values: the matched route's template, "static" for the frontend, else "unmatched".
+
+    Read after routing, which records the route in the scope; paths like
+    /api/jobs/{job_id} would otherwise add a series per id.
+    """
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("endpoint") is not None and not scope.get("path", "").startswith("/api/"):
+        return "static"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-request stage timer, Server-Timing header, histograms and sampled profiling"""
+
+    def __init__(self, app, registry: MetricsRegistry, profiler: SamplingProfiler = None):
+        self.app = app
+        self.profiler = profiler
+        self.latency = registry.histogram(
+            "hq_request_duration_seconds", "Request latency", labels=("endpoint", "status"))
+        self.stages = registry.histogram(
+            "hq_stage_duration_seconds", "Time per pipeline stage", labels=("stage",))
+        self.rows = registry.histogram(
+            "hq_result_rows", "Rows returned per query", labels=("endpoint",), buckets=ROW_BUCKETS)
+        self.bytes = registry.histogram(
+            "hq_response_bytes", "Response body size", labels=("endpoint",), buckets=BYTE_BUCKETS)
+        self.prompt_tokens = registry.histogram(
+            "hq_prompt_tokens", "Estimated LLM prompt tokens sent per request", labels=("endpoint",),
+            buckets=TOKEN_BUCKETS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        profile = self.profiler.start() if self.profiler else None
+        status = 500
+        sent = 0
+
+        async def send_with_timing(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
+            endpoint = _endpoint(scope)
+            self.latency.observe(time.perf_counter() - timer.started, endpoint=endpoint, status=status)
+            for name, seconds in timer.stages.items():
+                self.stages.observe(seconds, stage=name)
+            if timer.rows is not None:
+                self.rows.observe(timer.rows, endpoint=endpoint)
+            self.bytes.observe(sent, endpoint=endpoint)
+            if timer.prompt_tokens is not None:
+                self.prompt_tokens.observe(timer.prompt_tokens, endpoint=endpoint)
+            if profile is not None:
+                self.profiler.finish(profile, endpoint, timer)
@@ -0,0 +1,93 @@
+# backend/services/pagination.py
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+from typing import Optional, Tuple
+
+from ..config import settings
+
+# Tokens carry SQL that we execute later, so they are signed. Without a
+# configured secret they are only valid for the lifetime of this process.
+_SECRET = (settings.PAGE_TOKEN_SECRET or os.urandom(32).hex()).encode()
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    if not page_size:
+        return settings.DEFAULT_PAGE_SIZE
+    return max(1, min(int(page_size), settings.MAX_PAGE_SIZE))
+
+
+# Literals, quoted names and comments match whole, so parentheses and keywords inside them don't count
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|\w+|\S", re.DOTALL)
+# A statement's own trailing LIMIT n [OFFSET m] or LIMIT m, n with literal values
+_LIMIT = re.compile(r"^LIMIT\s+(\d+)(?:\s*(,|\s+OFFSET\s+)\s*(\d+))?\s*$", re.IGNORECASE)
+
+
+def _top_level_limit(sql: str) -> Tuple[int, bool]:
+    """Offset of the statement's own LIMIT keyword (-1 if none), and whether it ends in a line comment"""
+    depth = 0
+    token = ""
+    for match in _TOKEN.finditer(sql):
+        token = match.group()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token.upper() == "LIMIT":
+            return match.start(), False
+    return -1, token.startswith("--")
+
+
+def apply_row_cap(sql: str, limit: int, offset: int = 0) -> str:
+    """Cap a SELECT at `limit + 1` rows from `offset`; the extra row signals another page.
+
+    The LIMIT goes on the statement itself, merged with one it already has,
+    so the column names are exactly those of the uncapped statement (a
+    wrapping subquery would rename duplicates, e.g. "id" to "id:1"). Only
+    a LIMIT with expressions still needs the wrapper.
+    """
+    sql = sql.strip().rstrip(";")
+    if not sql.upper().startswith(("SELECT", "WITH")):
+        return sql
+    cap, offset = int(limit) + 1, int(offset)
+    position, line_comment = _top_level_limit(sql)
+    if position < 0:
+        return f"{sql}{chr(10) if line_comment else ' '}LIMIT {cap} OFFSET {offset}"
+    match = _LIMIT.match(sql[position:])
+    if match is None:
+        return f"SELECT * FROM ({sql}) LIMIT {cap} OFFSET {offset}"
+    if match.group(2) == ",":
+        own_offset, own_limit = int(match.group(1)), int(match.group(3))
+    else:
+        own_limit, own_offset = int(match.group(1)), int(match.group(3) or 0)
+    return f"{sql[:position].rstrip()} LIMIT {max(0, min(cap, own_limit - offset))} OFFSET {own_offset + offset}"
+
+
+def _sign(body: bytes) -> str:
+    digest = hmac.new(_SECRET, body, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def encode_page_token(sql: str, offset: int, page_size: int, database: Optional[str] = None) -> str:
+    state = {"sql": sql, "offset": offset, "size": page_size}
+    if database:
+        state["db"] = database
+    body = json.dumps(state, separators=(",", ":")).encode()
+    encoded = base64.urlsafe_b64encode(body).decode().rstrip("=")
+    return f"{encoded}.{_sign(body)}"
+
+
+def decode_page_token(token: str) -> Tuple[str, int, int, Optional[str]]:
+    """Return (sql, offset, page_size, database) from a token, raising ValueError if it was tampered with"""
+    try:
+        encoded, signature = token.split(".", 1)
+        body = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+    except (ValueError, TypeError):
+        raise ValueError("Malformed page token")
+    if not hmac.compare_digest(signature, _sign(body)):
+        raise ValueError("Invalid page token")
+    state = json.loads(body)
+    return state["sql"], int(state["offset"]), clamp_page_size(state["size"]), state.get("db")
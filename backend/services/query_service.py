@@ -1,23 +1,127 @@
 #query_service.py
-import instructor
-from groq import Groq
 from pydantic import BaseModel
 from ..config import settings
-from ..database.schema_manager import SchemaManager
+from ..database.schema_manager import SchemaManager, TableInfo
+from .llm_client import build_groq_clients
+from .translation_cache import TranslationCache, fingerprint
+from .schema_index import SchemaIndex, estimate_tokens
+from .metrics import record_prompt_tokens, stage
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional
+from weakref import WeakKeyDictionary
+import asyncio
 import re
+import threading
+import logging
+
+if TYPE_CHECKING:
+    from ..database.registry import Database
+
+logger = logging.getLogger(__name__)
 
 class SQLResponse(BaseModel):
     sql: str
 
+class _PromptSchema(NamedTuple):
+    base_prompt: str
+    fingerprint: str
+    index: Optional[SchemaIndex]
+    full_tokens: int
+    schema_version: Optional[int]
+    tables: Dict[str, TableInfo]  # what the prompt was built from, for validation off the DB
+
 class QueryService:
-    def __init__(self):
-        self.client = instructor.from_groq(Groq(api_key=settings.GROQ_API_KEY))
-        self.schema_manager = SchemaManager()
-        self.base_prompt = f"""
+    def __init__(self, client=None, async_client=None, cache: TranslationCache = None,
+                 schema_manager: SchemaManager = None):
+        # Clients are injectable so tests and benchmarks can stub the LLM
+        self._client = client
+        self._async_client = async_client
+        self.cache = cache or TranslationCache(
+            max_entries=settings.TRANSLATION_CACHE_SIZE,
+            ttl=settings.TRANSLATION_CACHE_TTL,
+            disk_path=settings.TRANSLATION_CACHE_PATH or None,
+        )
+        # Defaults for calls that don't name a database
+        self.schema_manager = schema_manager or SchemaManager()
+        # The LLM clients and schema prompts are built on first use (or by
+        # warm()), so constructing the service touches neither network nor DB.
+        # Prompts are kept per schema and go away with their database.
+        self._prompt_schemas: "WeakKeyDictionary[SchemaManager, _PromptSchema]" = WeakKeyDictionary()
+        self._init_lock = threading.Lock()
+        self.prompts = 0
+        self.prompt_tokens_sent = 0
+        self.prompt_tokens_full = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._build_clients()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._build_clients()
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, value):
+        self._async_client = value
+
+    def _build_clients(self):
+        with self._init_lock:
+            if self._client is None or self._async_client is None:
+                client, async_client = build_groq_clients()
+                self._client = self._client or client
+                self._async_client = self._async_client or async_client
+
+    def load_schema(self, schema_manager: SchemaManager = None) -> _PromptSchema:
+        """Schema prompt, fingerprint and pruning index of a database, rebuilt when its schema_version changes"""
+        schema_manager = schema_manager or self.schema_manager
+        # Cheap when nothing changed: one PRAGMA schema_version on a pooled connection
+        schema_manager.get_tables()
+        prompt_schema = self._prompt_schemas.get(schema_manager)
+        if prompt_schema is None or prompt_schema.schema_version != schema_manager.schema_version:
+            with self._init_lock:
+                prompt_schema = self._prompt_schemas.get(schema_manager)
+                if prompt_schema is None or prompt_schema.schema_version != schema_manager.schema_version:
+                    tables = schema_manager.get_tables()
+                    version = schema_manager.schema_version
+                    base_prompt = self._build_prompt(schema_manager.get_schema_prompt())
+                    # Questions only see the tables they are likely to need
+                    schema_index = SchemaIndex(
+                        tables, max_tables=settings.SCHEMA_MAX_TABLES
+                    ) if settings.SCHEMA_PRUNING else None
+                    prompt_schema = _PromptSchema(
+                        base_prompt, fingerprint(base_prompt), schema_index, estimate_tokens(base_prompt), version, tables
+                    )
+                    self._prompt_schemas[schema_manager] = prompt_schema
+        return prompt_schema
+
+    @property
+    def base_prompt(self) -> str:
+        return self.load_schema().base_prompt
+
+    @property
+    def schema_fingerprint(self) -> str:
+        return self.load_schema().fingerprint
+
+    def warm(self):
+        """Load the schema prompt and create the LLM clients ahead of the first question"""
+        self.load_schema()
+        self.client
+        self.async_client
+
+    @staticmethod
+    def _build_prompt(schema: str) -> str:
+        return f"""
         You are a SQLite expert. Convert natural language queries to SQL following these rules:
         
         Database Schema:
-        {self.schema_manager.get_schema_prompt()}
+        {schema}
         
         SQLite-Specific Requirements:
         1. Use SQLite date functions (DATE(), STRFTIME())
@@ -39,48 +143,118 @@ class QueryService:
         LIMIT 10
         """
 
-    def generate_sql(self, user_query: str) -> SQLResponse:
-        response = self.client.chat.completions.create(
+    def _system_prompt(self, user_query: str, prompt_schema: _PromptSchema) -> str:
+        """Base prompt with the schema pruned to the tables relevant to `user_query`"""
+        prompt = prompt_schema.base_prompt
+        schema_index = prompt_schema.index
+        if schema_index is not None:
+            selected = schema_index.select(user_query)
+            if len(selected) < len(schema_index.tables):
+                tables = [schema_index.tables[name] for name in selected]
+                prompt = self._build_prompt(SchemaManager.format_tables(tables))
+                logger.debug(f"Schema pruned to {selected}")
+        tokens = estimate_tokens(prompt)
+        self.prompts += 1
+        self.prompt_tokens_sent += tokens
+        self.prompt_tokens_full += prompt_schema.full_tokens
+        record_prompt_tokens(tokens)
+        logger.info(f"Prompt ~{tokens} tokens (full schema ~{prompt_schema.full_tokens})")
+        return prompt
+
+    def _completion_kwargs(self, user_query: str, prompt_schema: _PromptSchema) -> dict:
+        return dict(
             model="llama3-70b-8192",
             messages=[
-                {"role": "system", "content": self.base_prompt},
+                {"role": "system", "content": self._system_prompt(user_query, prompt_schema)},
                 {"role": "user", "content": f"Query: {user_query}\nSQL:"}
             ],
             response_model=SQLResponse,
             temperature=0.1
         )
 
-         # print(response.sql)
+    def generate_sql(self, user_query: str, database: "Database" = None) -> SQLResponse:
+        schema_manager = self._target(database)
+        prompt_schema = self.load_schema(schema_manager)
+        key = self.cache.make_key(user_query, prompt_schema.fingerprint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return SQLResponse(sql=cached)
+
+        with stage("llm"):
+            response = self.client.chat.completions.create(**self._completion_kwargs(user_query, prompt_schema))
+        validated_sql = self._postprocess(response.sql, prompt_schema.tables)
+        self.cache.set(key, validated_sql.sql)
+        return validated_sql
+
+    async def agenerate_sql(self, user_query: str, database: "Database" = None,
+                            prompt_schema: _PromptSchema = None) -> SQLResponse:
+        """Non-blocking variant of generate_sql for use inside the event loop.
+
+        Pass the `prompt_schema` if the caller already loaded it; otherwise it
+        is loaded on a worker thread, since that can wait for a pooled connection.
+        """
+        if prompt_schema is None:
+            prompt_schema = await asyncio.to_thread(self.load_schema, self._target(database))
+        key = self.cache.make_key(user_query, prompt_schema.fingerprint)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return SQLResponse(sql=cached)
+
+        with stage("llm"):
+            response = await self.async_client.chat.completions.create(
+                **self._completion_kwargs(user_query, prompt_schema)
+            )
+        validated_sql = self._postprocess(response.sql, prompt_schema.tables)
+        self.cache.set(key, validated_sql.sql)
+        return validated_sql
+
+    def _target(self, database: Optional["Database"]) -> SchemaManager:
+        return self.schema_manager if database is None else database.schema
+
+    def stats(self) -> dict:
+        full = self.prompt_tokens_full
+        return {
+            "prompts": self.prompts,
+            "prompt_tokens_sent": self.prompt_tokens_sent,
+            "prompt_tokens_full": full,
+            "prompt_tokens_saved_ratio": 1 - self.prompt_tokens_sent / full if full else 0.0,
+        }
+
+    def client_stats(self) -> dict:
+        """Stats of the async LLM client, once it exists and if it reports any"""
+        stats = getattr(self._async_client, "stats", None)
+        return stats() if stats else {}
+
+    def _postprocess(self, sql: str, tables: Dict[str, TableInfo]) -> SQLResponse:
+        with stage("validate"):
+            validated_sql = self._validate_sql(sql, tables)
+
+            # Additional SQLite syntax check
+            if "FROM" not in validated_sql.sql.upper():
+                raise ValueError("Invalid SQL: Missing FROM clause")
 
-        validated_sql = self._validate_sql(response.sql)
-        
-        # Additional SQLite syntax check
-        if "FROM" not in validated_sql.sql.upper():
-            raise ValueError("Invalid SQL: Missing FROM clause")
-            
         return validated_sql
 
-    def _validate_sql(self, sql: str) -> SQLResponse:
-        """Basic SQL validation"""
+    def _validate_sql(self, sql: str, tables: Dict[str, TableInfo] = None) -> SQLResponse:
+        """Basic SQL validation; `tables` defaults to the default database's"""
         sql = sql.strip().rstrip(';')
 
         if not sql.upper().startswith("SELECT"):
             raise ValueError("Only SELECT queries are allowed")
         if "SELECT *" in sql.upper():
-            sql = self._expand_star_selector(sql)
+            sql = self._expand_star_selector(sql, self.schema_manager.get_tables() if tables is None else tables)
         return SQLResponse(sql=sql)
     
-    def _expand_star_selector(self, sql: str) -> str:
+    def _expand_star_selector(self, sql: str, tables: Dict[str, TableInfo]) -> str:
         """Convert SELECT * to explicit columns using schema"""
-        schema = self.schema_manager.get_full_schema()
         table_match = re.search(r"FROM\s+(\w+)", sql, re.IGNORECASE)
         
         if not table_match:
             return sql
             
         table = table_match.group(1)
-        if table not in schema:
+        if table not in tables:
             return sql
             
-        columns = ", ".join(schema[table])
+        columns = ", ".join(tables[table].column_names)
         return re.sub(r"\*", columns, sql, count=1)
\ No newline at end of file
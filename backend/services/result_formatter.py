@@ -0,0 +1,27 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence
+
+FORMATS = ("html", "rows", "columns")
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(" ") if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+class ResultFormatter:
+    @staticmethod
+    def dumps(payload: Dict[str, Any]) -> str:
+        """Compact JSON encoding that skips FastAPI's per-value jsonable_encoder walk"""
+        return json.dumps(payload, default=_default, separators=(",", ":"))
+
+    @staticmethod
+    def to_columns(rows: List[Sequence], columns: List[str]) -> List[List[Any]]:
+        """Transpose positional rows into one array per column"""
+        if not rows:
+            return [[] for _ in columns]
+        return [list(column) for column in zip(*rows)]
@@ -0,0 +1,138 @@
+# backend/services/schema_index.py
+import math
+import re
+import logging
+from collections import Counter
+from typing import Dict, List, Set
+
+from ..database.schema_manager import TableInfo
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_GENERIC = {"id", "the", "a", "an", "of", "for", "and", "or", "by", "in", "on", "to", "with", "all", "each",
+            "show", "list", "display", "find", "get", "what", "which", "who", "how", "many", "much", "me", "is", "are"}
+
+# Everyday words that name a table's subject without using its name
+SYNONYMS = {
+    "sale": ["order", "detail"],
+    "sold": ["order", "detail"],
+    "sell": ["order", "detail"],
+    "buy": ["order"],
+    "bought": ["order"],
+    "purchase": ["order"],
+    "revenue": ["order", "amount"],
+    "spend": ["order", "amount"],
+    "spent": ["order", "amount"],
+    "rating": ["review"],
+    "rated": ["review"],
+    "star": ["review", "rating"],
+    "stock": ["inventory", "quantity"],
+    "client": ["customer"],
+    "user": ["customer"],
+    "item": ["product"],
+    "vendor": ["supplier"],
+    "paid": ["payment"],
+    "sku": ["variant"],
+}
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word stems; snake_case identifiers split into their parts"""
+    return [_stem(w) for w in _WORD.findall(text.lower().replace("_", " ")) if w not in _GENERIC]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token), good enough to compare prompts"""
+    return math.ceil(len(text) / 4)
+
+
+class SchemaIndex:
+    """TF-IDF retrieval over table and column names with foreign-key neighbour expansion"""
+
+    def __init__(self, tables: Dict[str, TableInfo], max_tables: int = 8, relative_cutoff: float = 0.35):
+        self.tables = tables
+        self.max_tables = max_tables
+        self.relative_cutoff = relative_cutoff
+
+        self._docs: Dict[str, Counter] = {}
+        for name, table in tables.items():
+            doc = Counter()
+            for token in tokenize(name):
+                doc[token] += 3
+            for column in table.column_names:
+                doc.update(tokenize(column))
+            self._docs[name] = doc
+        df = Counter(token for doc in self._docs.values() for token in doc)
+        n = len(self._docs)
+        self._idf = {token: math.log((n + 1) / (count + 1)) + 1 for token, count in df.items()}
+        self._norm = {name: math.sqrt(sum(doc.values())) or 1.0 for name, doc in self._docs.items()}
+        # A question naming a table outright ("products") should rank it first
+        self._names = {" ".join(tokenize(name)): name for name in tables}
+
+        # Undirected FK graph
+        self._neighbours: Dict[str, Set[str]] = {name: set() for name in tables}
+        for name, table in tables.items():
+            for fk in table.foreign_keys:
+                if fk.ref_table in self._neighbours and fk.ref_table != name:
+                    self._neighbours[name].add(fk.ref_table)
+                    self._neighbours[fk.ref_table].add(name)
+        self._parents = {
+            name: {fk.ref_table for fk in table.foreign_keys if fk.ref_table in tables and fk.ref_table != name}
+            for name, table in tables.items()
+        }
+
+    def scores(self, question: str) -> Dict[str, float]:
+        terms = []
+        for token in tokenize(question):
+            terms.append(token)
+            terms += SYNONYMS.get(token, [])
+        scores = {}
+        for name, doc in self._docs.items():
+            score = sum(doc[t] * self._idf.get(t, 0.0) for t in terms if t in doc) / self._norm[name]
+            if score > 0:
+                scores[name] = score
+        for token in set(terms):
+            name = self._names.get(token)
+            if name is not None:
+                scores[name] = scores.get(name, 0.0) + 2 * self._idf.get(token, 1.0)
+        return scores
+
+    def select(self, question: str) -> List[str]:
+        """Tables relevant to `question`, in schema order; every table if nothing matches"""
+        scores = self.scores(question)
+        if not scores:
+            return list(self.tables)
+        top = max(scores.values())
+        ranked = sorted((name for name, s in scores.items() if s >= top * self.relative_cutoff),
+                        key=scores.get, reverse=True)
+        selected = ranked[:self.max_tables]
+        chosen = set(selected)
+
+        # Bridge tables join two selected tables that have no direct link
+        # (e.g. product_variants between products and order_details)
+        for name in self.tables:
+            if name in chosen:
+                continue
+            linked = sorted(self._neighbours[name] & chosen)
+            if any(b not in self._neighbours[a] for i, a in enumerate(linked) for b in linked[i + 1:]):
+                selected.append(name)
+                chosen.add(name)
+        # Tables referenced by a strong match, best-scoring first, while there is room
+        strong = [name for name in ranked[:self.max_tables] if scores[name] >= top * 0.5]
+        parents = {p for name in strong for p in self._parents[name]} - chosen
+        for name in sorted(parents, key=lambda p: scores.get(p, 0.0), reverse=True):
+            if len(selected) >= self.max_tables:
+                break
+            selected.append(name)
+            chosen.add(name)
+
+        return [name for name in self.tables if name in chosen]
@@ -0,0 +1,75 @@
+# backend/services/single_flight.py
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task.
+
+    Every waiter gets the shared result or the shared exception. A waiter
+    that is cancelled only stops waiting; the underlying work is cancelled
+    once nobody is waiting for it any more. Results are shared objects, so
+    callers must treat them as read-only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task: self._forget(key, flight))
+            self.leaders += 1
+            leader = True
+        else:
+            self.followers += 1
+            leader = False
+            logger.debug(f"{self.name}: joined in-flight call for {key!r}")
+
+        flight.waiters += 1
+        try:
+            if leader:
+                return await asyncio.shield(flight.task)
+            with stage(f"{self.name}_shared"):
+                return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self.cancelled += 1
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            flight.task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,77 @@
+# backend/services/startup.py
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """Import time, warm-up phases, readiness and time to first request"""
+
+    def __init__(self, started: float = None):
+        # perf_counter() reading taken before the app's heavy imports
+        self.started = time.perf_counter() if started is None else started
+        self.import_seconds: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_attempts = 0
+        self.warmup_error: Optional[str] = None
+        self.first_request_seconds: Optional[float] = None
+        self.ready = False
+
+    def imported(self):
+        self.import_seconds = time.perf_counter() - self.started
+        logger.info(f"App imported in {self.import_seconds * 1000:.1f} ms")
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def warmed(self, seconds: float):
+        self.warmup_seconds = seconds
+        self.warmup_error = None
+        self.ready = True
+        logger.info(
+            f"Warm-up finished in {seconds * 1000:.1f} ms ("
+            + ", ".join(f"{name} {s * 1000:.1f} ms" for name, s in self.phases.items()) + ")"
+        )
+
+    def request_served(self):
+        if self.first_request_seconds is None:
+            self.first_request_seconds = time.perf_counter() - self.started
+            logger.info(f"First request served {self.first_request_seconds * 1000:.1f} ms after import started")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "ready": int(self.ready),
+            "import_ms": (self.import_seconds or 0.0) * 1000,
+            "warmup_ms": (self.warmup_seconds or 0.0) * 1000,
+            "warmup_attempts": self.warmup_attempts,
+            "first_request_ms": (self.first_request_seconds or 0.0) * 1000,
+        }
+        for name, seconds in self.phases.items():
+            stats[f"warmup_{name}_ms"] = seconds * 1000
+        return stats
+
+
+class FirstRequestMiddleware:
+    """ASGI middleware recording when the first HTTP response has been sent"""
+
+    def __init__(self, app, tracker: StartupTracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.tracker.first_request_seconds is not None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.tracker.request_served()
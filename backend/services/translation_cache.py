@@ -0,0 +1,128 @@
+# backend/services/translation_cache.py
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Only cosmetic punctuation folds: sentence marks before a space or the end, and
+# quotes. Comparison operators, signs, decimal points and times change the meaning.
+_COSMETIC = re.compile(r"[?!.,;:]+(?=\s|$)|[\"'`]")
+_OPERATOR = re.compile(r"\s*(<=|>=|!=|<>|==|=|<|>)\s*")
+_WHITESPACE = re.compile(r"\s+")
+# Bumped whenever normalization changes, so older (possibly colliding) disk entries are never served
+_KEY_VERSION = "q2"
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, cosmetic punctuation and whitespace so trivial rephrasings share a key"""
+    folded = _COSMETIC.sub(" ", question.lower())
+    folded = _OPERATOR.sub(r" \1 ", folded)
+    return _WHITESPACE.sub(" ", folded).strip()
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+class TranslationCache:
+    """LRU + TTL cache of NL question -> SQL, with an optional SQLite disk tier"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_path:
+            self._open_disk(disk_path)
+
+    def _open_disk(self, path: str):
+        # Shared across workers, so WAL plus a busy timeout rather than our own locking
+        self._disk = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute(
+            "CREATE TABLE IF NOT EXISTS translation_cache ("
+            "key TEXT PRIMARY KEY, sql TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(question: str, schema_fingerprint: str) -> str:
+        return f"{_KEY_VERSION}:{schema_fingerprint}:{normalize_question(question)}"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                sql, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return sql
+                del self._entries[key]
+
+        if self._disk is not None:
+            try:
+                with self._lock:
+                    row = self._disk.execute(
+                        "SELECT sql, created_at FROM translation_cache WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Translation cache disk read failed: {str(e)}")
+                row = None
+            if row is not None and now - row[1] < self.ttl:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, sql: str):
+        created_at = time.time()
+        self._remember(key, sql, created_at)
+        if self._disk is not None:
+            try:
+                with self._lock:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO translation_cache (key, sql, created_at) VALUES (?, ?, ?)",
+                        (key, sql, created_at),
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Translation cache disk write failed: {str(e)}")
+
+    def _remember(self, key: str, sql: str, created_at: float):
+        with self._lock:
+            self._entries[key] = (sql, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM translation_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,95 @@
+"""Micro-benchmark for TIMESTAMP decoding in the connector.
+
+Builds a throwaway table shaped like `orders` and measures rows/sec when
+fetching it with the legacy strptime cascade, the current fast path, and
+with type decoding disabled (raw strings).
+
+    python -m benchmarks.bench_decoding --rows 500000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from backend.database.connector import convert_timestamp
+
+
+def legacy_convert_timestamp(val):
+    """The strptime cascade the connector used before the fast path"""
+    decoded = val.decode()
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S",
+                "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(decoded, fmt)
+        except ValueError:
+            pass
+    return decoded
+
+
+def build_table(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, order_date TIMESTAMP, total_amount REAL)")
+    start = datetime(2024, 1, 1)
+    # Mix of the shapes found in the sample data: T-separated, space-separated, no micros
+    shapes = (
+        lambda dt: dt.isoformat(),
+        lambda dt: dt.isoformat(" "),
+        lambda dt: dt.replace(microsecond=0).isoformat(" "),
+    )
+    conn.executemany(
+        "INSERT INTO orders (order_date, total_amount) VALUES (?, ?)",
+        (
+            (shapes[i % 3](start + timedelta(seconds=i, microseconds=i % 997)), i * 0.5)
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def measure(path: str, detect_types: int, batch_size: int = 1000) -> float:
+    conn = sqlite3.connect(path, detect_types=detect_types)
+    cursor = conn.execute("SELECT id, order_date, total_amount FROM orders")
+    count = 0
+    started = time.perf_counter()
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        count += len(batch)
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_table(path, args.rows)
+
+        cases = [
+            ("legacy strptime", legacy_convert_timestamp, sqlite3.PARSE_DECLTYPES),
+            ("fromisoformat fast path", convert_timestamp, sqlite3.PARSE_DECLTYPES),
+            ("raw passthrough", None, 0),
+        ]
+        print(f"{args.rows:,} rows, best of {args.repeat}")
+        baseline = None
+        for name, converter, detect_types in cases:
+            if converter is not None:
+                sqlite3.register_converter("timestamp", converter)
+            best = max(measure(path, detect_types) for _ in range(args.repeat))
+            baseline = baseline or best
+            print(f"  {name:<24} {best:>12,.0f} rows/sec  ({best / baseline:.1f}x)")
+
+        sqlite3.register_converter("timestamp", convert_timestamp)
+
+
+if __name__ == "__main__":
+    main()
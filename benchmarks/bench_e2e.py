@@ -0,0 +1,244 @@
+"""End-to-end benchmark of /api/query with a stubbed LLM.
+
+Drives the FastAPI app in-process over httpx's ASGI transport, replacing
+the Groq client with a deterministic stub, and runs a question corpus
+against scaled copies of the sample database. Reports p50/p95/p99 latency
+and throughput per stage and writes everything to a JSON file so runs can
+be compared over time.
+
+    python -m benchmarks.bench_e2e --sizes 1 10 100 --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+
+import httpx
+
+from backend import main
+from backend.services.llm_client import AsyncLLMClient, LLMClient, TokenBucket
+from backend.services.translation_cache import TranslationCache
+from benchmarks.stub_llm import CORPUS, AsyncStubLLM, StubLLM
+
+BASE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ecommerce.db")
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class StageRecorder:
+    """Collects wall-clock durations per pipeline stage"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage: str, fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.samples[stage].append(time.perf_counter() - started)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+        return timed
+
+    def summary(self, wall_time: float) -> dict:
+        result = {}
+        for stage, values in self.samples.items():
+            values = sorted(values)
+            result[stage] = {
+                "count": len(values),
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "per_sec": len(values) / wall_time if wall_time else 0.0,
+            }
+        return result
+
+
+def build_scaled_db(directory: str, multiplier: int) -> str:
+    """Copy the sample database and replicate orders, order lines and payments `multiplier` times"""
+    path = os.path.join(directory, f"ecommerce_x{multiplier}.db")
+    shutil.copy(BASE_DB, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    base_orders = conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+    base_details = conn.execute("SELECT MAX(id) FROM order_details").fetchone()[0]
+    base_payments = conn.execute("SELECT COALESCE(MAX(id), 0) FROM payments").fetchone()[0]
+    with conn:
+        for k in range(1, multiplier):
+            conn.execute(
+                "INSERT INTO orders SELECT id + ?, customer_id, order_date, total_amount, status, "
+                "payment_status, shipping_address_id FROM orders WHERE id <= ?",
+                (k * base_orders, base_orders),
+            )
+            conn.execute(
+                "INSERT INTO order_details SELECT id + ?, order_id + ?, product_variant_id, quantity, "
+                "unit_price, discount FROM order_details WHERE id <= ?",
+                (k * base_details, k * base_orders, base_details),
+            )
+            conn.execute(
+                "INSERT INTO payments SELECT id + ?, order_id + ?, amount, payment_method, "
+                "transaction_id, payment_date FROM payments WHERE id <= ?",
+                (k * base_payments, k * base_orders, base_payments),
+            )
+    conn.close()
+    return path
+
+
+def configure_app(db_path: str, recorder: StageRecorder, latency: float, use_cache: bool, use_rollups: bool, args):
+    """Point the app's default database at `db_path` and its LLM at a stub, with stage timers"""
+    main.registry.register(main.registry.default_name, db_path)
+    database = main.registry.default
+    db = database.db
+    if not use_cache:
+        db.result_cache.max_bytes = 0
+    db.execute_safe_query = recorder.wrap("execute", db.execute_safe_query)
+    database.rollups.enabled = use_rollups
+    if use_rollups:
+        database.rollups.refresh()
+
+    service = main.query_service
+    service.schema_manager = database.schema
+    service.cache = TranslationCache(max_entries=1024 if use_cache else 0)
+    faults = dict(failure_rate=args.llm_failure_rate, slow_rate=args.llm_slow_rate, slow_latency=args.llm_slow_latency)
+    stub = AsyncStubLLM(latency=latency, **faults)
+    stub.create = recorder.wrap("llm", stub.create)
+    # The stub sits behind the real client layer: rate limit, retries, hedging
+    limiter = TokenBucket(args.llm_rate_limit / 60, burst=max(1, args.concurrency))
+    retry = dict(timeout=30.0, max_retries=3, backoff_base=0.01, backoff_max=0.1)
+    service.async_client = AsyncLLMClient(stub, limiter, hedge=args.hedge, hedge_delay=4 * latency, **retry)
+    service.client = LLMClient(StubLLM(latency=latency, **faults), limiter, **retry)
+    service.agenerate_sql = recorder.wrap("translate", type(service).agenerate_sql.__get__(service))
+
+    main.html_gen.generate_table = recorder.wrap("render", type(main.html_gen).generate_table)
+
+
+async def run_load(questions, total: int, concurrency: int, recorder: StageRecorder, result_format: str):
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = defaultdict(int)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/query", json={"query": questions[i % len(questions)], "format": result_format}
+                )
+                recorder.samples["request"].append(time.perf_counter() - started)
+                statuses[response.status_code] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - started, dict(statuses)
+
+
+async def run_sizes(args, questions, report: dict):
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db_path = build_scaled_db(tmp, size)
+            with sqlite3.connect(db_path) as conn:
+                order_count = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+            recorder = StageRecorder()
+            configure_app(db_path, recorder, args.llm_latency, use_cache=not args.no_cache,
+                          use_rollups=not args.no_rollups, args=args)
+            wall_time, statuses = await run_load(questions, args.requests, args.concurrency, recorder, args.format)
+            stages = recorder.summary(wall_time)
+            llm_client = main.query_service.async_client.stats()
+            shapes = main.registry.default.db.shapes.stats()
+            report["runs"].append({
+                "size": size,
+                "orders": order_count,
+                "wall_time_s": wall_time,
+                "requests_per_sec": args.requests / wall_time,
+                "statuses": statuses,
+                "stages": stages,
+                "llm_client": llm_client,
+                "query_shapes": shapes,
+            })
+
+            print(f"\nx{size} ({order_count:,} orders): {args.requests / wall_time:,.1f} req/s, statuses {statuses}")
+            print(f"  llm client: {llm_client['attempts']} attempts, {llm_client['retries']} retries, "
+                  f"{llm_client['hedges']} hedges ({llm_client['hedge_wins']} won)")
+            print(f"  query shapes: {shapes['shapes']} for {shapes['executions']} executions "
+                  f"({shapes['reuse_ratio']:.0%} reused a prepared statement)")
+            for stage, s in stages.items():
+                print(f"  {stage:<10} n={s['count']:<6} p50={s['p50_ms']:8.2f}ms "
+                      f"p95={s['p95_ms']:8.2f}ms p99={s['p99_ms']:8.2f}ms")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="replication factors applied to the sample orders data")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="simulated LLM latency in seconds")
+    parser.add_argument("--llm-rate-limit", type=int, default=0, help="client-side LLM requests/min (0 = unlimited)")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="fraction of LLM calls failing with 503")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="fraction of LLM calls hitting the slow tail")
+    parser.add_argument("--llm-slow-latency", type=float, default=1.0, help="latency of slow-tail LLM calls")
+    parser.add_argument("--hedge", default="off", choices=["off", "fixed", "p95"], help="LLM request hedging")
+    parser.add_argument("--format", default="html", choices=["html", "rows", "columns"])
+    parser.add_argument("--no-cache", action="store_true", help="disable translation and result caches")
+    parser.add_argument("--no-rollups", action="store_true", help="disable summary-table query rewrite")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    questions = list(CORPUS)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "args": vars(args),
+        },
+        "runs": [],
+    }
+
+    # One event loop for every run: the app's admission gates bind to the loop they first run on
+    asyncio.run(run_sizes(args, questions, report))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+"""Export throughput and memory: rows/sec, MB/sec and peak Python heap per format.
+
+Runs the export pipeline (cursor batches -> CSV / JSON Lines -> gzip / zstd)
+over scaled copies of the sample database and discards the output, so the
+numbers are the server-side cost of /api/export. Peak traced memory should
+stay flat as the result grows.
+
+    python -m benchmarks.bench_export --sizes 100 1000 --formats csv jsonl --compressions gzip none
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+
+from backend.config import settings
+from backend.database.connector import DatabaseConnector
+from backend.services.export import ExportStats, export_chunks
+from benchmarks.bench_e2e import build_scaled_db, git_revision
+
+QUERY = (
+    "SELECT od.id, od.order_id, o.order_date, o.status, od.quantity, od.unit_price, od.discount "
+    "FROM order_details AS od JOIN orders AS o ON o.id = od.order_id"
+)
+
+
+def run_export(db: DatabaseConnector, result_format: str, compression: str, batch_size: int) -> dict:
+    stats = ExportStats()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = db.stream_query(QUERY, batch_size=batch_size)
+    columns = next(rows)
+    sent = sum(len(chunk) for chunk in export_chunks(columns, rows, result_format, compression, stats))
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    totals = stats.stats()
+    return {
+        "rows": totals["rows"],
+        "bytes_raw": totals["bytes_raw"],
+        "bytes_sent": sent,
+        "seconds": seconds,
+        "rows_per_sec": totals["rows"] / seconds,
+        "mb_per_sec": totals["bytes_raw"] / seconds / 1e6,
+        "peak_mb": peak / 1e6,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "jsonl"])
+    parser.add_argument("--compressions", nargs="+", default=["gzip", "none"])
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+    parser.add_argument("--output", default="bench_export.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db = DatabaseConnector(build_scaled_db(tmp, size))
+            db.cost_guard.mode = "off"
+            for result_format in args.formats:
+                for compression in args.compressions:
+                    run = {"size": size, "format": result_format, "compression": compression,
+                           **run_export(db, result_format, compression, args.batch_size)}
+                    results.append(run)
+                    print(f"x{size:<5} {result_format:<5} {compression:<5} {run['rows']:>9,} rows "
+                          f"{run['rows_per_sec']:>11,.0f} rows/s {run['mb_per_sec']:7.1f} MB/s "
+                          f"ratio {run['bytes_raw'] / max(run['bytes_sent'], 1):5.1f} peak {run['peak_mb']:6.1f} MB")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
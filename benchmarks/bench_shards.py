@@ -0,0 +1,151 @@
+"""Fan-out benchmark: one database file versus the same data split into shards.
+
+Builds a scaled copy of the sample database, splits it by customer into N
+shard files (customers, their orders, order lines, payments, reviews and
+wishlists go to shard `customer_id % N`; the remaining tables are copied to
+every shard) and times a few query shapes through `ShardedConnector` with
+process and thread pools of 1..cpu_count workers. Every sharded result is
+checked against the single-file result before it is timed.
+
+    python -m benchmarks.bench_shards --scale 1000 --shards 4 --repeat 5
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("GROQ_API_KEY", "benchmark-stub")
+
+from backend.database.connector import DatabaseConnector
+from backend.database.sharding import ShardedConnector, get_shard_executor, shutdown_shard_executors
+from benchmarks.bench_e2e import build_scaled_db, git_revision
+
+# table -> SQL giving each row's customer id, for tables split across shards;
+# order lines and payments come first as their key looks up the order
+PARTITIONS = {
+    "order_details": "(SELECT customer_id FROM orders WHERE orders.id = order_id)",
+    "payments": "(SELECT customer_id FROM orders WHERE orders.id = order_id)",
+    "orders": "customer_id",
+    "reviews": "customer_id",
+    "wishlists": "customer_id",
+    "customers": "id",
+}
+
+QUERIES = {
+    "aggregate":
+        "SELECT o.status, COUNT(*) AS orders, SUM(o.total_amount) AS revenue, AVG(o.total_amount) AS average "
+        "FROM orders AS o JOIN order_details AS od ON od.order_id = o.id GROUP BY o.status ORDER BY revenue DESC",
+    "top_n":
+        "SELECT od.order_id, od.quantity * od.unit_price AS line_total FROM order_details AS od "
+        "ORDER BY line_total DESC, od.id LIMIT 20",
+    "filter":
+        "SELECT o.id, o.total_amount FROM orders AS o WHERE o.total_amount > 500 AND o.status = 'shipped'",
+}
+
+
+def build_shards(source: str, directory: str, shards: int) -> list:
+    """Split `source` into `shards` files under `directory`, recording the partitioned tables in hq_shards"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for shard in range(shards):
+        path = os.path.join(directory, f"shard{shard}.db")
+        if os.path.exists(path):
+            os.remove(path)
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        with dst:
+            for table, key in PARTITIONS.items():
+                dst.execute(f"DELETE FROM {table} WHERE {key} % ? != ?", (shards, shard))
+            dst.execute("CREATE TABLE hq_shards (table_name TEXT PRIMARY KEY, shard_key TEXT)")
+            dst.executemany("INSERT INTO hq_shards VALUES (?, ?)", PARTITIONS.items())
+        dst.execute("VACUUM")
+        dst.execute("PRAGMA journal_mode=WAL")
+        dst.close()
+        paths.append(path)
+    return paths
+
+
+def time_query(connector, sql: str, repeat: int) -> float:
+    """Median wall-clock milliseconds over `repeat` uncached runs"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connector.execute_safe_query(sql, use_cache=False, as_tuples=True)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def same_rows(a, b) -> bool:
+    """Equal up to row order and float summation order"""
+    def canonical(rows):
+        return sorted(rows, key=lambda row: repr([v for v in row if not isinstance(v, float)]))
+    if len(a) != len(b):
+        return False
+    for row_a, row_b in zip(canonical(a), canonical(b)):
+        for x, y in zip(row_a, row_b):
+            if x != y and not (isinstance(x, float) and isinstance(y, float) and math.isclose(x, y, rel_tol=1e-9)):
+                return False
+    return True
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000, help="order multiplier for the scaled database")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default="bench_shards.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = build_scaled_db(tmp, args.scale)
+        paths = build_shards(source, os.path.join(tmp, "shards"), args.shards)
+        single = DatabaseConnector(source)
+        single.cost_guard.mode = "off"
+        baseline = {name: time_query(single, sql, args.repeat) for name, sql in QUERIES.items()}
+        expected = {name: single.execute_safe_query(sql, use_cache=False, as_tuples=True)[0] for name, sql in QUERIES.items()}
+        for name, ms in baseline.items():
+            print(f"{name:<10} single file            {ms:8.1f} ms")
+            results.append({"query": name, "executor": "single", "workers": 1, "ms": ms, "speedup": 1.0})
+
+        for kind in ("process", "thread"):
+            for workers in range(1, args.max_workers + 1):
+                executor = get_shard_executor(kind, workers)
+                sharded = ShardedConnector(paths, executor=executor)
+                sharded.cost_guard.mode = "off"
+                for name, sql in QUERIES.items():
+                    rows, _ = sharded.execute_safe_query(sql, use_cache=False, as_tuples=True)
+                    if not same_rows(rows, expected[name]):
+                        raise SystemExit(f"{name}: sharded result differs from the single-file result")
+                    ms = time_query(sharded, sql, args.repeat)
+                    speedup = baseline[name] / ms if ms else 0.0
+                    print(f"{name:<10} {kind:<7} x{workers:<2} {args.shards} shards {ms:8.1f} ms  {speedup:5.2f}x")
+                    results.append({"query": name, "executor": kind, "workers": workers, "ms": ms, "speedup": speedup})
+                shutdown_shard_executors()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
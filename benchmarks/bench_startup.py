@@ -0,0 +1,79 @@
+"""Cold-start benchmark: import time, time to first request and time to ready.
+
+Each run starts a fresh interpreter, imports `backend.main`, enters the app
+lifespan through Starlette's TestClient and polls /api/ready until warm-up
+has finished. Medians over the runs are written to a JSON file so startup
+regressions show up next to the end-to-end numbers.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.bench_e2e import git_revision
+
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import backend.main as main
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+with TestClient(main.app) as client:
+    response = client.get("/api/ready")
+    first_request = time.perf_counter()
+    while response.status_code != 200 and time.perf_counter() - started < 60:
+        time.sleep(0.01)
+        response = client.get("/api/ready")
+    ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (first_request - started) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "status": response.status_code,
+    "startup": main.startup.stats(),
+}))
+"""
+
+
+def run_once(warmup: bool) -> dict:
+    env = {**os.environ, "GROQ_API_KEY": os.environ.get("GROQ_API_KEY") or "benchmark-stub",
+           "WARMUP": "true" if warmup else "false"}
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-warmup", action="store_true", help="start with WARMUP disabled")
+    parser.add_argument("--output", default="bench_startup.json")
+    args = parser.parse_args()
+
+    runs = [run_once(not args.no_warmup) for _ in range(args.runs)]
+    summary = {key: statistics.median(run[key] for run in runs) for key in ("import_ms", "first_request_ms", "ready_ms")}
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "args": vars(args),
+        },
+        "median": summary,
+        "runs": runs,
+    }
+    for key, value in summary.items():
+        print(f"{key:<18} {value:8.1f} ms (median of {args.runs})")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+"""Deterministic stand-in for the instructor-wrapped Groq client.
+
+Maps a fixed corpus of natural-language questions to SQL and sleeps for a
+configurable latency, so the rest of the pipeline can be measured without
+network calls. Shaped like `client.chat.completions.create(...)`.
+Optional injected failures (HTTP 503) and slow tail responses exercise the
+retry and hedging paths of `backend.services.llm_client`.
+"""
+import asyncio
+import random
+import re
+import time
+from types import SimpleNamespace
+
+from backend.services.query_service import SQLResponse
+from backend.services.translation_cache import normalize_question
+
+CORPUS = {
+    "Show total sales for each product":
+        "SELECT p.name, SUM(od.quantity * od.unit_price) AS total_sales "
+        "FROM products AS p JOIN product_variants AS v ON p.id = v.product_id "
+        "JOIN order_details AS od ON v.id = od.product_variant_id "
+        "GROUP BY p.name ORDER BY total_sales DESC",
+    "Show monthly sales totals":
+        "SELECT strftime('%Y-%m', o.order_date) AS month, SUM(o.total_amount) AS total_sales "
+        "FROM orders AS o GROUP BY month ORDER BY month",
+    "Show top 5 customers by total orders":
+        "SELECT c.first_name, c.last_name, COUNT(o.id) AS order_count "
+        "FROM customers AS c JOIN orders AS o ON c.id = o.customer_id "
+        "GROUP BY c.id ORDER BY order_count DESC LIMIT 5",
+    "List customers who spent over $2000":
+        "SELECT c.first_name, c.last_name, SUM(o.total_amount) AS spent "
+        "FROM customers AS c JOIN orders AS o ON c.id = o.customer_id "
+        "GROUP BY c.id HAVING spent > 2000",
+    "Display products with average rating below 5 stars":
+        "SELECT p.name, AVG(r.rating) AS avg_rating FROM products AS p "
+        "JOIN reviews AS r ON p.id = r.product_id GROUP BY p.id HAVING avg_rating < 5",
+    "Show the most recent orders":
+        "SELECT o.id, o.order_date, o.total_amount, o.status FROM orders AS o "
+        "ORDER BY o.order_date DESC",
+    "Show all payments":
+        "SELECT * FROM payments",
+    "Count orders by status":
+        "SELECT o.status, COUNT(*) AS order_count FROM orders AS o GROUP BY o.status",
+}
+
+_QUESTION = re.compile(r"^Query: (.*)\nSQL:$", re.DOTALL)
+
+
+class StubLLMError(Exception):
+    """Injected provider failure; carries a status code like the Groq SDK's errors"""
+
+    def __init__(self, status_code: int = 503):
+        super().__init__(f"stub LLM error {status_code}")
+        self.status_code = status_code
+
+
+class StubLLM:
+    """Sync/async completions stub; unknown questions fall back to a trivial query"""
+
+    def __init__(self, corpus: dict = None, latency: float = 0.0, fallback_sql: str = "SELECT c.id FROM customers AS c",
+                 failure_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 1.0, seed: int = None):
+        self.corpus = {normalize_question(q): sql for q, sql in (corpus or CORPUS).items()}
+        self.latency = latency
+        self.fallback_sql = fallback_sql
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def _delay(self) -> float:
+        """Latency for one call; raises an injected failure first if one is due"""
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            self.calls += 1
+            raise StubLLMError()
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency
+
+    def _answer(self, messages) -> SQLResponse:
+        self.calls += 1
+        match = _QUESTION.match(messages[-1]["content"])
+        question = match.group(1) if match else messages[-1]["content"]
+        return SQLResponse(sql=self.corpus.get(normalize_question(question), self.fallback_sql))
+
+    def create(self, messages, **kwargs) -> SQLResponse:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._answer(messages)
+
+
+class AsyncStubLLM(StubLLM):
+    async def create(self, messages, **kwargs) -> SQLResponse:
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._answer(messages)
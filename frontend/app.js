@@ -1,46 +1,160 @@
+const ROW_HEIGHT = 48;      // px, matches .virtual-scroll td height
+const OVERSCAN = 20;        // extra rows rendered above and below the viewport
+
 async function handleQuery() {
     const input = document.getElementById('queryInput');
     const resultsContainer = document.getElementById('resultsContainer');
     const sqlPreview = document.getElementById('sqlPreview');
-    
+
     // Clear previous results
     resultsContainer.innerHTML = '<div class="loading">Processing...</div>';
     sqlPreview.textContent = '';
 
     try {
-        const response = await fetch('/api/query', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                query: input.value.trim()
-            })
+        const response = await postQuery({
+            query: input.value.trim(),
+            stream: true,
+            format: 'rows'
         });
-
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.detail);
-        }
-
-        const data = await response.json();
-        
-        // Display results
-        sqlPreview.textContent = data.sql;
-        resultsContainer.innerHTML = data.html;
-        
-        // Add result count
-        const countDiv = document.createElement('div');
-        countDiv.className = 'result-count';
-        countDiv.textContent = `${data.row_count} rows returned`;
-        resultsContainer.prepend(countDiv);
+        await renderStream(response, resultsContainer, sqlPreview, null);
 
     } catch (error) {
         resultsContainer.innerHTML = `
             <div class="error-alert">
                 <div class="error-icon">!</div>
-                <div class="error-message">${error.message}</div>
+                <div class="error-message">${escapeHtml(error.message)}</div>
             </div>
         `;
     }
-}
\ No newline at end of file
+}
+
+async function postQuery(body) {
+    const response = await fetch('/api/query', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+    });
+
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail);
+    }
+    return response;
+}
+
+function escapeHtml(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;');
+}
+
+// Fetch the next page via its token and append it to the current table
+async function loadMore(button, pageToken, state) {
+    button.disabled = true;
+    button.textContent = 'Loading...';
+    try {
+        const response = await postQuery({ page_token: pageToken, stream: true, format: 'rows' });
+        button.remove();
+        await renderStream(response, state.resultsContainer, state.sqlPreview, state);
+    } catch (error) {
+        button.disabled = false;
+        button.textContent = `Load more (${error.message})`;
+    }
+}
+
+// Only the rows inside the scroll viewport (plus overscan) exist in the DOM;
+// spacer rows stand in for everything above and below.
+function renderWindow(state) {
+    state.renderPending = false;
+    const { rows, columns, scroller, tbody } = state;
+    if (rows.length === 0) {
+        tbody.innerHTML = `<tr><td colspan="${columns.length}">No results found</td></tr>`;
+        return;
+    }
+
+    const visible = Math.ceil(scroller.clientHeight / ROW_HEIGHT) || 1;
+    const start = Math.max(0, Math.floor(scroller.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const end = Math.min(rows.length, start + visible + OVERSCAN * 2);
+
+    let html = `<tr class="spacer" style="height:${start * ROW_HEIGHT}px"></tr>`;
+    for (let i = start; i < end; i++) {
+        html += '<tr>' + rows[i].map(value => `<td>${value === null ? 'None' : escapeHtml(value)}</td>`).join('') + '</tr>';
+    }
+    html += `<tr class="spacer" style="height:${(rows.length - end) * ROW_HEIGHT}px"></tr>`;
+    tbody.innerHTML = html;
+}
+
+function scheduleRender(state) {
+    if (state.renderPending) return;
+    state.renderPending = true;
+    requestAnimationFrame(() => renderWindow(state));
+}
+
+// Render NDJSON batches from /api/query as they arrive. `state` is null for
+// a fresh result, or the previous page's state when appending.
+async function renderStream(response, resultsContainer, sqlPreview, state) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const handleMessage = (message) => {
+        if (message.type === 'meta') {
+            if (state) return;
+            sqlPreview.textContent = message.sql;
+            const headers = message.columns.map(col => `<th>${escapeHtml(col)}</th>`).join('');
+            resultsContainer.innerHTML = `
+                <div class="result-count">0 rows returned</div>
+                <div class="table-container virtual-scroll">
+                    <table class="result-table">
+                        <thead><tr>${headers}</tr></thead>
+                        <tbody></tbody>
+                    </table>
+                </div>
+            `;
+            state = {
+                resultsContainer,
+                sqlPreview,
+                columns: message.columns,
+                rows: [],
+                countDiv: resultsContainer.querySelector('.result-count'),
+                scroller: resultsContainer.querySelector('.virtual-scroll'),
+                tbody: resultsContainer.querySelector('tbody'),
+                renderPending: false
+            };
+            state.scroller.addEventListener('scroll', () => scheduleRender(state));
+        } else if (message.type === 'rows') {
+            for (const row of message.rows) state.rows.push(row);
+            state.countDiv.textContent = `${state.rows.length} rows returned...`;
+            scheduleRender(state);
+        } else if (message.type === 'end') {
+            state.countDiv.textContent = `${state.rows.length} rows returned`;
+            scheduleRender(state);
+            if (message.next_page_token) {
+                const button = document.createElement('button');
+                button.className = 'load-more';
+                button.textContent = 'Load more';
+                button.onclick = () => loadMore(button, message.next_page_token, state);
+                resultsContainer.appendChild(button);
+            }
+        } else if (message.type === 'error') {
+            throw new Error(message.detail);
+        }
+    };
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (line.trim()) handleMessage(JSON.parse(line));
+        }
+    }
+    if (buffer.trim()) handleMessage(JSON.parse(buffer));
+}
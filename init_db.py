@@ -1,6 +1,6 @@
 import sqlite3
 from datetime import datetime, timedelta
-from random import randint, choice, sample
+from random import Random, randint, choice, sample
 
 def adapt_datetime(dt):
     return dt.isoformat()
@@ -12,6 +12,15 @@ def init_database():
         'ecommerce.db',
         detect_types=sqlite3.PARSE_DECLTYPES
     )
+    create_schema(conn)
+
+    # Insert Comprehensive Sample Data
+    insert_sample_data(conn)
+    
+    conn.commit()
+    conn.close()
+
+def create_schema(conn):
     c = conn.cursor()
 
     # Create Tables with Enhanced Schema
@@ -152,12 +161,6 @@ def init_database():
         FOREIGN KEY (product_id) REFERENCES products(id)
     )''')
 
-    # Insert Comprehensive Sample Data
-    insert_sample_data(conn)
-    
-    conn.commit()
-    conn.close()
-
 def insert_sample_data(conn):
     c = conn.cursor()
     
@@ -284,6 +287,14 @@ def insert_sample_data(conn):
     ]
     c.executemany('INSERT INTO product_tags (product_id, tag_id) VALUES (?,?)', product_tags)
 
+    # Precompute variant prices instead of querying once per order line
+    variant_prices = {
+        variant_id: price + price_adjustment
+        for variant_id, price, price_adjustment in c.execute('''SELECT v.id, p.price, v.price_adjustment
+            FROM products p
+            JOIN product_variants v ON p.id = v.product_id''')
+    }
+
     # Insert Orders
     for _ in range(20):
         customer_id = randint(1, 5)
@@ -301,12 +312,7 @@ def insert_sample_data(conn):
         for _ in range(randint(1, 4)):
             variant = choice(variants)
             variant_id = variants.index(variant) + 1
-            product_id = variant[0]
-            c.execute('''SELECT price + price_adjustment 
-                FROM products p 
-                JOIN product_variants v ON p.id = v.product_id 
-                WHERE v.id = ?''', (variant_id,))
-            unit_price = c.fetchone()[0]
+            unit_price = variant_prices[variant_id]
             quantity = randint(1, 3)
             discount = choice([0, 0.1, 0.15])
             
@@ -349,5 +355,210 @@ def insert_sample_data(conn):
                 (customer_id, product_id, datetime.now()-timedelta(days=randint(1, 30)))
             )
 
+# Rows generated per unit of --scale; --scale 100 gives 1M orders and ~2.5M order lines
+SCALE_CUSTOMERS = 2_000
+SCALE_PRODUCTS = 50
+SCALE_ORDERS = 10_000
+SCALE_REVIEWS = 3_000
+BATCH_SIZE = 50_000
+
+# Created after the bulk load, when building them in one pass is far cheaper
+# than maintaining them row by row
+SCALE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_customers_address_id ON customers(address_id)',
+    'CREATE INDEX IF NOT EXISTS idx_products_category_id ON products(category_id)',
+    'CREATE INDEX IF NOT EXISTS idx_product_variants_product_id ON product_variants(product_id)',
+    'CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id)',
+    'CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date)',
+    'CREATE INDEX IF NOT EXISTS idx_order_details_order_id ON order_details(order_id)',
+    'CREATE INDEX IF NOT EXISTS idx_order_details_product_variant_id ON order_details(product_variant_id)',
+    'CREATE INDEX IF NOT EXISTS idx_payments_order_id ON payments(order_id)',
+    'CREATE INDEX IF NOT EXISTS idx_reviews_product_id ON reviews(product_id)',
+    'CREATE INDEX IF NOT EXISTS idx_reviews_customer_id ON reviews(customer_id)',
+]
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _bulk_insert(conn, sql, rows):
+    count = 0
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+def init_scaled_database(path, scale, seed=42):
+    """Generate a large dataset with referential integrity, as fast as SQLite allows"""
+    rng = Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+
+    # Bulk-load settings: nothing here needs to survive a crash mid-load
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-262144')  # 256 MiB
+
+    create_schema(conn)
+
+    n_customers = SCALE_CUSTOMERS * scale
+    n_products = SCALE_PRODUCTS * scale
+    n_orders = SCALE_ORDERS * scale
+    n_reviews = SCALE_REVIEWS * scale
+    now = datetime.now().replace(microsecond=0)
+    counts = {}
+
+    def timestamp(max_days):
+        return (now - timedelta(seconds=rng.randrange(max_days * 86400))).isoformat()
+
+    conn.execute('BEGIN')
+    cities = [('San Francisco', 'CA'), ('Chicago', 'IL'), ('Los Angeles', 'CA'), ('Austin', 'TX'),
+              ('Miami', 'FL'), ('New York', 'NY'), ('Seattle', 'WA'), ('Boston', 'MA')]
+    counts['addresses'] = _bulk_insert(conn,
+        'INSERT INTO addresses (id, street, city, state, country, postal_code) VALUES (?,?,?,?,?,?)',
+        ((i, f'{rng.randint(1, 9999)} Main Street', *rng.choice(cities), 'USA', f'{rng.randint(10000, 99999)}')
+         for i in range(1, n_customers + 1)))
+
+    counts['customers'] = _bulk_insert(conn,
+        '''INSERT INTO customers
+        (id, first_name, last_name, email, phone, created_at, last_login, address_id)
+        VALUES (?,?,?,?,?,?,?,?)''',
+        ((i, f'First{i}', f'Last{i}', f'customer{i}@example.com', f'555-{i % 10000:04}',
+          timestamp(730), timestamp(30), i)
+         for i in range(1, n_customers + 1)))
+
+    counts['suppliers'] = _bulk_insert(conn,
+        'INSERT INTO suppliers (id, company_name, contact_name, email, phone, address_id) VALUES (?,?,?,?,?,?)',
+        ((i, f'Supplier {i}', f'Contact {i}', f'supplier{i}@example.com', f'555-{i:04}', i)
+         for i in range(1, 51)))
+
+    counts['categories'] = _bulk_insert(conn,
+        'INSERT INTO categories (id, name, parent_id) VALUES (?,?,?)',
+        ((i, f'Category {i}', None if i <= 5 else rng.randint(1, 5)) for i in range(1, 51)))
+
+    prices = [round(rng.uniform(5, 3000), 2) for _ in range(n_products)]
+    counts['products'] = _bulk_insert(conn,
+        '''INSERT INTO products
+        (id, name, description, price, category_id, supplier_id, created_at)
+        VALUES (?,?,?,?,?,?,?)''',
+        ((i + 1, f'Product {i + 1}', f'Description of product {i + 1}', prices[i],
+          rng.randint(6, 50), rng.randint(1, 50), timestamp(730))
+         for i in range(n_products)))
+
+    # Three variants per product; variant prices are precomputed for order lines
+    variant_prices = []
+    def variants():
+        for product_index, price in enumerate(prices):
+            for n, color in enumerate(('Black', 'White', 'Blue')):
+                adjustment = 0 if n == 0 else rng.choice([0, 10, 50])
+                variant_prices.append(price + adjustment)
+                variant_id = len(variant_prices)
+                yield (variant_id, product_index + 1, f'SKU-{variant_id:08}', rng.choice(['S', 'M', 'L']),
+                       color, adjustment, rng.randint(0, 500))
+    counts['product_variants'] = _bulk_insert(conn,
+        '''INSERT INTO product_variants
+        (id, product_id, sku, size, color, price_adjustment, stock_quantity)
+        VALUES (?,?,?,?,?,?,?)''', variants())
+    n_variants = len(variant_prices)
+
+    counts['inventory'] = _bulk_insert(conn,
+        '''INSERT INTO inventory (product_variant_id, quantity, location, last_restocked)
+        VALUES (?,?,?,?)''',
+        ((v, rng.randint(10, 100), rng.choice(['Warehouse A', 'Warehouse B', 'Store Front']), timestamp(30))
+         for v in range(1, n_variants + 1)))
+
+    # Orders, their lines and payments are generated together so totals line up
+    order_rows, detail_rows, payment_rows = [], [], []
+    detail_id = payment_id = 0
+    counts['orders'] = counts['order_details'] = counts['payments'] = 0
+    statuses = ('pending', 'processing', 'shipped', 'delivered', 'canceled')
+    for order_id in range(1, n_orders + 1):
+        order_date = now - timedelta(seconds=rng.randrange(730 * 86400))
+        total = 0.0
+        for _ in range(rng.randint(1, 4)):
+            variant_id = rng.randint(1, n_variants)
+            unit_price = variant_prices[variant_id - 1]
+            quantity = rng.randint(1, 3)
+            discount = rng.choice((0, 0, 0.1, 0.15))
+            detail_id += 1
+            detail_rows.append((detail_id, order_id, variant_id, quantity, unit_price, discount))
+            total += unit_price * quantity * (1 - discount)
+        total = round(total, 2)
+        paid = rng.random() < 0.6
+        order_rows.append((order_id, rng.randint(1, n_customers), order_date.isoformat(), total,
+                           rng.choice(statuses), 'paid' if paid else 'unpaid', rng.randint(1, n_customers)))
+        if paid:
+            payment_id += 1
+            payment_rows.append((payment_id, order_id, total, rng.choice(('credit_card', 'paypal')),
+                                 f'TXN{order_id:09}',
+                                 (order_date + timedelta(minutes=rng.randint(1, 120))).isoformat()))
+
+        if len(order_rows) >= BATCH_SIZE or order_id == n_orders:
+            conn.executemany('''INSERT INTO orders
+                (id, customer_id, order_date, total_amount, status, payment_status, shipping_address_id)
+                VALUES (?,?,?,?,?,?,?)''', order_rows)
+            conn.executemany('''INSERT INTO order_details
+                (id, order_id, product_variant_id, quantity, unit_price, discount)
+                VALUES (?,?,?,?,?,?)''', detail_rows)
+            conn.executemany('''INSERT INTO payments
+                (id, order_id, amount, payment_method, transaction_id, payment_date)
+                VALUES (?,?,?,?,?,?)''', payment_rows)
+            counts['orders'] += len(order_rows)
+            counts['order_details'] += len(detail_rows)
+            counts['payments'] += len(payment_rows)
+            order_rows, detail_rows, payment_rows = [], [], []
+
+    counts['reviews'] = _bulk_insert(conn,
+        '''INSERT INTO reviews (product_id, customer_id, rating, comment, created_at)
+        VALUES (?,?,?,?,?)''',
+        ((rng.randint(1, n_products), rng.randint(1, n_customers), rng.randint(1, 5),
+          rng.choice(['Great product', 'Not bad', 'Would buy again', 'Disappointing']), timestamp(365))
+         for _ in range(n_reviews)))
+    conn.execute('COMMIT')
+
+    for statement in SCALE_INDEXES:
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+
+    # Back to the settings the application expects
+    conn.execute('PRAGMA locking_mode=NORMAL')
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    return counts
+
 if __name__ == "__main__":
-    init_database()
\ No newline at end of file
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description='Create the HyperQuery e-commerce database')
+    parser.add_argument('--scale', type=int, default=0,
+                        help=f'generate a large dataset ({SCALE_ORDERS:,} orders per unit) instead of the sample data')
+    parser.add_argument('--db', default='ecommerce.db', help='database file for --scale mode')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='overwrite an existing --db file')
+    args = parser.parse_args()
+
+    if not args.scale:
+        init_database()
+    else:
+        if os.path.exists(args.db):
+            if not args.force:
+                parser.error(f'{args.db} already exists; pass --force to overwrite it')
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+        started = time.perf_counter()
+        counts = init_scaled_database(args.db, args.scale, args.seed)
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        for table, count in counts.items():
+            print(f'{table:<18} {count:>12,}')
+        print(f'{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/sec) -> {args.db}')
\ No newline at end of file
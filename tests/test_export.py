@@ -0,0 +1,41 @@
+import os
+import sqlite3
+
+os.environ.setdefault("GROQ_API_KEY", "test-stub")
+
+from backend.database.connector import DatabaseConnector, close_database
+from backend.services.export import export_etag
+
+QUERY = "SELECT id, total FROM orders"
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, total REAL)")
+    conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i * 1.5) for i in range(100)])
+    conn.commit()
+    conn.close()
+
+
+def etag(path):
+    db = DatabaseConnector(path)
+    db.execute_safe_query(QUERY, use_cache=False)
+    return export_etag(QUERY, "shop", "csv", "gzip", db.file_version())
+
+
+def test_export_etag_changes_after_write_and_reopen(tmp_path):
+    path = str(tmp_path / "shop.db")
+    make_db(path)
+    before = etag(path)
+    close_database(path)
+    assert etag(path) == before  # a fresh connection on unchanged data agrees
+    close_database(path)
+
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE orders SET total = total + 1 WHERE id = 1")
+    conn.commit()
+    conn.close()
+
+    assert etag(path) != before
+    close_database(path)
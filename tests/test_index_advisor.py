@@ -0,0 +1,43 @@
+import os
+import sqlite3
+
+os.environ.setdefault("GROQ_API_KEY", "test-stub")
+
+from backend.database.connector import DatabaseConnector
+from backend.database.index_advisor import IndexAdvisor
+
+JOIN_ORDERED = (
+    "SELECT c.first_name, o.order_date FROM customers AS c JOIN orders AS o ON o.customer_id = c.id "
+    "ORDER BY c.first_name, o.order_date"
+)
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, first_name TEXT);
+        CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER, order_date TEXT);
+        """
+    )
+    conn.executemany("INSERT INTO customers VALUES (?, ?)", [(i, f"name{i}") for i in range(50)])
+    conn.executemany("INSERT INTO orders VALUES (?, ?, ?)", [(i, i % 50, f"2024-01-{i % 28 + 1:02d}") for i in range(500)])
+    conn.commit()
+    conn.close()
+
+
+def test_join_with_qualified_order_by_gets_candidate(tmp_path):
+    path = str(tmp_path / "shop.db")
+    make_db(path)
+    db = DatabaseConnector(path)
+    db.cost_guard.mode = "off"
+    advisor = IndexAdvisor(db, min_executions=1)
+    db.execute_safe_query(JOIN_ORDERED, use_cache=False)
+    advisor.record(JOIN_ORDERED, 0.01)
+
+    report = advisor.report()
+
+    assert any("SCAN o" in detail for finding in report["findings"] for detail in finding["plan"])
+    tables = {candidate["table"]: candidate["columns"] for candidate in report["candidates"]}
+    assert "orders" in tables
+    assert tables["orders"][0] == "customer_id"